@@ -0,0 +1,81 @@
+"""
+Compteurs de ventes des plats (MenuItem.order_count).
+
+Chaque OrderItem créé est une vente en attente (counted=False) : l'écriture
+de la commande ne touche pas la ligne du plat, ce qui évite de sérialiser les
+plats les plus commandés sous la charge du rush. Une tâche périodique reporte
+les ventes en attente par lots : les lignes passent à counted=True et les
+plats reçoivent F('order_count') + n dans la même transaction, un UPDATE par
+montant distinct. Invariant : order_count = somme des quantités comptées.
+"""
+from collections import Counter, defaultdict
+
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Now
+
+from apps.restaurants.cache import touch_restaurants
+from apps.restaurants.models import MenuItem
+from .models import OrderItem
+
+
+def flush_order_counts(batch_size=5000):
+    """Reporte les ventes en attente dans order_count ; renvoie le nombre de lignes traitées"""
+    flushed = 0
+    while True:
+        with transaction.atomic():
+            pending = OrderItem.objects.filter(counted=False).order_by('pk')
+            if connection.features.has_select_for_update_skip_locked:
+                # Deux vidages concurrents ne reportent jamais la même ligne
+                pending = pending.select_for_update(skip_locked=True)
+            rows = list(pending.values_list('pk', 'menu_item_id', 'quantity')[:batch_size])
+            if not rows:
+                break
+
+            totals = Counter()
+            for _, menu_item_id, quantity in rows:
+                totals[menu_item_id] += quantity
+            OrderItem.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(counted=True)
+
+            by_amount = defaultdict(list)
+            for menu_item_id, amount in sorted(totals.items()):
+                by_amount[amount].append(menu_item_id)
+            for amount, menu_item_ids in by_amount.items():
+                # updated_at : la synchronisation de l'autocomplétion suit les nouveaux scores
+                MenuItem.objects.filter(pk__in=menu_item_ids).update(
+                    order_count=F('order_count') + amount, updated_at=Now()
+                )
+
+            # L'ordre des menus dépend de order_count
+            touch_restaurants(*set(
+                MenuItem.objects.filter(pk__in=totals).values_list('restaurant_id', flat=True)
+            ))
+
+        flushed += len(rows)
+        if len(rows) < batch_size:
+            break
+    return flushed
+
+
+def counted_totals():
+    """Sous-requête : somme des quantités déjà comptées pour chaque plat"""
+    return Coalesce(Subquery(
+        OrderItem.objects.filter(menu_item=OuterRef('pk'), counted=True)
+        .order_by().values('menu_item').annotate(total=Sum('quantity')).values('total')
+    ), Value(0))
+
+
+def reconcile_order_counts(dry_run=False):
+    """
+    Recale order_count sur l'historique des OrderItem comptés (lignes
+    supprimées ou quantités modifiées après report). Renvoie les plats corrigés.
+    """
+    drifted = MenuItem.objects.annotate(expected=counted_totals()).exclude(order_count=F('expected'))
+    with transaction.atomic():
+        fixed = list(drifted.values_list('pk', 'restaurant_id'))
+        if fixed and not dry_run:
+            MenuItem.objects.filter(pk__in=[pk for pk, _ in fixed]).update(
+                order_count=counted_totals(), updated_at=Now()
+            )
+            touch_restaurants(*{restaurant_id for _, restaurant_id in fixed})
+    return [pk for pk, _ in fixed]
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from apps.commandes.counters import flush_order_counts, reconcile_order_counts
+
+
+class Command(BaseCommand):
+    help = "Reporte les ventes en attente puis recale MenuItem.order_count sur l'historique des commandes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Lister les écarts sans corriger")
+
+    def handle(self, *args, **options):
+        if not options['dry_run']:
+            flushed = flush_order_counts()
+            self.stdout.write(f"{flushed} lignes de commande reportées")
+        fixed = reconcile_order_counts(dry_run=options['dry_run'])
+        verb = "à corriger" if options['dry_run'] else "corrigés"
+        self.stdout.write(self.style.SUCCESS(f"{len(fixed)} plats {verb}"))
+        if fixed and options['dry_run']:
+            self.stdout.write(", ".join(str(pk) for pk in fixed))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:21
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def count_existing_items(apps, schema_editor):
+    """L'historique existant est compté d'emblée : order_count = somme des quantités"""
+    OrderItem = apps.get_model('commandes', 'OrderItem')
+    MenuItem = apps.get_model('restaurants', 'MenuItem')
+    OrderItem.objects.update(counted=True)
+    MenuItem.objects.update(order_count=Coalesce(Subquery(
+        OrderItem.objects.filter(menu_item=OuterRef('pk'))
+        .order_by().values('menu_item').annotate(total=Sum('quantity')).values('total')
+    ), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commandes', '0002_keyset_pagination_indexes'),
+        ('restaurants', '0009_menu_import_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='counted',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(condition=models.Q(('counted', False)), fields=['id'], name='orderitem_uncounted_idx'),
+        ),
+        migrations.RunPython(count_existing_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:52
+
+from django.db import migrations, models
+
+# INCREMENT BY = ORDER_NUMBER_BLOCK_SIZE (apps/commandes/numbering.py)
+POSTGRES_FORWARD = 'CREATE SEQUENCE IF NOT EXISTS commandes_order_number_seq START 1 INCREMENT BY 100'
+POSTGRES_REVERSE = 'DROP SEQUENCE IF EXISTS commandes_order_number_seq'
+
+
+def create_counter(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_FORWARD)
+    else:
+        apps.get_model('commandes', 'OrderNumberCounter').objects.get_or_create(pk=1)
+
+
+def drop_counter(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commandes', '0003_order_item_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.RunPython(create_counter, drop_counter),
+    ]
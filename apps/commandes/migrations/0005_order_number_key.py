@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:34
+
+import hashlib
+import hmac
+
+import apps.commandes.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def persist_key(apps, schema_editor):
+    # Sous PostgreSQL la ligne n'existait pas (compteur en séquence) : elle porte désormais la clé
+    counter, _ = apps.get_model('commandes', 'OrderNumberCounter').objects.get_or_create(pk=1)
+    if apps.get_model('commandes', 'Order').objects.exists():
+        # Numéros déjà émis : figer la clé qui les a produits (dérivée, le secret n'est pas stocké)
+        secret = settings.ORDER_NUMBER_KEY or settings.SECRET_KEY
+        counter.key = hmac.new(secret.encode(), b'order-number', hashlib.sha256).hexdigest()
+        counter.save(update_fields=['key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commandes', '0004_order_number_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordernumbercounter',
+            name='key',
+            field=models.CharField(default=apps.commandes.models.generate_order_number_key, editable=False, max_length=64),
+        ),
+        migrations.RunPython(persist_key, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from apps.restaurants.models import Restaurant,MenuItem
+import secrets
 import uuid
 from django.contrib.auth import get_user_model
 
@@ -63,16 +64,20 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Pagination par curseur (created_at, id) des commandes d'un client / livreur
+            models.Index(fields=['customer', '-created_at', '-id'], name='order_customer_created_idx'),
+            models.Index(fields=['driver', '-created_at', '-id'], name='order_driver_created_idx'),
+        ]
 
     def __str__(self):
         return f"Commande #{self.order_number}"
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            # Génère un numéro de commande unique
-            import random
-            import string
-            self.order_number = ''.join(random.choices(string.digits, k=8))
+            # Numéro unique sans requête de vérification (voir numbering.py)
+            from .numbering import next_order_number
+            self.order_number = next_order_number()
         super().save(*args, **kwargs)
 
 
@@ -87,9 +92,35 @@ class OrderItem(models.Model):
     selected_options = models.JSONField(default=dict, blank=True)
     special_instructions = models.TextField(blank=True)
 
+    # Déjà reporté dans MenuItem.order_count (voir counters.py)
+    counted = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        indexes = [
+            # Seules les lignes en attente de report sont indexées
+            models.Index(fields=['id'], condition=models.Q(counted=False), name='orderitem_uncounted_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         self.total_price = self.unit_price * self.quantity
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.menu_item.name} x{self.quantity}"
\ No newline at end of file
+        return f"{self.menu_item.name} x{self.quantity}"
+
+
+def generate_order_number_key():
+    return secrets.token_hex(32)
+
+
+class OrderNumberCounter(models.Model):
+    """
+    Ligne unique (pk=1) : clé de la permutation des numéros de commande et,
+    hors PostgreSQL, compteur. La clé est conservée en base : elle ne suit pas
+    une rotation de SECRET_KEY, qui ferait recouper les numéros déjà émis.
+    """
+    next_value = models.BigIntegerField(default=1)
+    key = models.CharField(max_length=64, default=generate_order_number_key, editable=False)
+
+    def __str__(self):
+        return f"Prochaine valeur : {self.next_value}"
@@ -0,0 +1,132 @@
+"""
+Numéros de commande : uniques, lisibles et impossibles à deviner.
+
+Chaque numéro est l'image d'un compteur par une permutation de Feistel à clé
+secrète sur [0, 10^10) : deux valeurs distinctes du compteur donnent toujours
+deux numéros distincts, sans requête de vérification, et des commandes
+consécutives ont des numéros sans rapport apparent.
+
+Le compteur est réservé par blocs de ORDER_NUMBER_BLOCK_SIZE valeurs et
+consommé en mémoire : une seule requête pour tout un bloc. La clé de la
+permutation est lue une fois par processus dans OrderNumberCounter : elle ne
+dépend pas des réglages, qu'une rotation de secret ne peut donc pas changer. Sous PostgreSQL le
+bloc vient d'une séquence (`nextval` n'est jamais annulé par un rollback, deux
+processus ne reçoivent jamais le même bloc). Ailleurs (SQLite en
+développement), la réservation passe par la table OrderNumberCounter et
+suivrait un rollback de la transaction en cours : dans une transaction, une
+seule valeur est alors réservée à la fois.
+"""
+import hashlib
+import hmac
+import os
+import threading
+
+from django.db import connection, transaction
+from django.db.models import F
+
+ORDER_NUMBER_BLOCK_SIZE = 100  # doit rester égal à l'INCREMENT de la séquence (migration 0004)
+ORDER_NUMBER_SEQUENCE = 'commandes_order_number_seq'
+ORDER_NUMBER_DIGITS = 10
+FEISTEL_ROUNDS = 4
+
+_HALF = 10 ** (ORDER_NUMBER_DIGITS // 2)
+
+
+def _round_value(key, index, value):
+    digest = hmac.new(key, f'{index}:{value}'.encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], 'big') % _HALF
+
+
+def permute(value, key):
+    """Bijection de [0, 10^10) sur lui-même (réseau de Feistel sur deux moitiés décimales)"""
+    left, right = divmod(value, _HALF)
+    for index in range(FEISTEL_ROUNDS):
+        left, right = right, (left + _round_value(key, index, right)) % _HALF
+    return left * _HALF + right
+
+
+def unpermute(number, key):
+    """Retrouve la valeur du compteur d'un numéro (support, vérifications)"""
+    left, right = divmod(number, _HALF)
+    for index in reversed(range(FEISTEL_ROUNDS)):
+        left, right = (right - _round_value(key, index, left)) % _HALF, left
+    return left * _HALF + right
+
+
+def reserve_block(size):
+    """Réserve `size` valeurs consécutives du compteur et retourne la première"""
+    if connection.vendor == 'postgresql':
+        # La séquence avance toujours de ORDER_NUMBER_BLOCK_SIZE (INCREMENT BY)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [ORDER_NUMBER_SEQUENCE])
+            return cursor.fetchone()[0]
+
+    from .models import OrderNumberCounter
+
+    counter = OrderNumberCounter.objects.filter(pk=1)
+    with transaction.atomic():
+        if not counter.update(next_value=F('next_value') + size):
+            OrderNumberCounter.objects.get_or_create(pk=1)
+            counter.update(next_value=F('next_value') + size)
+        end = counter.values_list('next_value', flat=True).get()
+    return end - size
+
+
+def reservation_is_durable():
+    """Vrai si un bloc réservé maintenant ne peut plus être annulé par un rollback"""
+    return connection.vendor == 'postgresql' or not connection.in_atomic_block
+
+
+class OrderNumberAllocator:
+    """Distribue les valeurs d'un bloc réservé ; propre à chaque processus"""
+
+    def __init__(self, reserve=reserve_block, block_size=ORDER_NUMBER_BLOCK_SIZE, durable=reservation_is_durable):
+        self.reserve = reserve
+        self.block_size = block_size
+        self.durable = durable
+        self.lock = threading.Lock()
+        self.pid = None
+        self.next_value = self.end = 0
+
+    def next_value_for_order(self):
+        with self.lock:
+            # Après un fork, le bloc du parent ne doit pas être réutilisé par l'enfant
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.next_value = self.end = 0
+
+            if self.next_value >= self.end:
+                if not self.durable():
+                    # Réservation annulable avec la transaction : rien n'est gardé pour la suite
+                    return self.reserve(1)
+                start = self.reserve(self.block_size)
+                self.next_value, self.end = start, start + self.block_size
+
+            value = self.next_value
+            self.next_value += 1
+            return value
+
+
+allocator = OrderNumberAllocator()
+
+
+_key = None
+
+
+def order_number_key():
+    """Clé de la permutation, conservée en base (migration commandes 0005)"""
+    global _key
+    if _key is None:
+        from .models import OrderNumberCounter
+
+        counter, _ = OrderNumberCounter.objects.get_or_create(pk=1)
+        _key = bytes.fromhex(counter.key)
+    return _key
+
+
+def format_order_number(value):
+    return f'{permute(value, order_number_key()):0{ORDER_NUMBER_DIGITS}d}'
+
+
+def next_order_number():
+    return format_order_number(allocator.next_value_for_order())
@@ -1,7 +1,14 @@
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import transaction
 from rest_framework import serializers
 from .models import Order, OrderItem
+from apps.restaurants.models import MenuItem
 from apps.restaurants.serializers import MenuItemSerializer
 
+TAX_RATE = Decimal('0.10')
+ORDER_MAX_LINES = 100
+ORDER_LINE_MAX_QUANTITY = 99
+
 
 class OrderItemSerializer(serializers.ModelSerializer):
     menu_item_details = MenuItemSerializer(source='menu_item', read_only=True)
@@ -14,8 +21,16 @@ class OrderItemSerializer(serializers.ModelSerializer):
         ]
 
 
+class OrderItemInputSerializer(serializers.Serializer):
+    """Ligne du panier : le prix est toujours celui du menu, jamais celui envoyé"""
+    menu_item = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, max_value=ORDER_LINE_MAX_QUANTITY)
+    selected_options = serializers.JSONField(required=False, default=dict)
+    special_instructions = serializers.CharField(required=False, allow_blank=True, default='')
+
+
 class OrderCreateSerializer(serializers.ModelSerializer):
-    items = OrderItemSerializer(many=True)
+    items = OrderItemInputSerializer(many=True, allow_empty=False, max_length=ORDER_MAX_LINES)
 
     class Meta:
         model = Order
@@ -24,30 +39,57 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             'delivery_longitude', 'payment_method', 'customer_notes', 'items'
         ]
 
-    def create(self, validated_data):
-        items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-
-        subtotal = 0
-        for item_data in items_data:
-            menu_item = item_data['menu_item']
-            quantity = item_data['quantity']
-            unit_price = menu_item.price
-
-            OrderItem.objects.create(
-                order=order,
-                unit_price=unit_price,
-                **item_data
-            )
-            subtotal += unit_price * quantity
-
-        # Calcul des totaux
-        order.subtotal = subtotal
-        order.delivery_fee = order.restaurant.delivery_fee
-        order.tax = subtotal * 0.1  # 10% de taxe
-        order.total_amount = subtotal + order.delivery_fee + order.tax
-        order.save()
+    def validate_restaurant(self, restaurant):
+        if not (restaurant.is_active and restaurant.is_accepting_orders):
+            raise serializers.ValidationError("Ce restaurant n'accepte pas de commandes pour le moment")
+        return restaurant
+
+    def validate(self, data):
+        restaurant = data['restaurant']
+        lines = data['items']
+
+        # Tous les plats du panier en une requête
+        menu_items = MenuItem.objects.select_related('category').in_bulk(
+            {line['menu_item'] for line in lines}
+        )
+        errors = {}
+        for index, line in enumerate(lines):
+            menu_item = menu_items.get(line['menu_item'])
+            if menu_item is None or menu_item.restaurant_id != restaurant.pk:
+                errors[index] = f"Plat {line['menu_item']} introuvable dans ce restaurant"
+            elif not menu_item.is_available:
+                errors[index] = f"{menu_item.name} n'est plus disponible"
+            else:
+                line['menu_item'] = menu_item
+        if errors:
+            raise serializers.ValidationError({'items': errors})
+
+        # Totaux calculés en Decimal avant toute écriture
+        subtotal = sum((line['menu_item'].price * line['quantity'] for line in lines), Decimal('0.00'))
+        tax = (subtotal * TAX_RATE).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        data['subtotal'] = subtotal
+        data['delivery_fee'] = restaurant.delivery_fee
+        data['tax'] = tax
+        data['total_amount'] = subtotal + restaurant.delivery_fee + tax
+        return data
 
+    def create(self, validated_data):
+        lines = validated_data.pop('items')
+        with transaction.atomic():
+            order = Order.objects.create(**validated_data)
+            # bulk_create n'appelle pas OrderItem.save : total_price est calculé ici
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    menu_item=line['menu_item'],
+                    quantity=line['quantity'],
+                    unit_price=line['menu_item'].price,
+                    total_price=line['menu_item'].price * line['quantity'],
+                    selected_options=line['selected_options'],
+                    special_instructions=line['special_instructions'],
+                )
+                for line in lines
+            ])
         return order
 
 
@@ -64,7 +106,9 @@ class OrderListSerializer(serializers.ModelSerializer):
         ]
 
     def get_items_count(self, obj):
-        return obj.items.count()
+        # Annoté par OrderViewSet.get_queryset : une sous-requête pour toute la page
+        items_count = getattr(obj, 'items_count', None)
+        return items_count if items_count is not None else obj.items.count()
 
 
 class OrderDetailSerializer(serializers.ModelSerializer):
@@ -81,6 +125,18 @@ class OrderDetailSerializer(serializers.ModelSerializer):
             'estimated_delivery_time', 'actual_delivery_time', 'tracking',
             'created_at', 'updated_at'
         ]
+        # Le statut ne change que par transitions.py ; montants et paiement sont fixés à la création
+        read_only_fields = [
+            'order_number', 'status', 'subtotal', 'delivery_fee', 'tax', 'total_amount',
+            'payment_status', 'estimated_delivery_time', 'actual_delivery_time'
+        ]
+
+    def update(self, instance, validated_data):
+        # Seuls les champs envoyés sont écrits : pas de réécriture du statut lu plus tôt
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
 
     def get_restaurant_details(self, obj):
         return {
@@ -1,22 +1,27 @@
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import Order
 from .tasks import send_order_notification, assign_driver
+from .transitions import order_status_changed
 
 
 @receiver(post_save, sender=Order)
 def order_post_save(sender, instance, created, **kwargs):
-    """Actions automatiques après sauvegarde d'une commande"""
-
+    """Actions automatiques à la création d'une commande"""
+    # Les tâches partent après le commit : jamais pour une commande annulée par un rollback
     if created:
         # Nouvelle commande - notifier le restaurant
-        send_order_notification.delay(instance.id, 'new_order')
+        transaction.on_commit(lambda: send_order_notification.delay(instance.id, 'new_order'))
+
 
-    elif instance.status == 'confirmed':
+@receiver(order_status_changed, sender=Order)
+def order_status_effects(sender, order_id, status, **kwargs):
+    """Effets d'un changement de statut, émis une fois par transition effectuée (voir transitions.py)"""
+    if status == 'confirmed':
         # Commande confirmée - chercher un livreur
-        assign_driver.delay(instance.id)
+        transaction.on_commit(lambda: assign_driver.delay(order_id))
 
-    elif instance.status == 'ready':
-        # Commande prête - notifier le livreur
-        if instance.driver:
-            send_order_notification.delay(instance.id, 'ready_for_pickup')
\ No newline at end of file
+    elif status == 'ready':
+        # Commande prête - notifier le livreur (s'il y en a un)
+        transaction.on_commit(lambda: send_order_notification.delay(order_id, 'ready_for_pickup'))
@@ -1,16 +1,19 @@
 from celery import shared_task
 from django.core.mail import send_mail
 from django.conf import settings
+from django.utils import timezone
+from .counters import flush_order_counts, reconcile_order_counts
 from .models import Order
 from apps.authentication.models import DriverProfile
-from geopy.distance import geodesic
+from apps.core.utils import bounding_box, haversine_distances
 
 
 @shared_task
 def send_order_notification(order_id, notification_type):
     """Envoie des notifications pour les commandes"""
     try:
-        order = Order.objects.get(id=order_id)
+        order = Order.objects.select_related('customer', 'restaurant__owner', 'driver').get(id=order_id)
+        recipient = None
 
         if notification_type == 'new_order':
             # Notifier le restaurant
@@ -18,12 +21,18 @@ def send_order_notification(order_id, notification_type):
             message = f"Vous avez reçu une nouvelle commande de {order.customer.username}"
             recipient = order.restaurant.owner.email
 
-        elif notification_type == 'ready_for_pickup':
+        elif notification_type == 'ready_for_pickup' and order.driver:
             # Notifier le livreur
             subject = f"Commande prête #{order.order_number}"
             message = f"La commande est prête à être récupérée chez {order.restaurant.name}"
             recipient = order.driver.email
 
+        elif notification_type == 'assigned' and order.driver:
+            # Notifier le livreur assigné
+            subject = f"Nouvelle livraison #{order.order_number}"
+            message = f"Une commande vous attend chez {order.restaurant.name}"
+            recipient = order.driver.email
+
         if recipient:
             send_mail(
                 subject,
@@ -41,31 +50,35 @@ def send_order_notification(order_id, notification_type):
 def assign_driver(order_id):
     """Assigne automatiquement un livreur à une commande"""
     try:
-        order = Order.objects.get(id=order_id)
+        order = Order.objects.select_related('restaurant').get(id=order_id)
 
         # Trouver les livreurs disponibles dans un rayon de 5km
-        restaurant_location = (order.restaurant.latitude, order.restaurant.longitude)
+        max_distance_km = 5
+        restaurant = order.restaurant
+        min_lat, max_lat, min_lng, max_lng = bounding_box(restaurant.latitude, restaurant.longitude, max_distance_km)
 
         available_drivers = DriverProfile.objects.filter(
             is_available=True,
-            current_latitude__isnull=False,
+            current_latitude__range=(min_lat, max_lat),
             current_longitude__isnull=False
-        ).select_related('user')
-
-        closest_driver = None
-        min_distance = float('inf')
-
-        for driver_profile in available_drivers:
-            driver_location = (driver_profile.current_latitude, driver_profile.current_longitude)
-            distance = geodesic(restaurant_location, driver_location).kilometers
+        )
+        if min_lng is not None:
+            available_drivers = available_drivers.filter(current_longitude__range=(min_lng, max_lng))
 
-            if distance < min_distance and distance <= 5:  # Dans un rayon de 5km
-                min_distance = distance
-                closest_driver = driver_profile.user
+        candidates = list(available_drivers.values_list('user_id', 'current_latitude', 'current_longitude'))
 
-        if closest_driver:
-            order.driver = closest_driver
-            order.save()
+        closest_driver = None
+        if candidates:
+            user_ids, latitudes, longitudes = zip(*candidates)
+            distances = haversine_distances(restaurant.latitude, restaurant.longitude, latitudes, longitudes)
+            closest = distances.argmin()
+            if distances[closest] <= max_distance_km:  # Dans un rayon de 5km
+                closest_driver = DriverProfile.objects.select_related('user').get(user_id=user_ids[closest]).user
+
+        # Affectation conditionnelle : une seule tâche concurrente peut gagner la commande
+        if closest_driver and Order.objects.filter(
+            pk=order.pk, driver__isnull=True, status=order.status
+        ).update(driver=closest_driver, updated_at=timezone.now()):
 
             # Marquer le livreur comme non disponible
             closest_driver.driver_profile.is_available = False
@@ -76,3 +89,15 @@ def assign_driver(order_id):
 
     except Order.DoesNotExist:
         pass
+
+
+@shared_task
+def flush_menu_item_counters():
+    """Reporte les ventes en attente dans MenuItem.order_count"""
+    return flush_order_counts()
+
+
+@shared_task
+def reconcile_menu_item_counters():
+    """Recale les compteurs de ventes sur l'historique des commandes"""
+    return len(reconcile_order_counts())
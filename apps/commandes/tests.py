@@ -1,3 +1,686 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.livraison.models import DeliveryTracking
+from apps.restaurants.models import Restaurant, Category, MenuItem
+from apps.search.autocomplete import AutocompleteIndex
+from .counters import flush_order_counts, reconcile_order_counts
+from . import numbering
+from .models import Order, OrderItem, OrderNumberCounter
+from .numbering import OrderNumberAllocator, format_order_number, order_number_key, permute, unpermute
+from .tasks import assign_driver, send_order_notification
+from .transitions import order_status_changed, transition_order
+from .views import OrderViewSet
 
-# Create your tests here.
+User = get_user_model()
+
+
+class OrderCountersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user(
+            username='client', email='client@example.com', password='clientpass123'
+        )
+        owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='ownerpass123', user_type='restaurant'
+        )
+        self.restaurant = Restaurant.objects.create(
+            owner=owner,
+            name='Mon Restaurant',
+            address='123 Test St',
+            latitude=48.8566,
+            longitude=2.3522,
+            phone_number='+33123456789'
+        )
+        self.items = [
+            MenuItem.objects.create(restaurant=self.restaurant, name=f'Plat {index}', price='10.00')
+            for index in range(3)
+        ]
+
+    def create_order(self, *lines):
+        order = Order.objects.create(
+            customer=self.customer,
+            restaurant=self.restaurant,
+            subtotal='10.00',
+            total_amount='10.00',
+            payment_method='cash',
+            delivery_address={'street': '1 rue'},
+            delivery_latitude=48.85,
+            delivery_longitude=2.35
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menu_item=item, quantity=quantity, unit_price='10.00', total_price='10.00')
+            for item, quantity in lines
+        ])
+        return order
+
+    def order_counts(self):
+        return list(MenuItem.objects.order_by('name').values_list('order_count', flat=True))
+
+    def test_order_creation_does_not_touch_menu_items(self):
+        self.create_order((self.items[0], 2))
+        self.assertEqual(self.order_counts(), [0, 0, 0])
+
+    def test_flush_applies_exact_totals(self):
+        first, second, third = self.items
+        for _ in range(20):
+            self.create_order((first, 2), (second, 1))
+        self.create_order((third, 3))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(flush_order_counts(), 41)
+        # Une lecture, un marquage, un UPDATE par montant distinct et les restaurants
+        self.assertLess(len(queries), 10)
+        self.assertEqual(self.order_counts(), [40, 20, 3])
+
+        # Idempotent : rien n'est reporté deux fois
+        self.assertEqual(flush_order_counts(), 0)
+        self.create_order((first, 1))
+        flush_order_counts()
+        self.assertEqual(self.order_counts(), [41, 20, 3])
+        self.assertFalse(OrderItem.objects.filter(counted=False).exists())
+
+    def test_flush_in_batches(self):
+        for _ in range(7):
+            self.create_order((self.items[0], 1))
+        self.assertEqual(flush_order_counts(batch_size=3), 7)
+        self.assertEqual(self.order_counts()[0], 7)
+
+    def test_flush_invalidates_menu_ordering(self):
+        menu_url = f'/api/v1/restaurants/{self.restaurant.pk}/menu/'
+        etag = self.client.get(menu_url)['ETag']
+        self.create_order((self.items[2], 5))
+        flush_order_counts()
+        self.assertNotEqual(self.client.get(menu_url)['ETag'], etag)
+        self.assertEqual(MenuItem.objects.filter(restaurant=self.restaurant).first(), self.items[2])
+
+    def test_flush_reaches_autocomplete_sync(self):
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Restaurant.objects.update(updated_at=an_hour_ago)
+        MenuItem.objects.update(updated_at=an_hour_ago)
+        index = AutocompleteIndex(background=False)  # index d'un autre worker
+        index.complete('plat')
+        self.create_order((self.items[1], 7))
+        flush_order_counts()
+
+        index.checked_at = 0
+        results = index.complete('plat', kinds=['menu_item'])
+        self.assertEqual((results[0][1], results[0][2]), ('Plat 1', 7))
+
+    def test_reconcile_fixes_drift(self):
+        order = self.create_order((self.items[0], 2), (self.items[1], 1))
+        flush_order_counts()
+        order.items.filter(menu_item=self.items[1]).delete()
+        MenuItem.objects.filter(pk=self.items[2].pk).update(order_count=99)
+
+        self.assertEqual(sorted(reconcile_order_counts(dry_run=True)), [self.items[1].pk, self.items[2].pk])
+        self.assertEqual(self.order_counts(), [2, 1, 99])
+        self.assertEqual(len(reconcile_order_counts()), 2)
+        self.assertEqual(self.order_counts(), [2, 0, 0])
+        self.assertEqual(reconcile_order_counts(), [])
+
+    def test_reconcile_command_flushes_pending_sales(self):
+        self.create_order((self.items[0], 4))
+        out = StringIO()
+        call_command('reconcile_order_counts', stdout=out)
+        self.assertIn('1 lignes de commande reportées', out.getvalue())
+        self.assertEqual(self.order_counts()[0], 4)
+
+
+class OrderCreateTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user(
+            username='client', email='client@example.com', password='clientpass123'
+        )
+        owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='ownerpass123', user_type='restaurant'
+        )
+        self.restaurant = Restaurant.objects.create(
+            owner=owner,
+            name='Mon Restaurant',
+            address='123 Test St',
+            latitude=48.8566,
+            longitude=2.3522,
+            phone_number='+33123456789',
+            delivery_fee='2.50'
+        )
+        category = Category.objects.create(name='Plats')
+        self.items = [
+            MenuItem.objects.create(restaurant=self.restaurant, category=category, name=f'Plat {index}',
+                                    price=Decimal('9.95') + index)
+            for index in range(15)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def payload(self, *lines, **extra):
+        return {
+            'restaurant': self.restaurant.pk,
+            'items': [{'menu_item': item.pk, 'quantity': quantity} for item, quantity in lines],
+            'delivery_address': {'street': '1 rue'},
+            'delivery_latitude': 48.85,
+            'delivery_longitude': 2.35,
+            'payment_method': 'card',
+            **extra
+        }
+
+    def post(self, payload):
+        return self.client.post('/api/v1/orders/', payload, format='json')
+
+    def test_totals_are_computed_from_menu_prices(self):
+        payload = self.payload((self.items[0], 2), (self.items[1], 1))
+        payload['items'][0]['unit_price'] = '0.01'  # ignoré : le prix du menu fait foi
+        response = self.post(payload)
+        self.assertEqual(response.status_code, 201, response.data)
+
+        order = Order.objects.get()
+        self.assertEqual(order.customer, self.customer)
+        self.assertEqual(order.subtotal, Decimal('30.85'))
+        self.assertEqual(order.tax, Decimal('3.09'))
+        self.assertEqual(order.delivery_fee, Decimal('2.50'))
+        self.assertEqual(order.total_amount, Decimal('36.44'))
+        self.assertEqual(
+            list(order.items.order_by('unit_price').values_list('unit_price', 'quantity', 'total_price')),
+            [(Decimal('9.95'), 2, Decimal('19.90')), (Decimal('10.95'), 1, Decimal('10.95'))]
+        )
+        self.assertEqual(response.data['order_number'], order.order_number)
+        self.assertEqual(len(response.data['items']), 2)
+        self.assertEqual(response.data['items'][0]['menu_item_details']['category_name'], 'Plats')
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        counts = []
+        for size in (1, 15):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post(self.payload(*[(item, 1) for item in self.items[:size]]))
+            self.assertEqual(response.status_code, 201, response.data)
+            counts.append(len([query for query in queries if 'SAVEPOINT' not in query['sql']]))
+        self.assertEqual(counts[0], counts[1])
+        # Restaurant, plats, commande, lignes, relecture pour la réponse ; sous SQLite et dans
+        # une transaction, le numéro de commande est réservé à l'unité (2 requêtes)
+        self.assertLessEqual(counts[1], 8)
+
+    def test_invalid_lines_create_nothing(self):
+        other = Restaurant.objects.create(
+            owner=self.restaurant.owner, name='Autre', address='-', latitude=48.85, longitude=2.35,
+            phone_number='+33123456789'
+        )
+        foreign = MenuItem.objects.create(restaurant=other, name='Ailleurs', price='5.00')
+        self.items[1].is_available = False
+        self.items[1].save()
+
+        response = self.post(self.payload((self.items[0], 1), (foreign, 1), (self.items[1], 1)))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.data['items']), [1, 2])
+        self.assertEqual(self.post(self.payload()).status_code, 400)
+        self.assertEqual(self.post(self.payload((self.items[0], 0))).status_code, 400)
+
+        self.restaurant.is_accepting_orders = False
+        self.restaurant.save()
+        self.assertEqual(self.post(self.payload((self.items[0], 1))).status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_notification_is_sent_once_after_commit(self):
+        with mock.patch.object(send_order_notification, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.post(self.payload((self.items[0], 1)))
+                delay.assert_not_called()
+        delay.assert_called_once_with(Order.objects.get().id, 'new_order')
+        self.assertEqual(response.status_code, 201)
+
+
+class OrderNumberTest(SimpleTestCase):
+    key = b'cle-de-test'
+
+    def test_permutation_is_a_bijection(self):
+        values = list(range(20000)) + [10 ** 10 - 1]
+        numbers = [permute(value, self.key) for value in values]
+        self.assertEqual(len(set(numbers)), len(values))
+        self.assertTrue(all(0 <= number < 10 ** 10 for number in numbers))
+        self.assertEqual([unpermute(number, self.key) for number in numbers], values)
+
+    def test_consecutive_values_look_unrelated(self):
+        first, second = permute(41, self.key), permute(42, self.key)
+        self.assertGreater(abs(first - second), 1000)
+        self.assertNotEqual(permute(42, b'autre-cle'), second)
+
+    def test_blocks_are_reserved_once(self):
+        reserve = mock.Mock(side_effect=[1, 101])
+        allocator = OrderNumberAllocator(reserve=reserve, block_size=100, durable=lambda: True)
+        values = [allocator.next_value_for_order() for _ in range(150)]
+        self.assertEqual(values, list(range(1, 151)))
+        self.assertEqual(reserve.call_args_list, [mock.call(100), mock.call(100)])
+
+    def test_forked_process_does_not_reuse_parent_block(self):
+        reserve = mock.Mock(side_effect=[1, 101])
+        allocator = OrderNumberAllocator(reserve=reserve, block_size=100, durable=lambda: True)
+        allocator.next_value_for_order()
+        with mock.patch('apps.commandes.numbering.os.getpid', return_value=-1):
+            self.assertEqual(allocator.next_value_for_order(), 101)
+
+    def test_reservation_inside_rollbackable_transaction_is_not_kept(self):
+        reserve = mock.Mock(side_effect=[7, 8])
+        allocator = OrderNumberAllocator(reserve=reserve, block_size=100, durable=lambda: False)
+        self.assertEqual([allocator.next_value_for_order() for _ in range(2)], [7, 8])
+        self.assertEqual(reserve.call_args_list, [mock.call(1), mock.call(1)])
+
+
+class OrderNumberAllocationTest(TestCase):
+    def test_orders_get_distinct_numbers_from_the_counter(self):
+        customer = User.objects.create_user(username='client', email='client@example.com', password='clientpass123')
+        owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='ownerpass123', user_type='restaurant'
+        )
+        restaurant = Restaurant.objects.create(
+            owner=owner, name='Mon Restaurant', address='123 Test St', latitude=48.8566, longitude=2.3522,
+            phone_number='+33123456789'
+        )
+        start = OrderNumberCounter.objects.get(pk=1).next_value
+        orders = [
+            Order.objects.create(
+                customer=customer, restaurant=restaurant, subtotal='10.00', total_amount='10.00',
+                payment_method='cash', delivery_address={'street': '1 rue'},
+                delivery_latitude=48.85, delivery_longitude=2.35
+            )
+            for _ in range(5)
+        ]
+        numbers = [order.order_number for order in orders]
+        self.assertEqual(len(set(numbers)), 5)
+        self.assertTrue(all(len(number) == 10 and number.isdigit() for number in numbers))
+        self.assertEqual(
+            [unpermute(int(number), order_number_key()) for number in numbers], list(range(start, start + 5))
+        )
+
+    def test_key_is_persisted_and_ignores_secret_rotation(self):
+        counter = OrderNumberCounter.objects.get(pk=1)
+        self.assertEqual(order_number_key(), bytes.fromhex(counter.key))
+        with override_settings(SECRET_KEY='nouveau-secret', ORDER_NUMBER_KEY='nouvelle-cle'):
+            self.assertEqual(format_order_number(42), f'{permute(42, bytes.fromhex(counter.key)):010d}')
+
+    @override_settings(ORDER_NUMBER_KEY='', SECRET_KEY='secret-en-production')
+    def test_migration_keeps_key_of_issued_numbers(self):
+        self.addCleanup(setattr, numbering, '_key', None)  # clé relue après le rollback du test
+        state = MigrationExecutor(connection).loader.project_state(('commandes', '0005_order_number_key'))
+        migration = import_module('apps.commandes.migrations.0005_order_number_key')
+        migration.persist_key(state.apps, None)
+        self.assertEqual(len(OrderNumberCounter.objects.get(pk=1).key), 64)  # sans commande : clé aléatoire
+
+        owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='ownerpass123', user_type='restaurant'
+        )
+        Order.objects.create(
+            customer=owner, restaurant=Restaurant.objects.create(
+                owner=owner, name='R', address='-', latitude=48.85, longitude=2.35, phone_number='+33123456789'
+            ), subtotal='1.00', total_amount='1.00', payment_method='cash', delivery_address={},
+            delivery_latitude=48.85, delivery_longitude=2.35
+        )
+        migration.persist_key(state.apps, None)
+        self.assertEqual(
+            OrderNumberCounter.objects.get(pk=1).key,
+            hmac.new(b'secret-en-production', b'order-number', hashlib.sha256).hexdigest()
+        )
+
+
+class OrderIdempotencyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = caches['idempotency']
+        self.store.clear()
+        self.customer = User.objects.create_user(
+            username='client', email='client@example.com', password='clientpass123'
+        )
+        owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='ownerpass123', user_type='restaurant'
+        )
+        self.restaurant = Restaurant.objects.create(
+            owner=owner, name='Mon Restaurant', address='123 Test St', latitude=48.8566, longitude=2.3522,
+            phone_number='+33123456789'
+        )
+        self.item = MenuItem.objects.create(restaurant=self.restaurant, name='Plat', price='10.00')
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.payload = {
+            'restaurant': self.restaurant.pk,
+            'items': [{'menu_item': self.item.pk, 'quantity': 1}],
+            'delivery_address': {'street': '1 rue'},
+            'delivery_latitude': 48.85,
+            'delivery_longitude': 2.35,
+            'payment_method': 'cash',
+        }
+
+    def post(self, key, payload=None):
+        return self.client.post(
+            '/api/v1/orders/', payload or self.payload, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def cache_key(self, user, key):
+        return f'idempotency:{user.pk}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+    def test_retry_replays_first_response(self):
+        with mock.patch.object(send_order_notification, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                first = self.post('retry-1')
+                second = self.post('retry-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        delay.assert_called_once()
+
+        # Sans clé, ou avec une autre clé, la commande est bien recréée
+        self.assertEqual(self.post('retry-2').status_code, 201)
+        self.assertEqual(self.client.post('/api/v1/orders/', self.payload, format='json').status_code, 201)
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_stored_responses_survive_application_cache_clear(self):
+        self.post('durable')
+        cache.clear()
+        self.assertEqual(self.post('durable')['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_reused_with_other_payload_is_rejected(self):
+        self.post('reuse')
+        response = self.post('reuse', {**self.payload, 'customer_notes': 'Autre commande'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        self.post('shared')
+        other = User.objects.create_user(username='autre', email='autre@example.com', password='autrepass123')
+        self.client.force_authenticate(other)
+        self.assertNotIn('Idempotent-Replayed', self.post('shared'))
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_concurrent_duplicate_waits_for_first_response(self):
+        self.post('first')
+        stored = self.store.get(self.cache_key(self.customer, 'first'))
+        pending_key = self.cache_key(self.customer, 'pending')
+        self.store.add(f'{pending_key}:lock', 'autre-worker', 60)
+
+        def finish_first_request():
+            time.sleep(0.2)
+            self.store.set(pending_key, stored, 60)
+            self.store.delete(f'{pending_key}:lock')
+
+        worker = threading.Thread(target=finish_first_request)
+        worker.start()
+        response = self.post('pending')
+        worker.join()
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(response.data['order_number'], stored['data']['order_number'])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_lock_outlives_worker_timeout(self):
+        self.assertGreaterEqual(settings.IDEMPOTENCY_LOCK_TIMEOUT, settings.GUNICORN_TIMEOUT)
+        with override_settings(IDEMPOTENCY_LOCK_TIMEOUT=300), \
+                mock.patch.object(self.store, 'add', wraps=self.store.add) as add:
+            self.post('slow')
+        add.assert_called_once_with(f"{self.cache_key(self.customer, 'slow')}:lock", mock.ANY, 300)
+
+    def test_duplicate_gives_up_after_waiting(self):
+        self.store.add(f"{self.cache_key(self.customer, 'stuck')}:lock", 'autre-worker', 60)
+        with mock.patch('apps.core.idempotency.IDEMPOTENCY_WAIT', 0.1):
+            response = self.post('stuck')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderQueryBudgetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user(
+            username='client', email='client@example.com', password='clientpass123'
+        )
+        self.driver = User.objects.create_user(
+            username='livreur', email='livreur@example.com', password='livreurpass123', user_type='driver'
+        )
+        owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='ownerpass123', user_type='restaurant'
+        )
+        self.restaurants = [
+            Restaurant.objects.create(
+                owner=owner, name=f'Restaurant {index}', address='123 Test St', latitude=48.8566,
+                longitude=2.3522, phone_number='+33123456789'
+            )
+            for index in range(3)
+        ]
+        categories = [Category.objects.create(name=f'Catégorie {index}') for index in range(3)]
+        self.menu = [
+            MenuItem.objects.create(
+                restaurant=restaurant, category=categories[index % 3], name=f'Plat {index}', price='10.00'
+            )
+            for restaurant in self.restaurants for index in range(4)
+        ]
+        self.client = APIClient()
+
+    def create_order(self, index, lines):
+        restaurant = self.restaurants[index % 3]
+        order = Order.objects.create(
+            customer=self.customer, driver=self.driver, restaurant=restaurant, subtotal='10.00',
+            total_amount='10.00', payment_method='cash', delivery_address={'street': '1 rue'},
+            delivery_latitude=48.85, delivery_longitude=2.35
+        )
+        menu = [item for item in self.menu if item.restaurant_id == restaurant.pk]
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menu_item=menu[line % 4], quantity=1, unit_price='10.00', total_price='10.00')
+            for line in range(lines)
+        ])
+        return order
+
+    def list_queries(self, user):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/orders/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data['results']
+
+    def test_list_query_count_is_constant(self):
+        for index in range(2):
+            self.create_order(index, lines=1)
+        few, _ = self.list_queries(self.customer)
+        for index in range(2, 20):
+            self.create_order(index, lines=index % 5 + 1)
+        many, results = self.list_queries(self.customer)
+
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 2)  # la page (+ une ligne pour savoir s'il y a une suite)
+        self.assertEqual(len(results), 20)
+        self.assertEqual(
+            sorted(result['items_count'] for result in results), sorted([1, 1] + [index % 5 + 1 for index in range(2, 20)])
+        )
+        self.assertEqual(results[0]['restaurant_name'], 'Restaurant 1')
+        self.assertEqual(self.list_queries(self.driver)[0], many)
+
+    def test_retrieve_query_count_is_constant(self):
+        small = self.create_order(0, lines=1)
+        large = self.create_order(1, lines=12)
+        DeliveryTracking.objects.create(order=large, driver=self.driver, current_latitude=48.86)
+        self.client.force_authenticate(self.customer)
+
+        counts = []
+        for order in (small, large):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(f'/api/v1/orders/{order.pk}/')
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[1], 2)  # commande (restaurant, suivi) + lignes (plat, catégorie)
+
+        self.assertEqual(len(response.data['items']), 12)
+        self.assertEqual(response.data['items'][0]['menu_item_details']['category_name'], 'Catégorie 0')
+        self.assertEqual(response.data['tracking']['current_latitude'], 48.86)
+        self.assertEqual(response.data['restaurant_details']['name'], 'Restaurant 1')
+
+
+class OrderTransitionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user(
+            username='client', email='client@example.com', password='clientpass123'
+        )
+        self.driver = User.objects.create_user(
+            username='livreur', email='livreur@example.com', password='livreurpass123', user_type='driver'
+        )
+        self.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='ownerpass123', user_type='restaurant'
+        )
+        restaurant = Restaurant.objects.create(
+            owner=self.owner, name='Test Restaurant', address='123 Test St', latitude=48.8566,
+            longitude=2.3522, phone_number='+33123456789'
+        )
+        self.order = Order.objects.create(
+            customer=self.customer, driver=self.driver, restaurant=restaurant, subtotal='10.00',
+            total_amount='10.00', payment_method='cash', delivery_address={'street': '1 rue'},
+            delivery_latitude=48.85, delivery_longitude=2.35, status='confirmed'
+        )
+        self.client = APIClient()
+        self.events = []
+        order_status_changed.connect(self.record, sender=Order)
+        self.addCleanup(order_status_changed.disconnect, self.record, sender=Order)
+
+    def record(self, sender, order_id, status, **kwargs):
+        self.events.append(status)
+
+    def post(self, user, action, data=None):
+        self.client.force_authenticate(user)
+        return self.client.post(f'/api/v1/orders/{self.order.pk}/{action}/', data or {}, format='json')
+
+    def test_transition_is_one_conditional_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(transition_order(self.order.pk, 'picked_up'))
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('UPDATE'))
+
+        # Déjà récupérée : la même transition ne gagne plus et n'émet rien
+        self.assertFalse(transition_order(self.order.pk, 'picked_up'))
+        self.assertFalse(transition_order(self.order.pk, 'cancelled'))
+        self.assertEqual(self.events, ['picked_up'])
+
+    def test_cancel_after_pickup_loses(self):
+        self.assertEqual(self.post(self.driver, 'update_status', {'status': 'picked_up'}).status_code, 200)
+
+        response = self.post(self.customer, 'cancel')
+        self.assertEqual(response.status_code, 400)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'picked_up')
+        self.assertEqual(self.events, ['picked_up'])
+
+    def test_pickup_after_cancel_loses(self):
+        self.assertEqual(self.post(self.customer, 'cancel').status_code, 200)
+
+        response = self.post(self.driver, 'update_status', {'status': 'picked_up'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['status'], 'cancelled')
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'cancelled')
+        self.assertEqual(self.events, ['cancelled'])
+
+    def test_delivery_requires_pickup_and_sets_time(self):
+        self.assertEqual(self.post(self.driver, 'update_status', {'status': 'delivered'}).status_code, 409)
+        self.post(self.driver, 'update_status', {'status': 'picked_up'})
+        self.assertEqual(self.post(self.driver, 'update_status', {'status': 'delivered'}).status_code, 200)
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'delivered')
+        self.assertIsNotNone(self.order.actual_delivery_time)
+        self.assertEqual(self.events, ['picked_up', 'delivered'])
+
+    def test_update_status_permissions(self):
+        self.assertEqual(self.post(self.customer, 'update_status', {'status': 'picked_up'}).status_code, 403)
+        self.assertEqual(self.post(self.driver, 'update_status', {'status': 'cancelled'}).status_code, 400)
+
+        other = User.objects.create_user(
+            username='autre', email='autre@example.com', password='autrepass123', user_type='driver'
+        )
+        self.assertEqual(self.post(other, 'update_status', {'status': 'picked_up'}).status_code, 404)
+        self.client.force_authenticate(self.driver)
+        response = self.client.post('/api/v1/orders/pas-un-uuid/update_status/', {'status': 'picked_up'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.events, [])
+
+    def test_restaurant_confirmation_requests_a_driver(self):
+        Order.objects.filter(pk=self.order.pk).update(status='pending', driver=None)
+        with mock.patch.object(assign_driver, 'delay') as assign, \
+                mock.patch.object(send_order_notification, 'delay') as notify:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.post(self.owner, 'update_status', {'status': 'confirmed'}).status_code, 200)
+            assign.assert_called_once_with(str(self.order.pk))
+
+            # Livreur affecté par la tâche, puis commande prête : le livreur est prévenu
+            Order.objects.filter(pk=self.order.pk).update(driver=self.driver)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.post(self.owner, 'update_status', {'status': 'ready'}).status_code, 200)
+            notify.assert_called_once_with(str(self.order.pk), 'ready_for_pickup')
+
+        self.assertEqual(assign.call_count, 1)
+        self.assertEqual(self.events, ['confirmed', 'ready'])
+
+    def test_restaurant_transitions_are_limited_to_its_orders(self):
+        self.assertEqual(self.post(self.owner, 'update_status', {'status': 'picked_up'}).status_code, 400)
+        self.assertEqual(self.post(self.owner, 'update_status', {'status': 'confirmed'}).status_code, 409)
+
+        other = User.objects.create_user(
+            username='autre', email='autre@example.com', password='autrepass123', user_type='restaurant'
+        )
+        self.assertEqual(self.post(other, 'update_status', {'status': 'preparing'}).status_code, 404)
+        self.assertEqual(self.post(self.owner, 'update_status', {'status': 'preparing'}).status_code, 200)
+        self.assertEqual(self.events, ['preparing'])
+
+    def test_patch_cannot_bypass_transitions(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.patch(
+            f'/api/v1/orders/{self.order.pk}/',
+            {'status': 'delivered', 'total_amount': '0.01', 'payment_status': 'paid', 'customer_notes': 'Sonner'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'confirmed')
+        self.order.refresh_from_db()
+        self.assertEqual(
+            (self.order.status, self.order.total_amount, self.order.payment_status, self.order.customer_notes),
+            ('confirmed', Decimal('10.00'), 'pending', 'Sonner')
+        )
+
+    def test_stale_patch_keeps_concurrent_transition(self):
+        self.client.force_authenticate(self.customer)
+        stale = Order.objects.get(pk=self.order.pk)
+        transition_order(self.order.pk, 'picked_up')
+        with mock.patch.object(OrderViewSet, 'get_object', return_value=stale):
+            response = self.client.patch(
+                f'/api/v1/orders/{self.order.pk}/', {'customer_notes': 'Code 1234'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.customer_notes), ('picked_up', 'Code 1234'))
+
+    def test_side_effects_once_per_transition(self):
+        Order.objects.filter(pk=self.order.pk).update(status='pending')
+        with mock.patch.object(assign_driver, 'delay') as assign, \
+                mock.patch.object(send_order_notification, 'delay') as notify:
+            with self.captureOnCommitCallbacks(execute=True):
+                transition_order(self.order.pk, 'confirmed')
+                transition_order(self.order.pk, 'confirmed')
+            with self.captureOnCommitCallbacks(execute=True):
+                transition_order(self.order.pk, 'ready')
+                transition_order(self.order.pk, 'ready')
+
+        assign.assert_called_once_with(self.order.pk)
+        notify.assert_called_once_with(self.order.pk, 'ready_for_pickup')
@@ -0,0 +1,45 @@
+"""
+Machine à états des commandes.
+
+TRANSITIONS donne, pour chaque statut cible, les statuts depuis lesquels on
+peut l'atteindre. Une transition est un seul UPDATE conditionnel
+(`WHERE id = ... AND status IN (...)`) : quand deux acteurs tentent des
+transitions concurrentes (annulation du client, prise en charge du livreur),
+une seule modifie la ligne et l'autre constate 0 ligne modifiée. Aucun
+save() complet n'est fait : les effets (tâches, notifications) partent du
+signal order_status_changed, une seule fois par transition réellement
+effectuée.
+"""
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Order
+
+TRANSITIONS = {
+    'confirmed': ('pending',),
+    'preparing': ('confirmed',),
+    'ready': ('confirmed', 'preparing'),
+    'picked_up': ('confirmed', 'preparing', 'ready'),
+    'delivered': ('picked_up',),
+    'cancelled': ('pending', 'confirmed'),
+}
+
+# Envoyé avec order_id et status après chaque transition effectuée
+order_status_changed = Signal()
+
+
+def transition_order(order_id, status, **conditions):
+    """
+    Passe la commande au statut `status` si son statut actuel le permet (et si
+    `conditions` sont vérifiées, ex: driver=user). Retourne True si cette
+    transition a eu lieu, False si la commande était déjà ailleurs.
+    """
+    now = timezone.now()
+    values = {'status': status, 'updated_at': now}
+    if status == 'delivered':
+        values['actual_delivery_time'] = now
+
+    won = Order.objects.filter(pk=order_id, status__in=TRANSITIONS[status], **conditions).update(**values)
+    if won:
+        order_status_changed.send(sender=Order, order_id=order_id, status=status)
+    return bool(won)
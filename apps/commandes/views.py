@@ -1,16 +1,29 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.utils import timezone
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, OuterRef, Prefetch, Subquery, Value, prefetch_related_objects
+from django.db.models.functions import Coalesce
+from apps.core.idempotency import idempotent
+from apps.core.pagination import KeysetPagination
 
-from .models import Order
+from .models import Order, OrderItem
 from .serializers import OrderCreateSerializer, OrderListSerializer, OrderDetailSerializer
+from .transitions import transition_order
+
+# Statuts que chaque profil peut donner à ses commandes, et le lien qui les lui rattache
+ROLE_TRANSITIONS = {
+    'restaurant': (('confirmed', 'preparing', 'ready'), 'restaurant__owner'),
+    'driver': (('picked_up', 'delivered'), 'driver'),
+}
 
 
 class OrderViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status']
     ordering = ['-created_at']
@@ -19,12 +32,26 @@ class OrderViewSet(viewsets.ModelViewSet):
         """Chaque utilisateur ne voit que ses commandes"""
         user = self.request.user
         if user.user_type == 'customer':
-            return Order.objects.filter(customer=user)
+            queryset = Order.objects.filter(customer=user)
         elif user.user_type == 'driver':
-            return Order.objects.filter(driver=user)
+            queryset = Order.objects.filter(driver=user)
+        elif user.user_type == 'restaurant':
+            queryset = Order.objects.filter(restaurant__owner=user)
         else:
             return Order.objects.none()
 
+        # Relations chargées selon l'action : nombre de requêtes constant par page / commande
+        if self.action == 'list':
+            queryset = queryset.select_related('restaurant').annotate(items_count=Coalesce(Subquery(
+                OrderItem.objects.filter(order=OuterRef('pk'))
+                .order_by().values('order').annotate(total=Count('pk')).values('total')
+            ), Value(0)))
+        elif self.action == 'retrieve':
+            queryset = queryset.select_related('restaurant', 'tracking').prefetch_related(
+                Prefetch('items', queryset=OrderItem.objects.select_related('menu_item__category'))
+            )
+        return queryset
+
     def get_serializer_class(self):
         """Différencier les serializers selon l’action"""
         if self.action == 'list':
@@ -35,36 +62,60 @@ class OrderViewSet(viewsets.ModelViewSet):
             return OrderCreateSerializer
         return OrderDetailSerializer
 
+    def perform_create(self, serializer):
+        serializer.save(customer=self.request.user)
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+
+        # Réponse détaillée : les lignes et leurs plats sont relus en une requête
+        order = serializer.instance
+        prefetch_related_objects(
+            [order], Prefetch('items', queryset=OrderItem.objects.select_related('menu_item__category'))
+        )
+        detail_serializer = OrderDetailSerializer(order, context=self.get_serializer_context())
+        return Response(detail_serializer.data, status=status.HTTP_201_CREATED)
+
+    def apply_transition(self, pk, new_status, **conditions):
+        try:
+            return transition_order(pk, new_status, **conditions)
+        except DjangoValidationError:
+            # Identifiant mal formé : même réponse que get_object()
+            raise NotFound
+
     @action(detail=True, methods=['post'])
+    @idempotent
     def update_status(self, request, pk=None):
-        """Le livreur peut mettre à jour le statut de sa commande"""
-        order = self.get_object()
-        if request.user.user_type != 'driver' or order.driver != request.user:
+        """Le restaurant (confirmée, en préparation, prête) puis le livreur (récupérée, livrée) font avancer la commande"""
+        if request.user.user_type not in ROLE_TRANSITIONS:
             return Response({'error': 'Non autorisé'}, status=status.HTTP_403_FORBIDDEN)
 
+        allowed_statuses, owner_field = ROLE_TRANSITIONS[request.user.user_type]
         new_status = request.data.get('status')
-        allowed_statuses = ['picked_up', 'delivered']
-
         if new_status not in allowed_statuses:
             return Response({'error': 'Statut non autorisé'}, status=status.HTTP_400_BAD_REQUEST)
 
-        order.status = new_status
-        if new_status == 'delivered':
-            order.actual_delivery_time = timezone.now()
-        order.save()
+        # Un seul UPDATE conditionnel : la commande n'est relue qu'en cas de refus
+        if self.apply_transition(pk, new_status, **{owner_field: request.user}):
+            return Response({'message': f'Statut mis à jour en {new_status}'})
 
-        return Response({'message': f'Statut mis à jour en {new_status}'})
+        order = self.get_object()
+        return Response(
+            {'error': f'Impossible de passer de {order.status} à {new_status}', 'status': order.status},
+            status=status.HTTP_409_CONFLICT
+        )
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def cancel(self, request, pk=None):
         """Annulation de la commande par le client"""
-        order = self.get_object()
-        if (request.user == order.customer and
-                order.status in ['pending', 'confirmed']):
-            order.status = 'cancelled'
-            order.save()
+        if self.apply_transition(pk, 'cancelled', customer=request.user):
             return Response({'message': 'Commande annulée'})
 
+        self.get_object()  # 404 si la commande n'est pas visible
         return Response(
             {'error': 'Impossible d\'annuler cette commande'},
             status=status.HTTP_400_BAD_REQUEST
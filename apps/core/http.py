@@ -0,0 +1,39 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def conditional_get(get_versions):
+    """
+    Ajoute ETag / Last-Modified à une action de lecture.
+
+    `get_versions(view, request, **kwargs)` retourne des tampons de version
+    (entiers en nanosecondes) ou None. Si le client possède déjà la
+    représentation, un 304 est renvoyé sans exécuter la vue ni les serializers.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            versions = get_versions(self, request, **kwargs) if request.method in ('GET', 'HEAD') else None
+            if not versions:
+                return view_method(self, request, *args, **kwargs)
+
+            renderer = getattr(request, 'accepted_renderer', None)
+            raw = ':'.join(str(version) for version in versions)
+            raw = f"{raw}|{request.get_full_path()}|{getattr(renderer, 'format', '')}"
+            etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+            last_modified = max(versions) // 1_000_000_000
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,107 @@
+"""
+En-tête Idempotency-Key pour les actions qui modifient des données.
+
+Un client qui renvoie une requête (réseau mobile instable) avec la même clé
+reçoit la réponse enregistrée de la première exécution au lieu de relancer
+l'action. Les réponses sont rangées par utilisateur et par clé dans le cache
+`idempotency` (Redis dès que REDIS_HOST est défini, voir settings.CACHES),
+partagé par tous les workers : un renvoi qui arrive sur un autre processus
+retrouve la réponse ou le verrou de la première requête. Chaque entrée expire
+après IDEMPOTENCY_TTL. Un doublon qui arrive pendant l'exécution de la
+première requête attend sa réponse au lieu de s'exécuter ; le verrou dure
+settings.IDEMPOTENCY_LOCK_TIMEOUT, plus que le timeout des workers.
+"""
+import hashlib
+import json
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_CACHE = 'idempotency'
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENCY_TTL = 24 * 60 * 60  # réponses rejouables pendant 24 h
+IDEMPOTENCY_WAIT = 10  # attente maximale d'un doublon concurrent (secondes)
+
+
+def request_fingerprint(request):
+    """Empreinte de la requête : une clé réutilisée avec un autre contenu est refusée"""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    raw = json.dumps([request.method, request.path, data], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def replay(stored):
+    response = Response(stored['data'], status=stored['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view_method):
+    """Rejoue la réponse enregistrée pour un même (utilisateur, Idempotency-Key)"""
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return Response(
+                {"message": f"{IDEMPOTENCY_HEADER} ne doit pas dépasser {IDEMPOTENCY_KEY_MAX_LENGTH} caractères"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        store = caches[IDEMPOTENCY_CACHE]
+        scope = request.user.pk if request.user.is_authenticated else 'anonymous'
+        cache_key = f'idempotency:{scope}:{hashlib.sha256(key.encode()).hexdigest()}'
+        lock_key = f'{cache_key}:lock'
+        fingerprint = request_fingerprint(request)
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT
+        delay = 0.05
+
+        while True:
+            stored = store.get(cache_key)
+            if stored is not None:
+                if stored['fingerprint'] != fingerprint:
+                    return Response(
+                        {"message": f"Cette {IDEMPOTENCY_HEADER} a déjà servi pour une autre requête"},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                return replay(stored)
+
+            token = uuid.uuid4().hex
+            # Au-delà du timeout, une exécution bloquée est considérée abandonnée
+            if store.add(lock_key, token, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+                break
+
+            # Un doublon est en cours : on attend sa réponse plutôt que de relancer l'action
+            if time.monotonic() >= deadline:
+                response = Response(
+                    {"message": "Une requête identique est en cours de traitement"},
+                    status=status.HTTP_409_CONFLICT
+                )
+                response['Retry-After'] = '1'
+                return response
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+            # Les erreurs serveur ne sont pas figées : une nouvelle tentative pourra réussir
+            if response.status_code < 500:
+                store.set(cache_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                }, IDEMPOTENCY_TTL)
+            return response
+        finally:
+            if store.get(lock_key) == token:
+                store.delete(lock_key)
+    return wrapper
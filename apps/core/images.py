@@ -0,0 +1,145 @@
+"""
+Variantes d'images redimensionnées (thumb, card, full) en WebP et JPEG.
+
+Les images téléversées (souvent des photos de téléphone de plusieurs Mo)
+sont réduites en tâche de fond. L'orientation EXIF est appliquée puis les
+métadonnées sont supprimées. Les chemins des variantes sont enregistrés dans
+le champ JSON `image_variants` du modèle :
+
+    {"source": "menu_items/pizza.jpg",
+     "thumb": {"webp": "variants/menu_items/pizza-thumb.webp", "jpeg": "..."}, ...}
+
+`source` permet de détecter une image remplacée (variantes à régénérer).
+"""
+import posixpath
+from functools import partial
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+# Taille maximale (largeur, hauteur) de chaque variante, proportions conservées
+VARIANT_SIZES = {
+    'thumb': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+LIST_VARIANTS = ('thumb', 'card')
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+VARIANTS_DIR = 'variants'
+
+
+def needs_variants(instance, field_name='image'):
+    """Vrai si l'image a changé depuis la dernière génération de variantes"""
+    image = getattr(instance, field_name)
+    return (image.name or '') != (instance.image_variants or {}).get('source', '')
+
+
+def variant_name(source_name, variant, extension):
+    stem = posixpath.splitext(source_name)[0]
+    return posixpath.join(VARIANTS_DIR, f'{stem}-{variant}.{extension}')
+
+
+def render_variants(source):
+    """Ouvre l'image une seule fois et renvoie {(variante, format): octets}"""
+    with Image.open(source) as image:
+        # Décodage JPEG à échelle réduite quand la plus grande variante le permet
+        image.draft('RGB', max(VARIANT_SIZES.values()))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+        rendered = {}
+        for variant, size in sorted(VARIANT_SIZES.items(), key=lambda entry: entry[1], reverse=True):
+            # Chaque variante est réduite depuis la précédente (plus grande) : moins de pixels à filtrer
+            image = image.copy()
+            image.thumbnail(size, Image.Resampling.LANCZOS)
+            for extension, options in FORMATS.items():
+                output = BytesIO()
+                frame = image.convert('RGB') if options['format'] == 'JPEG' and image.mode != 'RGB' else image
+                # Aucune métadonnée n'est transmise à save() : l'EXIF est supprimé
+                frame.save(output, **options)
+                rendered[variant, extension] = output.getvalue()
+        return rendered
+
+
+def generate_variants(instance, field_name='image'):
+    """
+    Génère les variantes de l'image de `instance` et renvoie le dictionnaire à
+    enregistrer dans `image_variants` (vide si le modèle n'a pas d'image).
+    Les variantes de l'image précédente sont supprimées du stockage.
+    """
+    image = getattr(instance, field_name)
+    storage = image.storage
+    previous = instance.image_variants or {}
+    stale = {
+        path for variant in VARIANT_SIZES
+        for path in (previous.get(variant) or {}).values()
+    }
+
+    variants = {}
+    if image.name:
+        with image.open('rb') as source:
+            rendered = render_variants(source)
+        variants['source'] = image.name
+        for (variant, extension), content in rendered.items():
+            name = variant_name(image.name, variant, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            variants.setdefault(variant, {})[extension] = storage.save(name, ContentFile(content))
+
+    for path in stale - {path for variant in VARIANT_SIZES for path in variants.get(variant, {}).values()}:
+        storage.delete(path)
+    return variants
+
+
+def refresh_variants(model, pk, force=False):
+    """Régénère les variantes d'une ligne si son image a changé ; renvoie True si traitée"""
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None or not (force or needs_variants(instance)):
+        return False
+    instance.image_variants = generate_variants(instance)
+    # Passe par save() : les signaux habituels invalident les caches du modèle
+    instance.save(update_fields=['image_variants'])
+    return True
+
+
+def schedule_variants(task, instance):
+    """Planifie `task(label, pk)` après validation de la transaction si l'image a changé"""
+    if needs_variants(instance):
+        transaction.on_commit(partial(task.delay, instance._meta.label, instance.pk))
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Carte de type srcset : {"thumb": {"webp": url, "jpeg": url}, ...}.
+    `variants` limite les tailles exposées (les listes n'ont besoin que des vignettes).
+    """
+
+    def __init__(self, variants=None, field_name='image', **kwargs):
+        kwargs['read_only'] = True
+        self.variants = variants or tuple(VARIANT_SIZES)
+        self.image_field_name = field_name
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return instance
+
+    def to_representation(self, instance):
+        recorded = instance.image_variants or {}
+        image = getattr(instance, self.image_field_name)
+        if not image.name or recorded.get('source') != image.name:
+            return {}
+
+        request = self.context.get('request')
+        srcset = {}
+        for variant in self.variants:
+            for extension, path in (recorded.get(variant) or {}).items():
+                url = image.storage.url(path)
+                srcset.setdefault(variant, {})[extension] = request.build_absolute_uri(url) if request else url
+        return srcset
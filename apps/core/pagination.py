@@ -0,0 +1,134 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par curseur (keyset) sur un tuple de colonnes, par défaut
+    (created_at, id) décroissants.
+
+    Le curseur contient les valeurs de la dernière ligne vue : la page suivante
+    est lue par `WHERE (created_at, id) < (...)` sur un index composite, sans
+    OFFSET ni COUNT(*). Le temps de lecture ne dépend donc pas de la profondeur.
+    Les colonnes doivent former une clé unique (d'où l'id en dernier).
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = "Curseur invalide"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+        values, reverse = self.decode_cursor(request)
+
+        ordering = [self.flip(term) for term in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.after(ordering, values))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    @staticmethod
+    def flip(term):
+        return term[1:] if term.startswith('-') else f'-{term}'
+
+    @staticmethod
+    def after(ordering, values):
+        """Condition « ligne strictement après `values` » dans l'ordre donné"""
+        first = ordering[0].lstrip('-')
+        first_lookup = 'lte' if ordering[0].startswith('-') else 'gte'
+        condition = Q()
+        for index, term in enumerate(ordering):
+            lookup = 'lt' if term.startswith('-') else 'gt'
+            clause = Q(**{f'{term.lstrip("-")}__{lookup}': values[index]})
+            for previous, value in zip(ordering[:index], values):
+                clause &= Q(**{previous.lstrip('-'): value})
+            condition |= clause
+        # Borne redondante sur la première colonne : aide le planificateur à utiliser l'index
+        return Q(**{f'{first}__{first_lookup}': values[0]}) & condition
+
+    # Curseurs
+    def encode_cursor(self, row, reverse):
+        values = [
+            self.model._meta.get_field(term.lstrip('-')).value_to_string(row)
+            for term in self.ordering
+        ]
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            values = [
+                self.model._meta.get_field(term.lstrip('-')).to_python(value)
+                for term, value in zip(self.ordering, payload['v'], strict=True)
+            ]
+            return values, bool(payload['r'])
+        except (ValueError, KeyError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_link(self, row, reverse):
+        url = self.request.build_absolute_uri()
+        if row is None:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(row, reverse))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return self.get_link(None, reverse=True)
+        return self.get_link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
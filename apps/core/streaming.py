@@ -0,0 +1,77 @@
+"""
+Réponses JSON écrites au fil de l'eau.
+
+Pour les exports volumineux (catalogue complet d'un propriétaire), le
+queryset est parcouru par lots avec `.iterator(chunk_size=...)`, chaque lot
+est sérialisé puis envoyé avant de lire le suivant : la mémoire du worker ne
+dépend pas de la taille du catalogue. Les compteurs sont tenus pendant ce
+même parcours, sans requête COUNT(*) séparée.
+"""
+import json
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def encode(value):
+    # Même sortie que le JSONRenderer de DRF (compact, UTF-8)
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class SerializedStream:
+    """
+    Liste JSON produite lot par lot depuis un queryset ; `count` vaut le
+    nombre d'éléments écrits une fois le parcours terminé.
+    """
+
+    def __init__(self, queryset, serializer_class, context=None, chunk_size=500):
+        self.queryset = queryset
+        # Un seul serializer pour tous les lots : ses champs ne sont construits qu'une fois
+        self.serializer = serializer_class(many=True, context=context or {})
+        self.chunk_size = chunk_size
+        self.count = 0
+
+    def __iter__(self):
+        rows = self.queryset.iterator(chunk_size=self.chunk_size)
+        while chunk := list(islice(rows, self.chunk_size)):
+            data = self.serializer.to_representation(chunk)
+            self.count += len(data)
+            yield b','.join(encode(item) for item in data)
+
+
+def iter_json_array(stream):
+    yield b'['
+    first = True
+    for part in stream:
+        if not part:
+            continue
+        if not first:
+            yield b','
+        first = False
+        yield part
+    yield b']'
+
+
+def iter_json_object(fields):
+    """
+    Écrit un objet JSON depuis des paires (clé, valeur). Une valeur
+    SerializedStream est écrite au fil de l'eau ; une valeur appelable est
+    évaluée au moment d'être écrite (compteurs placés après une liste).
+    """
+    yield b'{'
+    for index, (key, value) in enumerate(fields):
+        yield (b',' if index else b'') + encode(key) + b':'
+        if callable(value):
+            value = value()
+        if isinstance(value, SerializedStream):
+            yield from iter_json_array(value)
+        else:
+            yield encode(value)
+    yield b'}'
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    def __init__(self, fields, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(iter_json_object(fields), **kwargs)
@@ -1,28 +1,230 @@
-from geopy.distance import geodesic
+from django.db.models import F, Value, FloatField
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
 import json
+import math
+import re
+import unicodedata
+import numpy as np
+
+# Rayon terrestre moyen (IUGG), en kilomètres
+EARTH_RADIUS_KM = 6371.0088
+
+# Ellipsoïde WGS84 (demi-grand axe en km, aplatissement)
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+
+# Précision des cellules geohash stockées sur les restaurants (~4.9 km x 4.9 km)
+GEO_CELL_PRECISION = 5
+
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
 
 def calculate_distance(lat1, lng1, lat2, lng2):
     """Calcule la distance entre deux points GPS"""
     try:
-        point1 = (float(lat1), float(lng1))
-        point2 = (float(lat2), float(lng2))
-        return geodesic(point1, point2).kilometers
+        return float(haversine_distances(float(lat1), float(lng1), [float(lat2)], [float(lng2)], ellipsoidal=True)[0])
     except (ValueError, TypeError):
         return None
 
 
+def _central_angle(lat1, lng1, lat2, lng2):
+    """Angle au centre (radians) entre des points en radians, formule de haversine"""
+    half_chord = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * np.arcsin(np.sqrt(np.clip(half_chord, 0.0, 1.0)))
+
+
+def _lambert_distance(lat1, lng1, lat2, lng2):
+    """Distance (km) sur l'ellipsoïde WGS84 par la formule de Lambert"""
+    beta1 = np.arctan((1 - WGS84_F) * np.tan(lat1))
+    beta2 = np.arctan((1 - WGS84_F) * np.tan(lat2))
+    sigma = _central_angle(beta1, lng1, beta2, lng2)
+
+    p = (beta1 + beta2) / 2
+    q = (beta2 - beta1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (sigma - np.sin(sigma)) * np.sin(p) ** 2 * np.cos(q) ** 2 / np.cos(sigma / 2) ** 2
+        y = (sigma + np.sin(sigma)) * np.cos(p) ** 2 * np.sin(q) ** 2 / np.sin(sigma / 2) ** 2
+        distance = WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y))
+    return np.where(sigma > 0, distance, 0.0)
+
+
+def haversine_distances(latitude, longitude, latitudes, longitudes, ellipsoidal=False):
+    """
+    Distances (km) entre un point d'origine et N points, en une seule passe NumPy.
+
+    Bornes d'erreur par rapport à la géodésique WGS84 (geopy/Karney) :
+    - sphère (défaut) : erreur relative <= 0.57 %, soit <= 57 m pour 10 km ;
+    - ellipsoidal=True (Lambert) : erreur <= 0.5 m jusqu'à 150 km
+      et <= 15 m jusqu'à 12 000 km (hors points quasi antipodaux).
+    """
+    lat1 = np.radians(np.asarray(latitude, dtype=float))
+    lng1 = np.radians(np.asarray(longitude, dtype=float))
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    lng2 = np.radians(np.asarray(longitudes, dtype=float))
+
+    if ellipsoidal:
+        return _lambert_distance(lat1, lng1, lat2, lng2)
+    return EARTH_RADIUS_KM * _central_angle(lat1, lng1, lat2, lng2)
+
+
+def haversine_matrix(latitudes1, longitudes1, latitudes2, longitudes2, ellipsoidal=False):
+    """Matrice M x N des distances (km) entre deux ensembles de points (mêmes bornes d'erreur)"""
+    lat1 = np.asarray(latitudes1, dtype=float)[:, np.newaxis]
+    lng1 = np.asarray(longitudes1, dtype=float)[:, np.newaxis]
+    return haversine_distances(lat1, lng1, latitudes2, longitudes2, ellipsoidal=ellipsoidal)
+
+
+def geohash_encode(latitude, longitude, precision=GEO_CELL_PRECISION):
+    """Encode une position GPS en geohash de la précision demandée"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(geohash) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            geohash.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(geohash)
+
+
+def geohash_cell_center(geohash):
+    """Centre (latitude, longitude) d'une cellule geohash"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        bits = _GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            target = lng_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            target[0 if (bits >> shift) & 1 else 1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
+
+
+def geohash_cell_size(precision=GEO_CELL_PRECISION):
+    """Retourne la taille (hauteur, largeur) d'une cellule geohash en degrés"""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Calcule la boîte englobante (min_lat, max_lat, min_lng, max_lng) d'un cercle.
+    Les longitudes valent None si la boîte couvre un pôle ou l'antiméridien.
+    """
+    angular_radius = radius_km / EARTH_RADIUS_KM
+    delta_lat = math.degrees(angular_radius)
+    min_lat = max(latitude - delta_lat, -90.0)
+    max_lat = min(latitude + delta_lat, 90.0)
+
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return min_lat, max_lat, None, None
+
+    ratio = math.sin(angular_radius) / math.cos(math.radians(latitude))
+    if ratio >= 1:
+        return min_lat, max_lat, None, None
+
+    delta_lng = math.degrees(math.asin(ratio))
+    min_lng = longitude - delta_lng
+    max_lng = longitude + delta_lng
+    if min_lng < -180.0 or max_lng > 180.0:
+        return min_lat, max_lat, None, None
+
+    return min_lat, max_lat, min_lng, max_lng
+
+
+def geohash_cells_in_box(min_lat, max_lat, min_lng, max_lng, precision=GEO_CELL_PRECISION, max_cells=64):
+    """
+    Liste les cellules geohash qui recouvrent une boîte englobante.
+    Retourne None si la boîte demande plus de `max_cells` cellules.
+    """
+    cell_height, cell_width = geohash_cell_size(precision)
+    rows = math.floor(max_lat / cell_height) - math.floor(min_lat / cell_height) + 1
+    columns = math.floor(max_lng / cell_width) - math.floor(min_lng / cell_width) + 1
+    if rows * columns > max_cells:
+        return None
+
+    def steps(start, stop, step):
+        values = []
+        value = start
+        while value < stop:
+            values.append(value)
+            value += step
+        values.append(stop)
+        return values
+
+    return {
+        geohash_encode(lat, lng, precision)
+        for lat in steps(min_lat, max_lat, cell_height)
+        for lng in steps(min_lng, max_lng, cell_width)
+    }
+
+
+def distance_expression(latitude, longitude, lat_field='latitude', lng_field='longitude'):
+    """Expression SQL (haversine) de la distance en km entre un point et les colonnes GPS"""
+    origin_lat = Value(math.radians(latitude), output_field=FloatField())
+    origin_cos = Value(math.cos(math.radians(latitude)), output_field=FloatField())
+    origin_lng = Value(math.radians(longitude), output_field=FloatField())
+    row_lat = Radians(F(lat_field))
+    row_lng = Radians(F(lng_field))
+
+    half_chord = (
+        Power(Sin((row_lat - origin_lat) / 2), 2)
+        + origin_cos * Cos(row_lat) * Power(Sin((row_lng - origin_lng) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Least(Sqrt(half_chord), Value(1.0, output_field=FloatField())))
+
+
 def calculate_delivery_fee(distance_km, base_fee=2.5, per_km_rate=0.5):
-    """Calcule les frais de livraison selon la distance"""
-    if distance_km <= 2:
-        return base_fee
-    return base_fee + ((distance_km - 2) * per_km_rate)
+    """Calcule les frais de livraison selon la distance (scalaires ou tableaux NumPy)"""
+    fee = np.asarray(base_fee, dtype=float) + np.maximum(np.asarray(distance_km, dtype=float) - 2, 0) * per_km_rate
+    return fee if np.ndim(fee) else float(fee)
 
 
 def estimate_delivery_time(distance_km, preparation_time=20):
-    """Estime le temps de livraison total"""
+    """Estime le temps de livraison total en minutes (scalaires ou tableaux NumPy)"""
     # Vitesse moyenne: 30km/h
-    travel_time = (distance_km / 30) * 60  # en minutes
-    return preparation_time + int(travel_time)
+    travel_time = np.asarray(distance_km, dtype=float) / 30 * 60  # en minutes
+    minutes = np.asarray(preparation_time) + travel_time.astype(int)
+    return minutes if np.ndim(minutes) else int(minutes)
+
+
+def normalize_text(text):
+    """Normalise un texte pour la recherche : minuscules, sans accents ni ponctuation"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = text.casefold().replace('œ', 'oe').replace('æ', 'ae')
+    return ' '.join(re.findall(r'[a-z0-9]+', text))
 
 
 def format_opening_hours():
@@ -35,4 +237,4 @@ def format_opening_hours():
         "friday": {"open": "09:00", "close": "23:00", "is_open": True},
         "saturday": {"open": "10:00", "close": "23:00", "is_open": True},
         "sunday": {"open": "10:00", "close": "21:00", "is_open": True}
-    }
\ No newline at end of file
+    }
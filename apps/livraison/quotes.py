@@ -0,0 +1,100 @@
+"""
+Devis de livraison groupés : frais, délai et couverture pour N restaurants.
+
+Les restaurants candidats sont lus en une requête (liste d'identifiants ou
+boîte englobante indexée), puis distances, frais et délais sont calculés en
+une seule passe NumPy. Le client est ramené au centre de sa cellule geohash
+(~150 m) : deux clients de la même cellule reçoivent le même devis, mémorisé
+quelques instants.
+"""
+import hashlib
+
+import numpy as np
+from django.core.cache import cache
+
+from apps.core.utils import (
+    bounding_box, calculate_delivery_fee, estimate_delivery_time, geohash_cell_center,
+    geohash_cells_in_box, geohash_encode, haversine_distances
+)
+from apps.restaurants.models import Restaurant
+
+QUOTE_CELL_PRECISION = 7
+QUOTE_CACHE_TIMEOUT = 60  # secondes
+QUOTE_MAX_RESTAURANTS = 100
+QUOTE_MAX_RADIUS_KM = 50
+DEFAULT_QUOTE_RADIUS_KM = 10
+QUOTE_FIELDS = (
+    'pk', 'name', 'latitude', 'longitude', 'delivery_fee', 'free_delivery_threshold',
+    'delivery_radius_km', 'estimated_delivery_time', 'is_accepting_orders'
+)
+
+
+def quote_cache_key(cell, restaurant_ids=None, radius=None, subtotal=None):
+    scope = ','.join(map(str, sorted(restaurant_ids))) if restaurant_ids else f'r{radius}'
+    digest = hashlib.md5(f'{scope}|{subtotal}'.encode()).hexdigest()
+    return f'delivery:quotes:{cell}:{digest}'
+
+
+def candidate_rows(latitude, longitude, restaurant_ids=None, radius=None):
+    """Restaurants actifs à chiffrer, en une requête"""
+    queryset = Restaurant.objects.filter(is_active=True)
+    if restaurant_ids:
+        queryset = queryset.filter(pk__in=restaurant_ids)
+    else:
+        min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius)
+        queryset = queryset.filter(latitude__range=(min_lat, max_lat))
+        if min_lng is not None:
+            queryset = queryset.filter(longitude__range=(min_lng, max_lng))
+            cells = geohash_cells_in_box(min_lat, max_lat, min_lng, max_lng)
+            if cells is not None:
+                queryset = queryset.filter(geo_cell__in=cells)
+    return list(queryset.order_by().values_list(*QUOTE_FIELDS))
+
+
+def compute_quotes(latitude, longitude, rows, radius=None, subtotal=None):
+    """Frais, délai et couverture de chaque restaurant, triés par distance"""
+    if not rows:
+        return []
+    columns = list(zip(*rows))
+    ids, names = columns[0], columns[1]
+    latitudes, longitudes, base_fees, thresholds, zones, preparation, accepting = (
+        np.asarray(column, dtype=float) for column in columns[2:]
+    )
+
+    distances = haversine_distances(latitude, longitude, latitudes, longitudes, ellipsoidal=True)
+    fees = calculate_delivery_fee(distances, base_fee=base_fees)
+    if subtotal is not None:
+        # Livraison offerte au-delà du seuil du restaurant (seuil nul : jamais offerte)
+        fees = np.where((thresholds > 0) & (subtotal >= thresholds), 0.0, fees)
+    etas = estimate_delivery_time(distances, preparation_time=preparation.astype(int))
+    in_zone = (distances <= zones) & (accepting > 0)
+
+    order = np.argsort(distances, kind='stable')
+    if radius is not None:
+        order = order[distances[order] <= radius]
+    return [
+        {
+            'restaurant_id': ids[index],
+            'name': names[index],
+            'distance_km': round(float(distances[index]), 2),
+            'delivery_fee': f'{fees[index]:.2f}',
+            'free_delivery_threshold': f'{thresholds[index]:.2f}',
+            'eta_minutes': int(etas[index]),
+            'in_zone': bool(in_zone[index]),
+            'is_accepting_orders': bool(accepting[index]),
+        }
+        for index in order
+    ]
+
+
+def delivery_quotes(latitude, longitude, restaurant_ids=None, radius=None, subtotal=None):
+    """Devis pour la cellule du client, mémorisés QUOTE_CACHE_TIMEOUT secondes"""
+    cell = geohash_encode(latitude, longitude, QUOTE_CELL_PRECISION)
+    key = quote_cache_key(cell, restaurant_ids, radius, subtotal)
+    quotes = cache.get(key)
+    if quotes is None:
+        center_lat, center_lng = geohash_cell_center(cell)
+        rows = candidate_rows(center_lat, center_lng, restaurant_ids, radius)
+        quotes = compute_quotes(center_lat, center_lng, rows, radius, subtotal)
+        cache.set(key, quotes, QUOTE_CACHE_TIMEOUT)
+    return cell, quotes
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import DeliveryTracking, DeliveryZone
+from .quotes import DEFAULT_QUOTE_RADIUS_KM, QUOTE_MAX_RADIUS_KM, QUOTE_MAX_RESTAURANTS
 from apps.commandes.serializers import OrderListSerializer
 from apps.restaurants.serializers import RestaurantListSerializer
 from django.contrib.auth import get_user_model
@@ -57,4 +58,26 @@ class DeliveryZoneSerializer(serializers.ModelSerializer):
             'delivery_fee',
             'estimated_time',
             'is_active',
-        ]
\ No newline at end of file
+        ]
+
+class DeliveryQuoteQuerySerializer(serializers.Serializer):
+    """Paramètres des devis : position du client et restaurants (liste ou rayon)"""
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    restaurants = serializers.CharField(required=False, help_text="Identifiants séparés par des virgules")
+    radius = serializers.FloatField(required=False, min_value=0.1, max_value=QUOTE_MAX_RADIUS_KM)
+    subtotal = serializers.DecimalField(required=False, max_digits=10, decimal_places=2, min_value=0)
+
+    def validate_restaurants(self, value):
+        try:
+            ids = sorted({int(part) for part in value.split(',') if part.strip()})
+        except ValueError:
+            raise serializers.ValidationError("Liste d'identifiants invalide (ex: 1,2,3)")
+        if len(ids) > QUOTE_MAX_RESTAURANTS:
+            raise serializers.ValidationError(f"{QUOTE_MAX_RESTAURANTS} restaurants au maximum")
+        return ids
+
+    def validate(self, data):
+        if not data.get('restaurants') and data.get('radius') is None:
+            data['radius'] = DEFAULT_QUOTE_RADIUS_KM
+        return data
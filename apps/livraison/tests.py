@@ -1,3 +1,106 @@
 from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from apps.core.utils import calculate_delivery_fee, calculate_distance, estimate_delivery_time
+from apps.restaurants.models import Restaurant
+from .quotes import compute_quotes, delivery_quotes
 
-# Create your tests here.
+User = get_user_model()
+
+
+class DeliveryQuoteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='ownerpass123',
+            user_type='restaurant'
+        )
+        # Client place de la République (Paris)
+        self.lat, self.lng = 48.8674, 2.3636
+        self.near = self.create_restaurant('Proche', 48.8600, 2.3600, delivery_fee='2.00', estimated_delivery_time=25)
+        self.far = self.create_restaurant('Loin', 48.9300, 2.3600, delivery_radius_km=3.0)
+        self.closed = self.create_restaurant('Fermé', 48.8650, 2.3700, is_accepting_orders=False)
+        self.remote = self.create_restaurant('Lyon', 45.7640, 4.8357)
+
+    def create_restaurant(self, name, latitude, longitude, **extra):
+        return Restaurant.objects.create(
+            owner=self.owner,
+            name=name,
+            address='1 Rue Test',
+            latitude=latitude,
+            longitude=longitude,
+            phone_number='+33123456789',
+            **extra
+        )
+
+    def test_vectorized_pass_matches_scalar_helpers(self):
+        rows = [
+            (1, 'A', 48.8600, 2.3600, 2.5, 0.0, 5.0, 20, True),
+            (2, 'B', 48.9300, 2.4000, 1.0, 0.0, 5.0, 35, True),
+        ]
+        quotes = {quote['restaurant_id']: quote for quote in compute_quotes(self.lat, self.lng, rows)}
+        for restaurant_id, _, latitude, longitude, base_fee, _, _, preparation, _ in rows:
+            distance = calculate_distance(self.lat, self.lng, latitude, longitude)
+            self.assertAlmostEqual(quotes[restaurant_id]['distance_km'], distance, delta=0.05)
+            self.assertEqual(
+                quotes[restaurant_id]['delivery_fee'],
+                f'{calculate_delivery_fee(quotes[restaurant_id]["distance_km"], base_fee=base_fee):.2f}'
+            )
+            self.assertAlmostEqual(
+                quotes[restaurant_id]['eta_minutes'], estimate_delivery_time(distance, preparation), delta=1
+            )
+
+    def test_quotes_by_restaurant_ids(self):
+        response = self.client.get('/api/v1/livraison/quotes/', {
+            'lat': self.lat, 'lng': self.lng,
+            'restaurants': f'{self.far.id},{self.near.id},{self.closed.id},999999'
+        })
+        self.assertEqual(response.status_code, 200)
+        quotes = response.data['quotes']
+        # Triés par distance
+        self.assertEqual([quote['restaurant_id'] for quote in quotes], [self.closed.id, self.near.id, self.far.id])
+        by_id = {quote['restaurant_id']: quote for quote in quotes}
+        self.assertTrue(by_id[self.near.id]['in_zone'])
+        self.assertEqual(by_id[self.near.id]['delivery_fee'], '2.00')
+        self.assertGreaterEqual(by_id[self.near.id]['eta_minutes'], 25)
+        # Hors rayon de livraison / ne prend pas de commandes
+        self.assertFalse(by_id[self.far.id]['in_zone'])
+        self.assertFalse(by_id[self.closed.id]['in_zone'])
+        self.assertEqual(response.data['missing'], [999999])
+
+    def test_quotes_by_radius(self):
+        response = self.client.get('/api/v1/livraison/quotes/', {'lat': self.lat, 'lng': self.lng, 'radius': 5})
+        self.assertEqual(response.status_code, 200)
+        ids = {quote['restaurant_id'] for quote in response.data['quotes']}
+        self.assertEqual(ids, {self.near.id, self.closed.id})
+        self.assertNotIn('missing', response.data)
+
+    def test_free_delivery_threshold(self):
+        self.near.free_delivery_threshold = 20
+        self.near.save()
+        response = self.client.get('/api/v1/livraison/quotes/', {
+            'lat': self.lat, 'lng': self.lng, 'restaurants': str(self.near.id), 'subtotal': '25.00'
+        })
+        self.assertEqual(response.data['quotes'][0]['delivery_fee'], '0.00')
+
+    def test_same_cell_is_memoized(self):
+        cell, quotes = delivery_quotes(self.lat, self.lng, radius=5)
+        # Un voisin à quelques mètres tombe dans la même cellule : aucune requête
+        with self.assertNumQueries(0):
+            other_cell, other_quotes = delivery_quotes(self.lat + 0.00001, self.lng, radius=5)
+        self.assertEqual(cell, other_cell)
+        self.assertEqual(quotes, other_quotes)
+
+    def test_invalid_parameters(self):
+        for params in (
+            {'lng': self.lng},
+            {'lat': 100, 'lng': self.lng},
+            {'lat': self.lat, 'lng': self.lng, 'restaurants': 'a,b'},
+            {'lat': self.lat, 'lng': self.lng, 'radius': 500},
+        ):
+            response = self.client.get('/api/v1/livraison/quotes/', params)
+            self.assertEqual(response.status_code, 400, params)
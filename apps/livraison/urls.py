@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DeliveryTrackingViewSet, DeliveryZoneViewSet
+from .views import DeliveryQuoteViewSet, DeliveryTrackingViewSet, DeliveryZoneViewSet
 
 router = DefaultRouter()
 router.register(r'tracking', DeliveryTrackingViewSet, basename='tracking')
 router.register(r'delivery-zones', DeliveryZoneViewSet, basename='delivery-zone')
+router.register(r'quotes', DeliveryQuoteViewSet, basename='delivery-quote')
 
 urlpatterns = [
     path('', include(router.urls)),
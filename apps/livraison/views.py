@@ -1,11 +1,13 @@
 from rest_framework import viewsets, status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.utils import timezone
 
 from .models import DeliveryTracking, DeliveryZone
+from .quotes import delivery_quotes
 from .serializers import (
+    DeliveryQuoteQuerySerializer,
     DeliveryTrackingSerializer,
     DeliveryTrackingUpdateSerializer,
     DeliveryZoneSerializer
@@ -41,3 +43,27 @@ class DeliveryZoneViewSet(viewsets.ModelViewSet):
     queryset = DeliveryZone.objects.all()
     serializer_class = DeliveryZoneSerializer
     permission_classes = [IsAuthenticated]
+
+
+class DeliveryQuoteViewSet(viewsets.ViewSet):
+    """Frais, délai estimé et couverture de plusieurs restaurants en une requête"""
+    permission_classes = [AllowAny]
+
+    def list(self, request):
+        params = DeliveryQuoteQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        restaurant_ids = data.get('restaurants')
+        subtotal = data.get('subtotal')
+        cell, quotes = delivery_quotes(
+            data['lat'], data['lng'],
+            restaurant_ids=restaurant_ids,
+            radius=None if restaurant_ids else data['radius'],
+            subtotal=float(subtotal) if subtotal is not None else None
+        )
+
+        response = {"cell": cell, "quotes": quotes, "count": len(quotes)}
+        if restaurant_ids:
+            response["missing"] = sorted(set(restaurant_ids) - {quote['restaurant_id'] for quote in quotes})
+        return Response(response)
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketing', '0001_initial'),
+        ('promotions', '0002_keyset_pagination_indexes'),
+        ('restaurants', '0007_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='socialmediashare',
+            index=models.Index(fields=['shared_by', '-shared_at', '-id'], name='share_user_shared_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='socialmediashare',
+            index=models.Index(fields=['restaurant', '-shared_at', '-id'], name='share_restaurant_shared_idx'),
+        ),
+    ]
@@ -164,6 +164,10 @@ class SocialMediaShare(models.Model):
     
     class Meta:
         ordering = ['-shared_at']
+        indexes = [
+            models.Index(fields=['shared_by', '-shared_at', '-id'], name='share_user_shared_idx'),
+            models.Index(fields=['restaurant', '-shared_at', '-id'], name='share_restaurant_shared_idx'),
+        ]
         verbose_name = "Partage social"
         verbose_name_plural = "Partages sociaux"
     
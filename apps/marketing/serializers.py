@@ -28,6 +28,18 @@ class RestaurantAdvertisementSerializer(serializers.ModelSerializer):
         read_only_fields = ['impressions', 'clicks', 'conversions', 'created_at', 'updated_at']
 
 
+class RestaurantAdvertisementPublicSerializer(serializers.ModelSerializer):
+    """Publicité affichée aux clients (sans budget ni métriques)"""
+    restaurant_name = serializers.CharField(source='restaurant.name', read_only=True)
+
+    class Meta:
+        model = RestaurantAdvertisement
+        fields = [
+            'id', 'restaurant', 'restaurant_name', 'ad_type', 'title', 'description',
+            'image', 'start_date', 'end_date'
+        ]
+
+
 class SocialMediaShareSerializer(serializers.ModelSerializer):
     restaurant_name = serializers.CharField(source='restaurant.name', read_only=True)
     shared_by_username = serializers.CharField(source='shared_by.username', read_only=True, allow_null=True)
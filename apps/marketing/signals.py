@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.restaurants.cache import touch_home
+from .models import RestaurantAdvertisement
+
+# Compteurs incrémentés à chaque affichage ou clic : sans effet sur le fil d'accueil
+METRIC_FIELDS = {'impressions', 'clicks', 'conversions'}
+
+
+@receiver([post_save, post_delete], sender=RestaurantAdvertisement)
+def advertisement_changed(sender, instance, update_fields=None, **kwargs):
+    """Invalide la section publicités du fil d'accueil"""
+    if update_fields is None or not set(update_fields) <= METRIC_FIELDS:
+        touch_home('ads')
@@ -10,6 +10,7 @@ from .models import (
     NewsletterSubscription,
     PushNotificationCampaign
 )
+from apps.core.pagination import KeysetPagination
 from .serializers import (
     RestaurantAdvertisementSerializer,
     SocialMediaShareSerializer,
@@ -84,6 +85,10 @@ class RestaurantAdvertisementViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+class SocialMediaSharePagination(KeysetPagination):
+    ordering = ('-shared_at', '-id')
+
+
 class SocialMediaShareViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour gérer les partages sur les réseaux sociaux
@@ -91,6 +96,7 @@ class SocialMediaShareViewSet(viewsets.ModelViewSet):
     queryset = SocialMediaShare.objects.all()
     serializer_class = SocialMediaShareSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SocialMediaSharePagination
     
     def get_queryset(self):
         user = self.request.user
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commandes', '0002_keyset_pagination_indexes'),
+        ('promotions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='couponusage',
+            index=models.Index(fields=['user', '-used_at', '-id'], name='couponusage_user_used_idx'),
+        ),
+    ]
@@ -131,6 +131,9 @@ class CouponUsage(models.Model):
 
     class Meta:
         ordering = ['-used_at']
+        indexes = [
+            models.Index(fields=['user', '-used_at', '-id'], name='couponusage_user_used_idx'),
+        ]
         verbose_name = "Utilisation de coupon"
         verbose_name_plural = "Utilisations de coupons"
 
@@ -192,6 +195,7 @@ class Promotion(models.Model):
 
     # Image promotionnelle
     image = models.ImageField(upload_to='promotions/', blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     # Métadonnées
     created_at = models.DateTimeField(auto_now_add=True)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Coupon, CouponUsage, Promotion
 from apps.restaurants.serializers import MenuItemSerializer, RestaurantListSerializer
+from apps.core.images import ImageVariantsField
 
 
 class CouponSerializer(serializers.ModelSerializer):
@@ -42,6 +43,7 @@ class PromotionSerializer(serializers.ModelSerializer):
     restaurant_name = serializers.CharField(source='restaurant.name', read_only=True)
     applicable_items_data = MenuItemSerializer(source='applicable_items', many=True, read_only=True)
     is_valid_now = serializers.BooleanField(read_only=True)
+    image_srcset = ImageVariantsField()
 
     class Meta:
         model = Promotion
@@ -52,7 +54,7 @@ class PromotionSerializer(serializers.ModelSerializer):
             'applicable_items', 'applicable_items_data',
             'valid_from', 'valid_until', 'is_active',
             'applicable_days', 'start_time', 'end_time',
-            'priority', 'image', 'is_valid_now',
+            'priority', 'image', 'image_srcset', 'is_valid_now',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
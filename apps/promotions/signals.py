@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.core.images import schedule_variants
+from apps.restaurants.cache import touch_home
+from apps.restaurants.tasks import generate_image_variants
+from .models import Promotion
+
+
+@receiver(post_save, sender=Promotion)
+def promotion_image_changed(sender, instance, **kwargs):
+    """Génère les variantes redimensionnées de l'image promotionnelle"""
+    schedule_variants(generate_image_variants, instance)
+
+
+@receiver([post_save, post_delete], sender=Promotion)
+def promotion_changed(sender, instance, **kwargs):
+    """Invalide la section promotions du fil d'accueil"""
+    touch_home('promotions')
@@ -3,6 +3,8 @@ from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from rest_framework.test import APIClient
 from apps.restaurants.models import Restaurant
 from .models import Coupon, Promotion
 
@@ -80,3 +82,29 @@ class PromotionModelTest(TestCase):
         self.promotion.is_active = False
         self.promotion.save()
         self.assertFalse(self.promotion.is_valid_now())
+
+
+class CouponValidateIdempotencyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['idempotency'].clear()
+        self.user = User.objects.create_user(username='client', email='client@example.com', password='clientpass123')
+        Coupon.objects.create(
+            code='BIENVENUE',
+            discount_type='free_delivery',
+            discount_value=0,
+            valid_from=timezone.now() - timedelta(days=1),
+            valid_until=timezone.now() + timedelta(days=30)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_retry_is_answered_from_stored_response(self):
+        first = self.client.post('/api/v1/coupons/validate/', {'code': 'BIENVENUE'}, format='json',
+                                 HTTP_IDEMPOTENCY_KEY='coupon-1')
+        self.assertEqual(first.status_code, 200, first.data)
+        with self.assertNumQueries(0):
+            second = self.client.post('/api/v1/coupons/validate/', {'code': 'BIENVENUE'}, format='json',
+                                      HTTP_IDEMPOTENCY_KEY='coupon-1')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
@@ -10,6 +10,8 @@ from .serializers import (
     PromotionSerializer, ValidateCouponSerializer
 )
 from apps.restaurants.models import Restaurant
+from apps.core.idempotency import idempotent
+from apps.core.pagination import KeysetPagination
 import logging
 
 logger = logging.getLogger(__name__)
@@ -36,6 +38,7 @@ class CouponViewSet(viewsets.ModelViewSet):
         return queryset
 
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    @idempotent
     def validate(self, request):
         """Valider un code promo"""
         serializer = ValidateCouponSerializer(data=request.data)
@@ -176,10 +179,15 @@ class PromotionViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+class CouponUsagePagination(KeysetPagination):
+    ordering = ('-used_at', '-id')
+
+
 class CouponUsageViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = CouponUsage.objects.all()
     serializer_class = CouponUsageSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CouponUsagePagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['coupon', 'user', 'order']
 
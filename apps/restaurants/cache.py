@@ -0,0 +1,140 @@
+"""
+Cache du catalogue : compteurs de version et documents de menu.
+
+Chaque restaurant possède un tampon de version (ainsi que l'ensemble des
+catégories). Les documents sont rangés sous une clé qui contient ces tampons :
+modifier un restaurant, un plat ou une catégorie change la clé, ce qui
+invalide le document sans avoir à le supprimer.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+MENU_CACHE_TIMEOUT = 60 * 60  # 1 heure
+POPULAR_CACHE_TIMEOUT = 60 * 60  # 1 heure
+
+CATEGORIES_VERSION_KEY = 'catalog:categories:version'
+POPULARITY_VERSION_KEY = 'catalog:popularity:version'
+
+
+def restaurant_version_key(restaurant_id):
+    return f'catalog:restaurant:{restaurant_id}:version'
+
+
+def reviews_version_key(restaurant_id):
+    return f'catalog:restaurant:{restaurant_id}:reviews:version'
+
+
+def home_version_key(section):
+    return f'catalog:home:{section}:version'
+
+
+def _new_stamp():
+    # Tampon en nanosecondes : unique et utilisable comme date de modification
+    return time.time_ns()
+
+
+def get_versions(*keys):
+    """Lit plusieurs tampons de version en un seul appel au cache (créés si absents)"""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            stamp = _new_stamp()
+            if not cache.add(key, stamp, None):
+                stamp = cache.get(key, stamp)
+            versions[key] = stamp
+    return [versions[key] for key in keys]
+
+
+def _bump(keys):
+    def bump():
+        stamp = _new_stamp()
+        cache.set_many({key: stamp for key in keys}, None)
+
+    # Invalide tout de suite, puis à nouveau au commit pour qu'une lecture
+    # concurrente ne puisse pas remettre en cache des données non validées
+    bump()
+    transaction.on_commit(bump)
+
+
+def touch_restaurants(*restaurant_ids):
+    """Invalide le catalogue mis en cache des restaurants donnés"""
+    if restaurant_ids:
+        _bump([restaurant_version_key(restaurant_id) for restaurant_id in set(restaurant_ids)])
+
+
+def touch_reviews(*restaurant_ids):
+    """Invalide les avis mis en cache des restaurants donnés"""
+    if restaurant_ids:
+        _bump([reviews_version_key(restaurant_id) for restaurant_id in set(restaurant_ids)])
+
+
+def touch_categories():
+    """Invalide les données dépendant des catégories (tous les menus)"""
+    _bump([CATEGORIES_VERSION_KEY])
+
+
+def touch_popularity():
+    """Invalide les classements de popularité (après recalcul des scores)"""
+    _bump([POPULARITY_VERSION_KEY])
+
+
+def touch_home(*sections):
+    """Invalide les sections du fil d'accueil données, pour toutes les zones"""
+    if sections:
+        _bump([home_version_key(section) for section in set(sections)])
+
+
+def restaurant_versions(view, request, pk=None, **kwargs):
+    """Tampons du détail et du menu d'un restaurant : restaurant et catégories"""
+    try:
+        return get_versions(restaurant_version_key(int(pk)), CATEGORIES_VERSION_KEY)
+    except (TypeError, ValueError):
+        return None
+
+
+def reviews_versions(view, request, pk=None, **kwargs):
+    """Tampons des avis d'un restaurant"""
+    try:
+        return get_versions(restaurant_version_key(int(pk)), reviews_version_key(int(pk)))
+    except (TypeError, ValueError):
+        return None
+
+
+def categories_versions(view, request, **kwargs):
+    """Tampon de la liste et du détail des catégories"""
+    return get_versions(CATEGORIES_VERSION_KEY)
+
+
+def get_menu_document(restaurant_id, build):
+    """
+    Retourne le document de menu versionné d'un restaurant.
+    `build` n'est appelé (et la base interrogée) que si le document est absent.
+    """
+    restaurant_version, categories_version = get_versions(
+        restaurant_version_key(restaurant_id), CATEGORIES_VERSION_KEY
+    )
+    version = f'{restaurant_version}-{categories_version}'
+    key = f'catalog:menu:{restaurant_id}:{version}'
+
+    document = cache.get(key)
+    if document is None:
+        document = {'version': version, 'data': build()}
+        cache.set(key, document, MENU_CACHE_TIMEOUT)
+    return document
+
+
+def get_popular_ids(scope, build):
+    """
+    Retourne les identifiants classés des restaurants populaires d'une zone.
+    `build` n'est appelé que si le classement de la version courante est absent.
+    """
+    version, = get_versions(POPULARITY_VERSION_KEY)
+    key = f'catalog:popular:{scope}:{version}'
+
+    ids = cache.get(key)
+    if ids is None:
+        ids = build()
+        cache.set(key, ids, POPULAR_CACHE_TIMEOUT)
+    return ids
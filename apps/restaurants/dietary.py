@@ -0,0 +1,120 @@
+"""
+Allergènes et régimes alimentaires sous forme de masque de bits.
+
+`MenuItem.allergens` (liste libre de tags JSON) est compilé à l'enregistrement
+dans l'entier `MenuItem.allergen_mask` : un bit par tag connu. Les filtres
+« sans gluten ni fruits à coque », « végétarien », etc. deviennent un seul
+prédicat entier `allergen_mask & masque = 0`, sans décoder le JSON.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db.models import F
+
+from apps.core.utils import normalize_text
+
+# Ordre figé : la position donne le bit (ajouter en fin de liste uniquement)
+TAGS = (
+    # 14 allergènes à déclaration obligatoire (règlement UE 1169/2011)
+    'gluten', 'crustaceans', 'eggs', 'fish', 'peanuts', 'soy', 'milk', 'nuts',
+    'celery', 'mustard', 'sesame', 'sulphites', 'lupin', 'molluscs',
+    # Contenus utiles aux régimes
+    'meat', 'pork', 'alcohol', 'honey',
+)
+TAG_BITS = {tag: 1 << index for index, tag in enumerate(TAGS)}
+
+# Synonymes acceptés dans les données et les paramètres (forme normalisée)
+ALIASES = {
+    'ble': 'gluten', 'wheat': 'gluten',
+    'crustaces': 'crustaceans', 'crustacean': 'crustaceans',
+    'oeuf': 'eggs', 'oeufs': 'eggs', 'egg': 'eggs',
+    'poisson': 'fish', 'poissons': 'fish',
+    'arachide': 'peanuts', 'arachides': 'peanuts', 'cacahuete': 'peanuts', 'cacahuetes': 'peanuts', 'peanut': 'peanuts',
+    'soja': 'soy', 'soya': 'soy',
+    'lait': 'milk', 'lactose': 'milk', 'dairy': 'milk',
+    'fruits a coque': 'nuts', 'noix': 'nuts', 'nut': 'nuts', 'tree nuts': 'nuts',
+    'celeri': 'celery',
+    'moutarde': 'mustard',
+    'sulfites': 'sulphites', 'sulfite': 'sulphites', 'sulphite': 'sulphites',
+    'lupins': 'lupin',
+    'mollusques': 'molluscs', 'mollusque': 'molluscs', 'mollusks': 'molluscs',
+    'viande': 'meat', 'viandes': 'meat',
+    'porc': 'pork',
+    'alcool': 'alcohol',
+    'miel': 'honey',
+}
+
+# Régime -> tags qu'il exclut
+DIETS = {
+    'vegetarian': ('meat', 'pork', 'fish', 'crustaceans', 'molluscs'),
+    'vegan': ('meat', 'pork', 'fish', 'crustaceans', 'molluscs', 'eggs', 'milk', 'honey'),
+    'pescatarian': ('meat', 'pork'),
+    'halal': ('pork', 'alcohol'),
+    'gluten_free': ('gluten',),
+    'lactose_free': ('milk',),
+}
+DIET_ALIASES = {
+    'vegetarien': 'vegetarian', 'vegetalien': 'vegan', 'vegane': 'vegan',
+    'pescetarien': 'pescatarian', 'sans gluten': 'gluten_free', 'sans lactose': 'lactose_free',
+}
+
+
+def canonical_tag(tag):
+    """Tag canonique pour un libellé libre ('Fruits à coque' -> 'nuts'), None si inconnu"""
+    normalized = normalize_text(str(tag))
+    normalized = ALIASES.get(normalized, normalized.replace(' ', '_'))
+    return normalized if normalized in TAG_BITS else None
+
+
+def allergen_mask(allergens):
+    """Masque des tags connus d'une liste d'allergènes (les tags inconnus sont ignorés)"""
+    if not isinstance(allergens, (list, tuple)):
+        return 0
+    mask = 0
+    for tag in allergens:
+        canonical = canonical_tag(tag)
+        if canonical:
+            mask |= TAG_BITS[canonical]
+    return mask
+
+
+def parse_tags(value):
+    """'gluten, noix' -> masque ; ValueError si un tag est inconnu"""
+    names = [name for name in (value or '').split(',') if name.strip()]
+    unknown = [name.strip() for name in names if canonical_tag(name) is None]
+    if unknown:
+        raise ValueError(f"Allergènes inconnus : {', '.join(unknown)}")
+    return allergen_mask(names)
+
+
+def parse_diets(value):
+    """'vegetarian,halal' -> masque des tags exclus ; ValueError si un régime est inconnu"""
+    mask = 0
+    for name in (value or '').split(','):
+        if not name.strip():
+            continue
+        normalized = normalize_text(name)
+        diet = DIET_ALIASES.get(normalized, normalized.replace(' ', '_'))
+        if diet not in DIETS:
+            raise ValueError(f"Régime inconnu : {name.strip()} ({', '.join(DIETS)})")
+        mask |= reduce(or_, (TAG_BITS[tag] for tag in DIETS[diet]))
+    return mask
+
+
+def exclude_mask(queryset, mask):
+    """Plats ne contenant aucun des tags de `mask` : un seul prédicat entier"""
+    if not mask:
+        return queryset
+    return queryset.alias(allergen_conflicts=F('allergen_mask').bitand(mask)).filter(allergen_conflicts=0)
+
+
+def rebuild_allergen_masks(model, batch_size=1000):
+    """Recalcule allergen_mask de tous les plats (migration, changement de vocabulaire)"""
+    updated = []
+    for item in model.objects.only('pk', 'allergens', 'allergen_mask').iterator(chunk_size=batch_size):
+        mask = allergen_mask(item.allergens)
+        if mask != item.allergen_mask:
+            item.allergen_mask = mask
+            updated.append(item)
+    model.objects.bulk_update(updated, ['allergen_mask'], batch_size=batch_size)
+    return len(updated)
@@ -1,5 +1,28 @@
 import django_filters
-from .models import Restaurant, MenuItem
+from rest_framework.exceptions import ValidationError
+from apps.core.utils import bounding_box, distance_expression, geohash_cells_in_box
+from .dietary import exclude_mask, parse_diets, parse_tags
+from .models import Restaurant, MenuItem, RestaurantCategory
+from .opening_hours import filter_open
+
+
+def filter_nearby(queryset, latitude, longitude, radius):
+    """
+    Restaurants à moins de `radius` km, annotés de `distance_km`. Les candidats
+    sont d'abord réduits par les cellules geohash et la boîte englobante
+    (index), puis la distance exacte est calculée en SQL.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius)
+    queryset = queryset.filter(latitude__range=(min_lat, max_lat))
+    if min_lng is not None:
+        queryset = queryset.filter(longitude__range=(min_lng, max_lng))
+        cells = geohash_cells_in_box(min_lat, max_lat, min_lng, max_lng)
+        if cells is not None:
+            queryset = queryset.filter(geo_cell__in=cells)
+
+    return queryset.annotate(
+        distance_km=distance_expression(latitude, longitude)
+    ).filter(distance_km__lte=radius)
 
 
 class RestaurantFilter(django_filters.FilterSet):
@@ -7,26 +30,65 @@ class RestaurantFilter(django_filters.FilterSet):
     max_delivery_fee = django_filters.NumberFilter(field_name='delivery_fee', lookup_expr='lte')
     max_delivery_time = django_filters.NumberFilter(field_name='estimated_delivery_time', lookup_expr='lte')
     category = django_filters.CharFilter(method='filter_by_category')
+    open_now = django_filters.BooleanFilter(method='filter_open_now')
 
     class Meta:
         model = Restaurant
-        fields = ['is_accepting_orders', 'min_rating', 'max_delivery_fee', 'max_delivery_time']
+        fields = ['is_accepting_orders', 'min_rating', 'max_delivery_fee', 'max_delivery_time', 'open_now']
 
     def filter_by_category(self, queryset, name, value):
-        """Filtre les restaurants qui ont des plats dans une catégorie donnée"""
-        return queryset.filter(menu_items__category__name__icontains=value).distinct()
+        """Restaurants qui ont des plats dans une catégorie (identifiant ou nom)"""
+        if value.isdigit():
+            memberships = RestaurantCategory.objects.filter(category_id=value)
+        else:
+            memberships = RestaurantCategory.objects.filter(category__name__icontains=value)
+        # Semi-jointure sur la table d'appartenance : ni multiplication de lignes ni DISTINCT
+        return queryset.filter(pk__in=memberships.values('restaurant_id'))
+
+    def filter_open_now(self, queryset, name, value):
+        """Restaurants dont une plage d'ouverture contient l'heure locale courante"""
+        if value:
+            return filter_open(queryset)
+        return queryset
 
 
 class MenuItemFilter(django_filters.FilterSet):
     min_price = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
     max_price = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
     vegetarian = django_filters.BooleanFilter(method='filter_vegetarian')
+    exclude_allergens = django_filters.CharFilter(method='filter_exclude_allergens')
+    diet = django_filters.CharFilter(method='filter_diet')
 
     class Meta:
         model = MenuItem
-        fields = ['restaurant', 'category', 'is_available', 'min_price', 'max_price']
+        fields = [
+            'restaurant', 'category', 'is_available', 'min_price', 'max_price',
+            'vegetarian', 'exclude_allergens', 'diet'
+        ]
+
+    def filter_queryset(self, queryset):
+        # Tous les critères d'allergènes et de régime forment un seul masque
+        self.excluded_mask = 0
+        queryset = super().filter_queryset(queryset)
+        return exclude_mask(queryset, self.excluded_mask)
 
     def filter_vegetarian(self, queryset, name, value):
         if value:
-            return queryset.exclude(allergens__contains='meat')
+            self.excluded_mask |= parse_diets('vegetarian')
+        return queryset
+
+    def filter_exclude_allergens(self, queryset, name, value):
+        """?exclude_allergens=gluten,nuts : plats sans aucun de ces allergènes"""
+        try:
+            self.excluded_mask |= parse_tags(value)
+        except ValueError as error:
+            raise ValidationError({name: str(error)})
+        return queryset
+
+    def filter_diet(self, queryset, name, value):
+        """?diet=vegetarian,halal : plats compatibles avec tous ces régimes"""
+        try:
+            self.excluded_mask |= parse_diets(value)
+        except ValueError as error:
+            raise ValidationError({name: str(error)})
         return queryset
\ No newline at end of file
@@ -0,0 +1,252 @@
+"""
+Fil d'accueil de l'application mobile en une seule réponse.
+
+Restaurants populaires et proches, promotions en cours, publicités actives et
+catégories sont des sections indépendantes : chacune est mise en cache par
+zone (cellule geohash ou ville) avec sa propre durée et ses tampons de version
+(voir cache.py). Les sections absentes du cache sont construites en parallèle
+dans un pool de threads ; la durée de chaque section est renvoyée au client
+dans l'en-tête Server-Timing.
+
+Les sections sont sérialisées sans requête : les URL des médias restent
+relatives dans le cache et sont rendues absolues pour chaque réponse.
+
+Budget de connexions : chaque thread du pool ouvre sa propre connexion à la
+base, fermée après la construction. Un processus web peut donc tenir jusqu'à
+1 + HOME_WORKERS connexions (à multiplier par le nombre de workers Gunicorn
+pour dimensionner la base) ; le pool n'est sollicité que lorsqu'au moins deux
+sections manquent dans le cache.
+"""
+import hashlib
+import operator
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.utils import geohash_cell_center, geohash_encode
+from .cache import CATEGORIES_VERSION_KEY, POPULARITY_VERSION_KEY, get_versions, home_version_key
+from .filters import filter_nearby
+from .models import Category, Restaurant
+from .popularity import POPULAR_CELL_PRECISION, area_cells, popular_restaurants
+from .serializers import CategorySerializer, RestaurantListSerializer
+
+HOME_SECTION_LIMIT = 10
+HOME_NEARBY_RADIUS_KM = 5
+HOME_NEARBY_PRECISION = 7  # cellules d'environ 150 m
+HOME_WORKERS = 4  # connexions supplémentaires par processus au plus (voir plus haut)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=HOME_WORKERS, thread_name_prefix='home-feed')
+    return _executor
+
+
+class HomeSection:
+    """Une section du fil : zone de cache, durée, tampons de version et construction"""
+    name = None
+    timeout = 5 * 60
+    version_keys = ()
+    requires_position = False
+
+    def scope(self, params):
+        return 'all'
+
+    def build(self, params):
+        raise NotImplementedError
+
+    def cache_key(self, params, versions):
+        stamps = '-'.join(str(versions[key]) for key in self.version_keys)
+        return f'catalog:home:{self.name}:{self.scope(params)}:{stamps}'
+
+
+class AreaSection(HomeSection):
+    """Section propre à la zone de la position (bloc de cellules du classement de popularité)"""
+
+    def scope(self, params):
+        if params['lat'] is None:
+            return 'all'
+        return geohash_encode(params['lat'], params['lng'], POPULAR_CELL_PRECISION)
+
+
+class PopularSection(AreaSection):
+    name = 'popular'
+    timeout = 10 * 60
+    version_keys = (home_version_key('restaurants'), POPULARITY_VERSION_KEY)
+
+    def build(self, params):
+        restaurants = popular_restaurants(
+            Restaurant.objects.filter(is_active=True), HOME_SECTION_LIMIT, params['lat'], params['lng']
+        )
+        return RestaurantListSerializer(restaurants, many=True).data
+
+
+class NearbySection(HomeSection):
+    name = 'nearby'
+    timeout = 5 * 60
+    version_keys = (home_version_key('restaurants'),)
+    requires_position = True
+
+    def scope(self, params):
+        return geohash_encode(params['lat'], params['lng'], HOME_NEARBY_PRECISION)
+
+    def build(self, params):
+        # Calculé au centre de la cellule : même résultat pour tous ses clients
+        latitude, longitude = geohash_cell_center(self.scope(params))
+        restaurants = filter_nearby(
+            Restaurant.objects.filter(is_active=True), latitude, longitude, HOME_NEARBY_RADIUS_KM
+        ).order_by('distance_km')[:HOME_SECTION_LIMIT]
+        return RestaurantListSerializer(restaurants, many=True).data
+
+
+class PromotionsSection(AreaSection):
+    name = 'promotions'
+    timeout = 60  # les créneaux horaires des promotions changent au fil de la journée
+    version_keys = (home_version_key('promotions'),)
+
+    def build(self, params):
+        from apps.promotions.models import Promotion
+        from apps.promotions.serializers import PromotionSerializer
+
+        now = timezone.now()
+        promotions = Promotion.objects.filter(
+            is_active=True, valid_from__lte=now, valid_until__gte=now, restaurant__is_active=True
+        ).select_related('restaurant').prefetch_related('applicable_items__category')
+        if params['lat'] is not None:
+            cells = area_cells(params['lat'], params['lng'])
+            promotions = promotions.filter(
+                reduce(operator.or_, (Q(restaurant__geo_cell__startswith=cell) for cell in cells))
+            )
+        promotions = [promotion for promotion in promotions if promotion.is_valid_now()][:HOME_SECTION_LIMIT]
+        return PromotionSerializer(promotions, many=True).data
+
+
+class AdsSection(HomeSection):
+    name = 'ads'
+    timeout = 5 * 60
+    version_keys = (home_version_key('ads'),)
+
+    def scope(self, params):
+        if not params['city']:
+            return 'all'
+        return hashlib.md5(params['city'].encode()).hexdigest()
+
+    def build(self, params):
+        from apps.marketing.models import RestaurantAdvertisement
+        from apps.marketing.serializers import RestaurantAdvertisementPublicSerializer
+
+        now = timezone.now()
+        ads = RestaurantAdvertisement.objects.filter(
+            status='active', start_date__lte=now, end_date__gte=now, restaurant__is_active=True
+        ).select_related('restaurant')
+        if params['city']:
+            if connection.features.supports_json_field_contains:
+                targeted = Q(target_cities__contains=[params['city']])
+            else:
+                # SQLite : pas d'opérateur de contenance JSON, recherche dans le texte sérialisé
+                targeted = Q(target_cities__icontains=f'"{params["city"]}"')
+            ads = ads.filter(targeted | Q(target_cities=[]))
+        return RestaurantAdvertisementPublicSerializer(ads[:HOME_SECTION_LIMIT], many=True).data
+
+
+class CategoriesSection(HomeSection):
+    name = 'categories'
+    timeout = 60 * 60
+    version_keys = (CATEGORIES_VERSION_KEY,)
+
+    def build(self, params):
+        return CategorySerializer(Category.objects.filter(is_active=True), many=True).data
+
+
+SECTIONS = (PopularSection(), NearbySection(), PromotionsSection(), AdsSection(), CategoriesSection())
+
+
+def _timed_build(section, params):
+    start = time.perf_counter()
+    data = section.build(params)
+    return data, time.perf_counter() - start
+
+
+def _threaded_build(section, params):
+    try:
+        return _timed_build(section, params)
+    finally:
+        # Connexions ouvertes par ce thread : fermées pour ne pas les laisser fuir
+        connections.close_all()
+
+
+def build_missing(missing, params):
+    """Construit les sections manquantes, en parallèle quand il y en a plusieurs"""
+    # Dans une transaction ouverte, les autres threads ne verraient pas ses écritures
+    if len(missing) < 2 or connection.in_atomic_block:
+        return [_timed_build(section, params) for section in missing]
+    futures = [get_executor().submit(_threaded_build, section, params) for section in missing]
+    return [future.result() for future in futures]
+
+
+def absolute_media_urls(data, request):
+    """Copie de `data` où les URL relatives des médias pointent vers l'hôte de la requête"""
+    if isinstance(data, dict):
+        return {key: absolute_media_urls(value, request) for key, value in data.items()}
+    if isinstance(data, list):
+        return [absolute_media_urls(value, request) for value in data]
+    if isinstance(data, str) and data.startswith(settings.MEDIA_URL):
+        return request.build_absolute_uri(data)
+    return data
+
+
+def home_feed(latitude=None, longitude=None, city=None, request=None):
+    """
+    Retourne ({section: données}, [(section, durée en secondes, origine)]).
+    Tampons de version et sections en cache sont lus en deux appels au cache ;
+    avec `request`, les URL des médias sont rendues absolues.
+    """
+    params = {'lat': latitude, 'lng': longitude, 'city': city}
+    sections = [section for section in SECTIONS if latitude is not None or not section.requires_position]
+
+    start = time.perf_counter()
+    version_keys = sorted({key for section in sections for key in section.version_keys})
+    versions = dict(zip(version_keys, get_versions(*version_keys)))
+    keys = {section.name: section.cache_key(params, versions) for section in sections}
+    cached = cache.get_many(list(keys.values()))
+    timings = [('cache', time.perf_counter() - start, None)]
+
+    feed = {'nearby': []}
+    missing = []
+    for section in sections:
+        key = keys[section.name]
+        if key in cached:
+            feed[section.name] = cached[key]
+            timings.append((section.name, 0.0, 'hit'))
+        else:
+            missing.append(section)
+
+    for section, (data, duration) in zip(missing, build_missing(missing, params)):
+        cache.set(keys[section.name], data, section.timeout)
+        feed[section.name] = data
+        timings.append((section.name, duration, 'miss'))
+
+    feed = {section.name: feed[section.name] for section in SECTIONS}
+    if request is not None:
+        feed = absolute_media_urls(feed, request)
+    return feed, timings
+
+
+def server_timing(timings):
+    """Valeur de l'en-tête Server-Timing (durées en millisecondes)"""
+    entries = []
+    for name, duration, origin in timings:
+        entry = f'{name};dur={duration * 1000:.1f}'
+        if origin:
+            entry += f';desc="{origin}"'
+        entries.append(entry)
+    return ', '.join(entries)
@@ -0,0 +1,233 @@
+"""
+Import en masse de plats depuis un fichier CSV ou JSON lines.
+
+Le fichier est lu ligne à ligne et traité par lots de CHUNK_SIZE lignes :
+- la propriété des restaurants est vérifiée une fois par restaurant distinct ;
+- les catégories d'un lot sont vérifiées en une requête ;
+- les lignes valides sont insérées par bulk_create, le tout dans une transaction.
+
+En mode strict (par défaut) la moindre ligne invalide annule tout l'import ;
+en mode partiel les lignes valides sont conservées. Chaque erreur est rapportée
+avec son numéro de ligne.
+
+Pendant un import en tâche de fond, la progression est publiée dans le cache
+partagé et non sur le MenuImportJob : une écriture en base resterait invisible
+des autres connexions jusqu'au commit de la transaction d'import.
+"""
+import codecs
+import csv
+import json
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from apps.search.indexing import index_menu_items
+from .cache import touch_restaurants
+from .dietary import allergen_mask
+from .membership import refresh_category_memberships
+from .models import Category, MenuImportJob, MenuItem, Restaurant
+
+CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ('csv', 'jsonl')
+JSON_FIELDS = ('options', 'allergens')
+ALIASES = {'restaurant': 'restaurant_id', 'category': 'category_id'}
+PROGRESS_TIMEOUT = 24 * 60 * 60
+
+
+class MenuItemImportSerializer(serializers.ModelSerializer):
+    """Validation d'une ligne (sans requête : les relations sont vérifiées par lot)"""
+    restaurant_id = serializers.IntegerField()
+    category_id = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = MenuItem
+        fields = [
+            'restaurant_id', 'category_id', 'name', 'description', 'price', 'is_available',
+            'preparation_time', 'has_options', 'options', 'calories', 'allergens'
+        ]
+
+
+def detect_format(filename, declared=None):
+    file_format = (declared or filename.rsplit('.', 1)[-1]).lower()
+    if file_format in ('json', 'ndjson'):
+        file_format = 'jsonl'
+    if file_format not in FORMATS:
+        raise ValueError("Format non supporté : utilisez un fichier .csv ou .jsonl")
+    return file_format
+
+
+def iter_rows(binary_file, file_format):
+    """Lit le fichier en flux : (numéro de ligne, données ou None, erreur ou None)"""
+    text = codecs.getreader('utf-8-sig')(binary_file)
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            data = {key: value for key, value in row.items() if key and value not in ('', None)}
+            try:
+                for field in JSON_FIELDS:
+                    if field in data:
+                        data[field] = json.loads(data[field])
+            except ValueError:
+                yield reader.line_num, None, {field: ["JSON invalide"]}
+                continue
+            yield reader.line_num, data, None
+    else:
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                yield line_number, None, {'non_field_errors': ["JSON invalide"]}
+                continue
+            if not isinstance(data, dict):
+                yield line_number, None, {'non_field_errors': ["Un objet JSON est attendu"]}
+                continue
+            yield line_number, data, None
+
+
+class MenuImporter:
+    def __init__(self, user, partial=False, chunk_size=CHUNK_SIZE):
+        self.user = user
+        self.partial = partial
+        self.chunk_size = chunk_size
+        self.owned = set()
+        self.checked = set()
+        self.processed = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        self.touched_restaurants = set()
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line, 'errors': errors})
+
+    def run(self, rows, progress=None):
+        """Importe les lignes ; `progress(importer)` est appelé après chaque lot"""
+        with transaction.atomic():
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= self.chunk_size:
+                    self.process_chunk(chunk)
+                    chunk = []
+                    if progress:
+                        progress(self)
+            if chunk:
+                self.process_chunk(chunk)
+
+            if self.error_count and not self.partial:
+                transaction.set_rollback(True)
+                self.created = 0
+            else:
+                refresh_category_memberships(*self.touched_restaurants)
+                touch_restaurants(*self.touched_restaurants)
+        if progress:
+            progress(self)
+        return self.report()
+
+    def process_chunk(self, chunk):
+        self.processed += len(chunk)
+        valid = []
+        for line, data, error in chunk:
+            if error:
+                self.add_error(line, error)
+                continue
+            data = {ALIASES.get(key, key): value for key, value in data.items()}
+            serializer = MenuItemImportSerializer(data=data)
+            if serializer.is_valid():
+                valid.append((line, serializer.validated_data))
+            else:
+                self.add_error(line, serializer.errors)
+
+        # Propriété : une requête pour les restaurants pas encore vus
+        restaurant_ids = {data['restaurant_id'] for _, data in valid} - self.checked
+        if restaurant_ids:
+            self.owned |= set(
+                Restaurant.objects.filter(pk__in=restaurant_ids, owner=self.user).values_list('pk', flat=True)
+            )
+            self.checked |= restaurant_ids
+        category_ids = {data['category_id'] for _, data in valid if data.get('category_id')}
+        categories = set(Category.objects.filter(pk__in=category_ids).values_list('pk', flat=True)) \
+            if category_ids else set()
+
+        items = []
+        for line, data in valid:
+            if data['restaurant_id'] not in self.owned:
+                self.add_error(line, {'restaurant_id': ["Vous n'êtes pas propriétaire de ce restaurant"]})
+            elif data.get('category_id') and data['category_id'] not in categories:
+                self.add_error(line, {'category_id': ["Catégorie inconnue"]})
+            else:
+                # bulk_create n'appelle pas save() : masque d'allergènes calculé ici
+                items.append(MenuItem(**data, allergen_mask=allergen_mask(data.get('allergens'))))
+
+        if items and (self.partial or not self.error_count):
+            created = MenuItem.objects.bulk_create(items, batch_size=self.chunk_size)
+            # bulk_create ne déclenche pas les signaux : indexer ici
+            index_menu_items(created, batch_size=self.chunk_size)
+            self.created += len(created)
+            self.touched_restaurants |= {item.restaurant_id for item in created}
+
+    def report(self):
+        return {
+            'processed_rows': self.processed,
+            'created': self.created,
+            'error_count': self.error_count,
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+        }
+
+
+def progress_key(job_id):
+    return f'menu-import:{job_id}:processed'
+
+
+def job_progress(job):
+    """Lignes traitées : progression publiée en cours d'import, sinon celle enregistrée sur le job"""
+    if job.status == 'running':
+        return cache.get(progress_key(job.pk), job.processed_rows)
+    return job.processed_rows
+
+
+def fail_import_job(job, error):
+    """Marque le job en échec et retire sa progression du cache"""
+    MenuImportJob.objects.filter(pk=job.pk).update(
+        status='failed', errors=[{'row': None, 'errors': {'file': [str(error)]}}], finished_at=timezone.now()
+    )
+    cache.delete(progress_key(job.pk))
+
+
+def run_import_job(job, chunk_size=CHUNK_SIZE):
+    """Exécute un MenuImportJob en publiant la progression dans le cache"""
+    MenuImportJob.objects.filter(pk=job.pk).update(status='running')
+
+    def progress(importer):
+        cache.set(progress_key(job.pk), importer.processed, PROGRESS_TIMEOUT)
+
+    try:
+        with job.file.open('rb') as binary_file:
+            report = MenuImporter(job.owner, partial=job.partial, chunk_size=chunk_size).run(
+                iter_rows(binary_file, job.file_format), progress=progress
+            )
+    except (UnicodeDecodeError, csv.Error) as error:
+        fail_import_job(job, error)
+        return None
+    except Exception as error:
+        # Erreur base ou stockage : le job ne doit pas rester bloqué en 'running'
+        fail_import_job(job, error)
+        raise
+
+    failed = report['error_count'] and not job.partial
+    MenuImportJob.objects.filter(pk=job.pk).update(
+        status='failed' if failed else 'done',
+        processed_rows=report['processed_rows'],
+        created_count=report['created'],
+        errors=report['errors'],
+        finished_at=timezone.now()
+    )
+    cache.delete(progress_key(job.pk))
+    return report
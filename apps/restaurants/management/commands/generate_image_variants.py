@@ -0,0 +1,62 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connections
+from apps.core.images import needs_variants, refresh_variants
+
+MODELS = ('restaurants.Restaurant', 'restaurants.MenuItem', 'restaurants.Category', 'promotions.Promotion')
+
+
+def _init_worker():
+    django.setup()
+    # Chaque processus ouvre ses propres connexions
+    connections.close_all()
+
+
+def _process(model_label, pk, force):
+    return refresh_variants(apps.get_model(model_label), pk, force=force)
+
+
+class Command(BaseCommand):
+    help = "Génère les variantes redimensionnées des images existantes (restaurants, plats, catégories, promotions)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Nombre de processus (1 : traitement dans le processus courant)")
+        parser.add_argument('--force', action='store_true', help="Régénérer même les variantes à jour")
+        parser.add_argument('--model', action='append', choices=MODELS, help="Limiter à ce modèle (répétable)")
+
+    def handle(self, *args, **options):
+        force = options['force']
+        jobs = []
+        for label in options['model'] or MODELS:
+            model = apps.get_model(label)
+            for instance in model._default_manager.exclude(image='').only('pk', 'image', 'image_variants').iterator():
+                if force or needs_variants(instance):
+                    jobs.append((label, instance.pk))
+        self.stdout.write(f"{len(jobs)} images à traiter")
+
+        done = failed = 0
+        if options['workers'] <= 1:
+            for label, pk in jobs:
+                try:
+                    done += _process(label, pk, force)
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f"{label} {pk} : {error}")
+        else:
+            # Le décodage et l'encodage sont liés au CPU : un processus par cœur
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as executor:
+                futures = {executor.submit(_process, label, pk, force): (label, pk) for label, pk in jobs}
+                for future in as_completed(futures):
+                    try:
+                        done += future.result()
+                    except Exception as error:
+                        failed += 1
+                        self.stderr.write(f"{futures[future][0]} {futures[future][1]} : {error}")
+
+        self.stdout.write(self.style.SUCCESS(f"Variantes générées pour {done} images ({failed} échecs)"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from apps.restaurants.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = "Recalcule la note moyenne et l'histogramme des notes de tous les restaurants"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = rebuild_rating_aggregates(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Agrégats recalculés pour {count} restaurants"))
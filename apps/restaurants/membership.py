@@ -0,0 +1,49 @@
+"""
+Appartenance restaurant -> catégorie, dénormalisée dans RestaurantCategory.
+
+Un restaurant appartient à une catégorie s'il a au moins un plat dans cette
+catégorie. La table est recalculée pour les restaurants dont les plats
+changent de catégorie (signaux, imports, mises à jour en masse), ce qui évite
+la jointure `menu_items__category` + DISTINCT sur les listes filtrées.
+"""
+from django.db import transaction
+from django.db.models import Count
+
+from .models import MenuItem, RestaurantCategory
+
+
+def refresh_category_memberships(*restaurant_ids):
+    """Recalcule les catégories (et leur nombre de plats) des restaurants donnés"""
+    restaurant_ids = {restaurant_id for restaurant_id in restaurant_ids if restaurant_id is not None}
+    if not restaurant_ids:
+        return
+
+    expected = {
+        (row['restaurant_id'], row['category_id']): row['item_count']
+        for row in MenuItem.objects.filter(restaurant_id__in=restaurant_ids, category__isnull=False)
+        .order_by().values('restaurant_id', 'category_id').annotate(item_count=Count('id'))
+    }
+
+    with transaction.atomic():
+        current = {
+            (membership.restaurant_id, membership.category_id): membership
+            for membership in RestaurantCategory.objects.select_for_update().filter(restaurant_id__in=restaurant_ids)
+        }
+        stale = [membership.pk for key, membership in current.items() if key not in expected]
+        changed = []
+        for key, item_count in expected.items():
+            membership = current.get(key)
+            if membership is not None and membership.item_count != item_count:
+                membership.item_count = item_count
+                changed.append(membership)
+
+        if stale:
+            RestaurantCategory.objects.filter(pk__in=stale).delete()
+        if changed:
+            RestaurantCategory.objects.bulk_update(changed, ['item_count'])
+        RestaurantCategory.objects.bulk_create([
+            RestaurantCategory(restaurant_id=restaurant_id, category_id=category_id, item_count=item_count)
+            for (restaurant_id, category_id), item_count in expected.items()
+            if (restaurant_id, category_id) not in current
+        ], ignore_conflicts=True)
+
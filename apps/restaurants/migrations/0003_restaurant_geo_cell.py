@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:49
+
+from django.db import migrations, models
+
+from apps.core.utils import geohash_encode
+
+
+def fill_geo_cells(apps, schema_editor):
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    restaurants = list(Restaurant.objects.only('id', 'latitude', 'longitude'))
+    for restaurant in restaurants:
+        restaurant.geo_cell = geohash_encode(restaurant.latitude, restaurant.longitude)
+    Restaurant.objects.bulk_update(restaurants, ['geo_cell'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0002_alter_restaurant_phone_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='geo_cell',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['latitude', 'longitude'], name='restaurant_lat_lng_idx'),
+        ),
+        migrations.RunPython(fill_geo_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:04
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    RestaurantReview = apps.get_model('restaurants', 'RestaurantReview')
+    stats = RestaurantReview.objects.values('restaurant_id').annotate(
+        total=Count('id'),
+        total_sum=Sum('rating'),
+        **{f'rating_{rating}_count': Count('id', filter=Q(rating=rating)) for rating in range(1, 6)}
+    )
+    for row in stats.iterator():
+        Restaurant.objects.filter(pk=row['restaurant_id']).update(
+            total_reviews=row['total'],
+            rating_sum=row['total_sum'],
+            average_rating=row['total_sum'] / row['total'],
+            **{f'rating_{rating}_count': row[f'rating_{rating}_count'] for rating in range(1, 6)}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0004_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='rating_1_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='rating_2_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='rating_3_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='rating_4_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='rating_5_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0005_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='popularity_score',
+            field=models.FloatField(db_index=True, default=0.0, editable=False),
+        ),
+    ]
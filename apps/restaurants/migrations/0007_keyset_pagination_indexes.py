@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0006_restaurant_popularity_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='restaurantreview',
+            index=models.Index(fields=['restaurant', '-created_at', '-id'], name='review_restaurant_created_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from apps.restaurants.opening_hours import compile_intervals
+
+
+def fill_opening_intervals(apps, schema_editor):
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    OpeningInterval = apps.get_model('restaurants', 'OpeningInterval')
+    intervals = []
+    for restaurant in Restaurant.objects.only('id', 'opening_hours').iterator():
+        try:
+            spans = compile_intervals(restaurant.opening_hours)
+        except ValueError:
+            continue
+        intervals.extend(
+            OpeningInterval(restaurant_id=restaurant.id, timezone=settings.TIME_ZONE, start_minute=start, end_minute=end)
+            for start, end in spans
+        )
+    OpeningInterval.objects.bulk_create(intervals, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0007_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='timezone',
+            field=models.CharField(blank=True, help_text='Fuseau IANA des horaires (défaut : TIME_ZONE)', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='OpeningInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timezone', models.CharField(max_length=64)),
+                ('start_minute', models.PositiveIntegerField()),
+                ('end_minute', models.PositiveIntegerField()),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_intervals', to='restaurants.restaurant')),
+            ],
+            options={
+                'ordering': ['restaurant', 'start_minute'],
+                'indexes': [models.Index(fields=['timezone', 'start_minute', 'end_minute'], name='opening_tz_range_idx')],
+            },
+        ),
+        migrations.RunPython(fill_opening_intervals, migrations.RunPython.noop),
+    ]
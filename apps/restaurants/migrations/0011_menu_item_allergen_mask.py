@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:27
+
+from django.db import migrations, models
+from apps.restaurants.dietary import rebuild_allergen_masks
+
+
+def compute_allergen_masks(apps, schema_editor):
+    rebuild_allergen_masks(apps.get_model('restaurants', 'MenuItem'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0010_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='allergen_mask',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['restaurant', 'allergen_mask'], name='menuitem_allergen_idx'),
+        ),
+        migrations.RunPython(compute_allergen_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_memberships(apps, schema_editor):
+    MenuItem = apps.get_model('restaurants', 'MenuItem')
+    RestaurantCategory = apps.get_model('restaurants', 'RestaurantCategory')
+    rows = MenuItem.objects.filter(category__isnull=False).order_by().values(
+        'restaurant_id', 'category_id'
+    ).annotate(item_count=Count('id'))
+    RestaurantCategory.objects.bulk_create([RestaurantCategory(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0011_menu_item_allergen_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='restaurant_memberships', to='restaurants.category')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_memberships', to='restaurants.restaurant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'restaurant'], name='category_restaurant_idx')],
+                'constraints': [models.UniqueConstraint(fields=('restaurant', 'category'), name='unique_restaurant_category')],
+            },
+        ),
+        migrations.RunPython(build_memberships, migrations.RunPython.noop),
+    ]
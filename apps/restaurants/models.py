@@ -1,29 +1,57 @@
+import uuid
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
+from apps.core.utils import geohash_encode
+from .dietary import allergen_mask
 User = get_user_model()
 
 
 class Restaurant(models.Model):
+    """
+    Restaurant d'un propriétaire.
+
+    Les agrégats d'avis et le score de popularité (AGGREGATE_FIELDS) ne sont
+    écrits que par des UPDATE ciblés (ratings.py, popularity.py). Un save()
+    sans update_fields sur une ligne existante est donc converti en save()
+    limité à tous les autres champs :
+    - les receveurs de post_save reçoivent cette liste dans update_fields ;
+    - une instance dont la ligne a été supprimée n'est pas recréée :
+      save() lève DatabaseError (utiliser force_insert=True pour la recréer).
+    """
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='restaurants')
     name = models.CharField(max_length=200,verbose_name="nom")
     description = models.TextField(blank=True,verbose_name="description")
     image = models.ImageField(upload_to='restaurants/', blank=True)
+    # Variantes redimensionnées de l'image (voir apps/core/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     address = models.TextField()
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # Cellule geohash de la position, tenue à jour à l'enregistrement (index spatial)
+    geo_cell = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     phone_number = models.CharField(max_length=20)
     email = models.EmailField(blank=True)
 
-    # Horaires (format JSON pour flexibilité)
+    # Horaires (format JSON pour flexibilité), compilés dans OpeningInterval
     opening_hours = models.JSONField(default=dict)
+    timezone = models.CharField(max_length=64, blank=True, help_text="Fuseau IANA des horaires (défaut : TIME_ZONE)")
 
     # Statut et ratings
     is_active = models.BooleanField(default=True)
     is_accepting_orders = models.BooleanField(default=True)
     average_rating = models.FloatField(default=0.0)
     total_reviews = models.IntegerField(default=0)
+    # Agrégats des avis tenus à jour de façon incrémentale (voir ratings.py)
+    rating_sum = models.IntegerField(default=0, editable=False)
+    rating_1_count = models.IntegerField(default=0, editable=False)
+    rating_2_count = models.IntegerField(default=0, editable=False)
+    rating_3_count = models.IntegerField(default=0, editable=False)
+    rating_4_count = models.IntegerField(default=0, editable=False)
+    rating_5_count = models.IntegerField(default=0, editable=False)
+    # Score de popularité amorti dans le temps, recalculé périodiquement (voir popularity.py)
+    popularity_score = models.FloatField(default=0.0, db_index=True, editable=False)
 
     # Livraison
     delivery_fee = models.DecimalField(max_digits=6, decimal_places=2, default=0.00)
@@ -36,15 +64,43 @@ class Restaurant(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='restaurant_lat_lng_idx'),
+            models.Index(fields=['updated_at'], name='restaurant_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    # Une instance périmée ne doit jamais réécrire ces colonnes (voir la docstring)
+    AGGREGATE_FIELDS = frozenset({
+        'average_rating', 'total_reviews', 'rating_sum', 'rating_1_count', 'rating_2_count',
+        'rating_3_count', 'rating_4_count', 'rating_5_count', 'popularity_score',
+    })
+
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geo_cell = geohash_encode(self.latitude, self.longitude)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+                kwargs['update_fields'] = set(update_fields) | {'geo_cell'}
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # Enregistrement complet d'une ligne existante : tout sauf les agrégats
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.AGGREGATE_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='categories/', blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     order = models.IntegerField(default=0)
 
@@ -63,6 +119,7 @@ class MenuItem(models.Model):
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=8, decimal_places=2)
     image = models.ImageField(upload_to='menu_items/', blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     # Disponibilité
     is_available = models.BooleanField(default=True, verbose_name="est disponible")
@@ -75,6 +132,8 @@ class MenuItem(models.Model):
     # Nutrition et allergènes
     calories = models.IntegerField(null=True, blank=True)
     allergens = models.JSONField(default=list, blank=True)
+    # Bits des allergènes et contenus connus, dérivés de `allergens` (voir dietary.py)
+    allergen_mask = models.BigIntegerField(default=0, editable=False)
 
     # Stats
     order_count = models.IntegerField(default=0)
@@ -85,10 +144,90 @@ class MenuItem(models.Model):
 
     class Meta:
         ordering = ['-order_count', 'name']
+        indexes = [
+            models.Index(fields=['updated_at'], name='menuitem_updated_idx'),
+            # Filtres d'allergènes par menu : un B-tree ne sait pas chercher `allergen_mask & m = 0`,
+            # l'index sert le préfixe restaurant_id et le masque est testé en filtre sur ses entrées
+            models.Index(fields=['restaurant', 'allergen_mask'], name='menuitem_allergen_idx'),
+        ]
 
     def __str__(self):
         return f"{self.restaurant.name} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        self.allergen_mask = allergen_mask(self.allergens)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'allergens' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'allergen_mask'}
+        super().save(*args, **kwargs)
+
+
+class RestaurantCategory(models.Model):
+    """Catégories proposées par un restaurant, dérivées de ses plats (voir membership.py)"""
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='category_memberships')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='restaurant_memberships')
+    item_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'category'], name='unique_restaurant_category'),
+        ]
+        indexes = [
+            models.Index(fields=['category', 'restaurant'], name='category_restaurant_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id} -> {self.category_id} ({self.item_count})"
+
+
+class MenuImportJob(models.Model):
+    """Import de plats exécuté en tâche de fond (fichiers volumineux)"""
+    STATUS_CHOICES = (
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échoué'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='menu_imports')
+    file = models.FileField(upload_to='imports/')
+    file_format = models.CharField(max_length=10)
+    partial = models.BooleanField(default=False, help_text="Importer les lignes valides malgré les erreurs")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    processed_rows = models.IntegerField(default=0)
+    created_count = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import {self.id} ({self.status})"
+
+
+class OpeningInterval(models.Model):
+    """
+    Plage d'ouverture compilée depuis Restaurant.opening_hours, en minutes
+    depuis lundi 00:00 (heure locale du restaurant, 0 à 10080). Les plages
+    qui passent minuit sont coupées ; celles de dimanche soir reprennent lundi 0.
+    """
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='opening_intervals')
+    timezone = models.CharField(max_length=64)
+    start_minute = models.PositiveIntegerField()
+    end_minute = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['restaurant', 'start_minute']
+        indexes = [
+            models.Index(fields=['timezone', 'start_minute', 'end_minute'], name='opening_tz_range_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id} : {self.start_minute}-{self.end_minute}"
+
 
 class RestaurantReview(models.Model):
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='reviews')
@@ -99,4 +238,7 @@ class RestaurantReview(models.Model):
 
     class Meta:
         unique_together = ['restaurant', 'customer']
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['restaurant', '-created_at', '-id'], name='review_restaurant_created_idx'),
+        ]
\ No newline at end of file
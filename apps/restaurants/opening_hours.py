@@ -0,0 +1,148 @@
+"""
+Horaires d'ouverture compilés.
+
+Restaurant.opening_hours reste le format saisi (JSON libre par jour) ; à
+l'enregistrement il est converti en plages OpeningInterval exprimées en
+minutes de la semaine, heure locale du restaurant. « Ouvert maintenant »
+devient une requête d'intervalle indexée : pour chaque fuseau utilisé, on
+calcule la minute courante locale puis start_minute <= m < end_minute.
+
+Formats acceptés par jour (clés en anglais ou en français) :
+  {"open": "11:00", "close": "23:00"}                fermeture après minuit possible ("01:00")
+  {"closed": true} / {"is_closed": true} / {"is_open": false}
+  [{"open": "11:00", "close": "14:30"}, {"open": "18:00", "close": "23:00"}]
+"""
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import OpeningInterval
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+TIMEZONES_CACHE_KEY = 'restaurants:opening:timezones'
+TIMEZONES_CACHE_TIMEOUT = 60 * 60  # 1 heure
+
+DAYS = {
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6,
+    'lundi': 0, 'mardi': 1, 'mercredi': 2, 'jeudi': 3, 'vendredi': 4, 'samedi': 5, 'dimanche': 6,
+}
+
+
+def parse_time(value):
+    """'HH:MM' -> minutes depuis minuit ('24:00' accepté)"""
+    try:
+        hours, minutes = str(value).split(':')
+        hours, minutes = int(hours), int(minutes)
+    except (TypeError, ValueError):
+        raise ValueError(f"Heure invalide : {value!r} (format HH:MM attendu)")
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or (hours == 24 and minutes):
+        raise ValueError(f"Heure invalide : {value!r}")
+    return hours * 60 + minutes
+
+
+def compile_intervals(opening_hours):
+    """Convertit le JSON des horaires en plages [(début, fin)] triées et fusionnées"""
+    if not opening_hours:
+        return []
+    if not isinstance(opening_hours, dict):
+        raise ValueError("Les horaires doivent être un objet par jour")
+
+    spans = []
+    for day_name, periods in opening_hours.items():
+        day = DAYS.get(str(day_name).strip().lower())
+        if day is None:
+            raise ValueError(f"Jour inconnu : {day_name!r}")
+        if isinstance(periods, dict):
+            periods = [periods]
+        if not isinstance(periods, list):
+            raise ValueError(f"Horaires invalides pour {day_name}")
+
+        for period in periods:
+            if not isinstance(period, dict):
+                raise ValueError(f"Horaires invalides pour {day_name}")
+            if period.get('closed') or period.get('is_closed') or period.get('is_open') is False:
+                continue
+            opens, closes = parse_time(period.get('open')), parse_time(period.get('close'))
+            if closes <= opens:
+                closes += MINUTES_PER_DAY  # Fermeture après minuit (ou 24 h si identiques)
+            start = day * MINUTES_PER_DAY + opens
+            end = day * MINUTES_PER_DAY + closes
+            if end > MINUTES_PER_WEEK:
+                # Dimanche soir -> lundi matin
+                spans.append((0, end - MINUTES_PER_WEEK))
+                end = MINUTES_PER_WEEK
+            spans.append((start, end))
+
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def restaurant_timezone(restaurant):
+    name = restaurant.timezone or settings.TIME_ZONE
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        name = settings.TIME_ZONE
+    return name
+
+
+def sync_opening_intervals(restaurant):
+    """Recompile les plages du restaurant si ses horaires ont changé"""
+    try:
+        intervals = compile_intervals(restaurant.opening_hours)
+    except ValueError:
+        intervals = []  # Horaires illisibles : le restaurant n'apparaît pas comme ouvert
+    tz_name = restaurant_timezone(restaurant)
+
+    existing = list(
+        OpeningInterval.objects.filter(restaurant=restaurant).values_list('timezone', 'start_minute', 'end_minute')
+    )
+    if existing == [(tz_name, start, end) for start, end in intervals]:
+        return
+
+    OpeningInterval.objects.filter(restaurant=restaurant).delete()
+    OpeningInterval.objects.bulk_create([
+        OpeningInterval(restaurant=restaurant, timezone=tz_name, start_minute=start, end_minute=end)
+        for start, end in intervals
+    ])
+    if tz_name not in (cache.get(TIMEZONES_CACHE_KEY) or ()):
+        cache.delete(TIMEZONES_CACHE_KEY)
+
+
+def used_timezones():
+    """Fuseaux présents dans les plages (en cache : il y en a très peu)"""
+    names = cache.get(TIMEZONES_CACHE_KEY)
+    if names is None:
+        names = sorted(OpeningInterval.objects.values_list('timezone', flat=True).distinct())
+        cache.set(TIMEZONES_CACHE_KEY, names, TIMEZONES_CACHE_TIMEOUT)
+    return names
+
+
+def minute_of_week(moment, tz_name):
+    local = moment.astimezone(ZoneInfo(tz_name))
+    return local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+
+def open_restaurant_ids(at=None):
+    """Sous-requête des restaurants ouverts à `at` (maintenant par défaut)"""
+    at = at or timezone.now()
+    intervals = OpeningInterval.objects.none()
+    for tz_name in used_timezones():
+        minute = minute_of_week(at, tz_name)
+        intervals |= OpeningInterval.objects.filter(
+            timezone=tz_name, start_minute__lte=minute, end_minute__gt=minute
+        )
+    return intervals.values('restaurant_id')
+
+
+def filter_open(queryset, at=None):
+    return queryset.filter(pk__in=open_restaurant_ids(at))
+
@@ -0,0 +1,124 @@
+"""
+Score de popularité des restaurants.
+
+Le score combine, sur les WINDOW_DAYS derniers jours, les commandes et les
+avis regroupés par jour et amortis avec une demi-vie de HALF_LIFE_DAYS
+(une commande d'il y a deux semaines compte moitié moins qu'aujourd'hui),
+plus le volume historique des plats (MenuItem.order_count, atténué par log).
+Il est recalculé par une tâche Celery périodique et stocké dans la colonne
+indexée Restaurant.popularity_score.
+"""
+import math
+import operator
+from datetime import timedelta
+from functools import reduce
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.core.utils import geohash_cell_size, geohash_cells_in_box, geohash_encode
+from .cache import get_popular_ids, touch_popularity
+from .models import Restaurant, RestaurantReview, MenuItem
+
+WINDOW_DAYS = 90
+HALF_LIFE_DAYS = 14
+ORDER_WEIGHT = 1.0
+REVIEW_WEIGHT = 2.0  # par avis 5 étoiles, proportionnel à la note
+MENU_WEIGHT = 0.5
+POPULAR_CELL_PRECISION = 4  # cellules d'environ 39 x 20 km
+POPULAR_MAX_LIMIT = 50
+
+
+def decay(age_days):
+    return 0.5 ** (age_days / HALF_LIFE_DAYS)
+
+
+def compute_popularity_scores(now=None):
+    """Calcule {restaurant_id: score} ; les agrégations par jour sont faites en SQL"""
+    from apps.commandes.models import Order
+
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    since = now - timedelta(days=WINDOW_DAYS)
+    scores = {}
+
+    orders = Order.objects.filter(created_at__gte=since).exclude(status='cancelled').annotate(
+        day=TruncDate('created_at')
+    ).values('restaurant_id', 'day').annotate(total=Count('id')).values_list('restaurant_id', 'day', 'total')
+    for restaurant_id, day, total in orders:
+        scores[restaurant_id] = scores.get(restaurant_id, 0.0) + ORDER_WEIGHT * total * decay((today - day).days)
+
+    reviews = RestaurantReview.objects.filter(created_at__gte=since).annotate(
+        day=TruncDate('created_at')
+    ).values('restaurant_id', 'day').annotate(total=Sum('rating')).values_list('restaurant_id', 'day', 'total')
+    for restaurant_id, day, total in reviews:
+        scores[restaurant_id] = scores.get(restaurant_id, 0.0) + \
+            REVIEW_WEIGHT * total / 5 * decay((today - day).days)
+
+    menu_orders = MenuItem.objects.values('restaurant_id').annotate(
+        total=Sum('order_count')
+    ).values_list('restaurant_id', 'total')
+    for restaurant_id, total in menu_orders:
+        if total:
+            scores[restaurant_id] = scores.get(restaurant_id, 0.0) + MENU_WEIGHT * math.log1p(total)
+
+    return scores
+
+
+def update_popularity_scores(batch_size=500):
+    """Enregistre les scores de tous les restaurants puis invalide les classements"""
+    scores = compute_popularity_scores()
+    ids = list(Restaurant.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), batch_size):
+        restaurants = list(Restaurant.objects.filter(pk__in=ids[start:start + batch_size]).only('pk'))
+        for restaurant in restaurants:
+            restaurant.popularity_score = round(scores.get(restaurant.pk, 0.0), 4)
+        # bulk_update : ni signaux ni updated_at, le catalogue reste en cache
+        Restaurant.objects.bulk_update(restaurants, ['popularity_score'])
+    touch_popularity()
+    return len(ids)
+
+
+def area_cells(latitude, longitude):
+    """Cellule de la position et ses voisines (bloc 3 x 3 de cellules POPULAR_CELL_PRECISION)"""
+    cell_height, cell_width = geohash_cell_size(POPULAR_CELL_PRECISION)
+    center_lat = (math.floor(latitude / cell_height) + 0.5) * cell_height
+    center_lng = (math.floor(longitude / cell_width) + 0.5) * cell_width
+    return geohash_cells_in_box(
+        max(center_lat - cell_height, -90.0), min(center_lat + cell_height, 90.0),
+        max(center_lng - cell_width, -180.0), min(center_lng + cell_width, 180.0),
+        precision=POPULAR_CELL_PRECISION
+    )
+
+
+def popular_restaurants(queryset, limit=10, latitude=None, longitude=None):
+    """
+    Top `limit` par score, éventuellement limité à la zone d'une position (classement en cache).
+    Sans aucun score calculé, les restaurants sont classés par note puis nombre d'avis.
+    """
+    scope = 'all'
+    cells = None
+    if latitude is not None and longitude is not None:
+        scope = geohash_encode(latitude, longitude, POPULAR_CELL_PRECISION)
+        cells = area_cells(latitude, longitude)
+
+    def build():
+        candidates = Restaurant.objects.filter(is_active=True)
+        if cells is not None:
+            candidates = candidates.filter(reduce(operator.or_, (Q(geo_cell__startswith=cell) for cell in cells)))
+        ids = list(
+            candidates.filter(popularity_score__gt=0).order_by('-popularity_score', 'pk')
+            .values_list('pk', flat=True)[:POPULAR_MAX_LIMIT]
+        )
+        if not ids:
+            # Aucun score calculé (déploiement neuf, avant la première tâche) : classement par les avis
+            ids = list(
+                candidates.order_by('-average_rating', '-total_reviews', 'pk')
+                .values_list('pk', flat=True)[:POPULAR_MAX_LIMIT]
+            )
+        return ids
+
+    ids = get_popular_ids(scope, build)[:limit]
+    restaurants = queryset.in_bulk(ids)
+    return [restaurants[pk] for pk in ids if pk in restaurants]
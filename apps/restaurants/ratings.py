@@ -0,0 +1,94 @@
+"""
+Agrégats des avis des restaurants.
+
+average_rating, total_reviews, rating_sum et l'histogramme rating_N_count
+sont mis à jour par des UPDATE relatifs (F()) à chaque création, modification
+ou suppression d'avis : pas de lecture préalable, donc pas de mise à jour
+perdue entre deux avis simultanés, et pas de AVG() sur tous les avis.
+"""
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .cache import touch_restaurants
+from .models import Restaurant, RestaurantReview
+
+RATINGS = range(1, 6)
+
+
+def rating_count_field(rating):
+    return f'rating_{rating}_count'
+
+
+def apply_rating_change(restaurant_id, old_rating=None, new_rating=None):
+    """Ajoute `new_rating` et/ou retire `old_rating` des agrégats du restaurant"""
+    if old_rating == new_rating:
+        return
+
+    count_delta = (new_rating is not None) - (old_rating is not None)
+    sum_delta = (new_rating or 0) - (old_rating or 0)
+    changes = {}
+    if old_rating is not None:
+        changes[rating_count_field(old_rating)] = F(rating_count_field(old_rating)) - 1
+    if new_rating is not None:
+        changes[rating_count_field(new_rating)] = F(rating_count_field(new_rating)) + 1
+
+    # Les F() de l'UPDATE lisent les valeurs avant modification
+    new_count = F('total_reviews') + count_delta
+    new_sum = F('rating_sum') + sum_delta
+    Restaurant.objects.filter(pk=restaurant_id).update(
+        total_reviews=new_count,
+        rating_sum=new_sum,
+        average_rating=Case(
+            When(total_reviews__gt=-count_delta, then=Cast(new_sum, FloatField()) / new_count),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        updated_at=timezone.now(),
+        **changes
+    )
+    touch_restaurants(restaurant_id)
+
+
+def rating_breakdown(restaurant):
+    """Répartition des notes, lue dans les colonnes de l'histogramme"""
+    return {
+        "average_rating": round(restaurant.average_rating, 2),
+        "total_reviews": restaurant.total_reviews,
+        "distribution": {
+            str(rating): getattr(restaurant, rating_count_field(rating)) for rating in reversed(RATINGS)
+        },
+    }
+
+
+def rebuild_rating_aggregates(batch_size=500, stdout=None):
+    """Recalcule tous les agrégats depuis les avis, par lots de restaurants"""
+    fields = ['average_rating', 'total_reviews', 'rating_sum'] + [rating_count_field(r) for r in RATINGS]
+    ids = list(Restaurant.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), batch_size):
+        batch_ids = ids[start:start + batch_size]
+        stats = {
+            row['restaurant_id']: row
+            for row in RestaurantReview.objects.filter(restaurant_id__in=batch_ids).values('restaurant_id').annotate(
+                total=Count('id'),
+                total_sum=Sum('rating'),
+                **{rating_count_field(r): Count('id', filter=Q(rating=r)) for r in RATINGS}
+            )
+        }
+
+        restaurants = list(Restaurant.objects.filter(pk__in=batch_ids).only('pk'))
+        for restaurant in restaurants:
+            row = stats.get(restaurant.pk, {})
+            restaurant.total_reviews = row.get('total', 0)
+            restaurant.rating_sum = row.get('total_sum') or 0
+            restaurant.average_rating = (
+                restaurant.rating_sum / restaurant.total_reviews if restaurant.total_reviews else 0.0
+            )
+            for rating in RATINGS:
+                setattr(restaurant, rating_count_field(rating), row.get(rating_count_field(rating), 0))
+        Restaurant.objects.bulk_update(restaurants, fields)
+        touch_restaurants(*batch_ids)
+
+        if stdout is not None:
+            stdout.write(f"{start + len(batch_ids)}/{len(ids)} restaurants")
+    return len(ids)
@@ -1,57 +1,138 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from rest_framework import serializers
-from .models import Restaurant, MenuItem, Category, RestaurantReview
+from rest_framework.permissions import SAFE_METHODS
+from .models import Restaurant, MenuItem, Category, RestaurantReview, MenuImportJob
+from .cache import touch_restaurants
+from .dietary import allergen_mask
+from .imports import job_progress
+from .membership import refresh_category_memberships
+from .opening_hours import compile_intervals
+from apps.core.images import LIST_VARIANTS, ImageVariantsField
+from apps.search.indexing import index_menu_items
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+def parse_field_list(value):
+    """'a, b,c' -> {'a', 'b', 'c'} (None si vide)"""
+    names = {name.strip() for name in (value or '').split(',') if name.strip()}
+    return names or None
+
+
+def requested_expansions(request):
+    """Champs imbriqués demandés par ?expand= (ou nommés dans ?fields=)"""
+    if request is None or request.method not in SAFE_METHODS:
+        return set()
+    return (parse_field_list(request.query_params.get('expand')) or set()) | \
+        (parse_field_list(request.query_params.get('fields')) or set())
+
+
+class DynamicFieldsMixin:
+    """
+    Champs à la demande pour les lectures :
+    - ?fields=id,name ne renvoie que ces champs ;
+    - ?expand=menu_items ajoute un champ de Meta.expandable_fields (absents par défaut).
+    Les mêmes options peuvent être passées au constructeur (fields=, expand=).
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+        if request is not None and request.method in SAFE_METHODS:
+            if fields is None:
+                fields = parse_field_list(request.query_params.get('fields'))
+            if expand is None:
+                expand = requested_expansions(request)
+
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in set(expand or ()) & set(expandable):
+            serializer_class, options = expandable[name]
+            self.fields[name] = serializer_class(**options)
+
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class OpeningHoursValidationMixin:
+    """Valide les horaires et le fuseau avant qu'ils ne soient compilés (voir opening_hours.py)"""
+
+    def validate_opening_hours(self, value):
+        try:
+            compile_intervals(value)
+        except ValueError as error:
+            raise serializers.ValidationError(str(error))
+        return value
+
+    def validate_timezone(self, value):
+        if value:
+            try:
+                ZoneInfo(value)
+            except (ZoneInfoNotFoundError, ValueError):
+                raise serializers.ValidationError("Fuseau horaire inconnu (ex: Europe/Paris)")
+        return value
+
+
 class CategorySerializer(serializers.ModelSerializer):
+    image_srcset = ImageVariantsField(variants=LIST_VARIANTS)
+
     class Meta:
         model = Category
-        fields = ['id', 'name', 'description', 'image', 'is_active']
+        fields = ['id', 'name', 'description', 'image', 'image_srcset', 'is_active']
 
 
 class MenuItemSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
+    image_srcset = ImageVariantsField(variants=LIST_VARIANTS)
 
     class Meta:
         model = MenuItem
         fields = [
-            'id', 'name', 'description', 'price', 'image', 'is_available',
+            'id', 'name', 'description', 'price', 'image', 'image_srcset', 'is_available',
             'preparation_time', 'has_options', 'options', 'calories', 'allergens',
             'category', 'category_name', 'restaurant', 'order_count', 'average_rating'
         ]
 
 
-class RestaurantListSerializer(serializers.ModelSerializer):
+class RestaurantListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer pour la liste des restaurants (données minimales)"""
     distance_km = serializers.SerializerMethodField()
+    image_srcset = ImageVariantsField(variants=LIST_VARIANTS)
 
     class Meta:
         model = Restaurant
         fields = [
-            'id', 'name', 'image', 'average_rating', 'total_reviews',
+            'id', 'name', 'image', 'image_srcset', 'average_rating', 'total_reviews',
             'delivery_fee', 'estimated_delivery_time', 'is_accepting_orders',
             'distance_km'
         ]
 
     def get_distance_km(self, obj):
         # Calculé par la vue selon la position de l'utilisateur
-        return getattr(obj, 'distance_km', None)
+        distance = getattr(obj, 'distance_km', None)
+        return round(distance, 2) if distance is not None else None
 
 
-class RestaurantDetailSerializer(serializers.ModelSerializer):
-    """Serializer détaillé pour un restaurant"""
-    menu_items = MenuItemSerializer(many=True, read_only=True)
+class RestaurantDetailSerializer(OpeningHoursValidationMixin, DynamicFieldsMixin, serializers.ModelSerializer):
+    """Serializer détaillé pour un restaurant (menu_items avec ?expand=menu_items)"""
     reviews_count = serializers.IntegerField(source='total_reviews', read_only=True)
+    image_srcset = ImageVariantsField()
 
     class Meta:
         model = Restaurant
         fields = [
-            'id', 'name', 'description', 'image', 'address', 'phone_number',
-            'opening_hours', 'is_active', 'is_accepting_orders', 'average_rating',
+            'id', 'name', 'description', 'image', 'image_srcset', 'address', 'phone_number',
+            'opening_hours', 'timezone', 'is_active', 'is_accepting_orders', 'average_rating',
             'total_reviews', 'reviews_count', 'delivery_fee', 'free_delivery_threshold',
-            'delivery_radius_km', 'estimated_delivery_time', 'menu_items'
+            'delivery_radius_km', 'estimated_delivery_time'
         ]
+        read_only_fields = ('average_rating', 'total_reviews')
+        expandable_fields = {
+            'menu_items': (MenuItemSerializer, {'many': True, 'read_only': True}),
+        }
 
 
 class RestaurantReviewSerializer(serializers.ModelSerializer):
@@ -64,7 +145,7 @@ class RestaurantReviewSerializer(serializers.ModelSerializer):
 
 
 # Dans serializers.py
-class RestaurantCreateSerializer(serializers.ModelSerializer):
+class RestaurantCreateSerializer(OpeningHoursValidationMixin, serializers.ModelSerializer):
     # Accepter 'restaurant_image' depuis Flutter et mapper vers 'image'
     restaurant_image = serializers.ImageField(write_only=True, required=False, allow_null=True)
 
@@ -72,7 +153,7 @@ class RestaurantCreateSerializer(serializers.ModelSerializer):
         model = Restaurant
         fields = [
             'name', 'description', 'image', 'address', 'latitude', 'longitude',
-            'phone_number', 'email', 'opening_hours', 'delivery_fee',
+            'phone_number', 'email', 'opening_hours', 'timezone', 'delivery_fee',
             'free_delivery_threshold', 'delivery_radius_km',
             'estimated_delivery_time', 'is_accepting_orders', 'restaurant_image'
         ]
@@ -97,21 +178,24 @@ class RestaurantCreateSerializer(serializers.ModelSerializer):
 
 class BulkCreateListSerializer(serializers.ListSerializer):
     def create(self, validated_data):
-        # Extraction des restaurants vérifiés
-        restaurants = {
-            data['restaurant_id']: Restaurant.objects.get(id=data['restaurant_id'])
-            for data in validated_data
-        }
+        # Extraction des restaurants vérifiés (une seule requête)
+        restaurants = Restaurant.objects.in_bulk({data['restaurant_id'] for data in validated_data})
 
         # Création des menu items en bulk
         items = [
             MenuItem(
                 restaurant=restaurants[data['restaurant_id']],
+                allergen_mask=allergen_mask(data.get('allergens')),
                 **{k: v for k, v in data.items() if k != 'restaurant_id'}
             ) for data in validated_data
         ]
 
-        return MenuItem.objects.bulk_create(items)
+        created_items = MenuItem.objects.bulk_create(items)
+        # bulk_create ne déclenche pas les signaux : invalider les menus et indexer ici
+        refresh_category_memberships(*restaurants)
+        touch_restaurants(*restaurants)
+        index_menu_items(created_items)
+        return created_items
 
 
 class MenuItemBulkCreateSerializer(serializers.ModelSerializer):
@@ -123,11 +207,49 @@ class MenuItemBulkCreateSerializer(serializers.ModelSerializer):
         list_serializer_class = BulkCreateListSerializer
 
     def validate_restaurant_id(self, value):
-        # Vérifie que le restaurant appartient à l'utilisateur
-        if not Restaurant.objects.filter(id=value, owner=self.context['request'].user).exists():
+        # Vérifie que le restaurant appartient à l'utilisateur (une requête par restaurant distinct)
+        checked = self.context.setdefault('owned_restaurants', {})
+        if value not in checked:
+            checked[value] = Restaurant.objects.filter(id=value, owner=self.context['request'].user).exists()
+        if not checked[value]:
             raise serializers.ValidationError("Vous n'êtes pas propriétaire de ce restaurant")
         return value
 
 
+class MenuItemBulkUpdateSerializer(serializers.ModelSerializer):
+    """Une modification de la mise à jour en masse : `id` + champs modifiés"""
+    id = serializers.IntegerField()
+    # Identifiant brut : les catégories sont vérifiées en une requête pour tout le lot
+    category = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = MenuItem
+        fields = [
+            'id', 'name', 'description', 'price', 'is_available', 'preparation_time',
+            'has_options', 'options', 'calories', 'allergens', 'category'
+        ]
+
+    def validate(self, data):
+        if 'id' not in data:
+            raise serializers.ValidationError({"id": "Ce champ est obligatoire."})
+        if len(data) == 1:
+            raise serializers.ValidationError("Aucun champ à modifier")
+        return data
+
+
+class MenuImportJobSerializer(serializers.ModelSerializer):
+    processed_rows = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MenuImportJob
+        fields = [
+            'id', 'status', 'file_format', 'partial', 'processed_rows', 'created_count',
+            'errors', 'created_at', 'finished_at'
+        ]
+
+    def get_processed_rows(self, obj):
+        return job_progress(obj)
+
+
 
 
@@ -0,0 +1,113 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Restaurant, Category, MenuItem, RestaurantReview
+from .cache import touch_restaurants, touch_categories, touch_reviews, touch_home
+from .opening_hours import sync_opening_intervals
+from .ratings import apply_rating_change
+from .membership import refresh_category_memberships
+from .tasks import generate_image_variants
+from apps.core.images import schedule_variants
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def restaurant_changed(sender, instance, **kwargs):
+    """Invalide le catalogue du restaurant modifié et les listes du fil d'accueil"""
+    touch_restaurants(instance.pk)
+    touch_home('restaurants')
+
+
+@receiver(post_save, sender=Restaurant)
+def restaurant_compile_opening_hours(sender, instance, update_fields=None, **kwargs):
+    """Recompile les plages d'ouverture (filtre « ouvert maintenant »)"""
+    if update_fields is None or {'opening_hours', 'timezone'} & set(update_fields):
+        sync_opening_intervals(instance)
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+def menu_item_changed(sender, instance, **kwargs):
+    """Invalide le menu du restaurant du plat modifié"""
+    touch_restaurants(instance.restaurant_id)
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_save, sender=Category)
+def image_changed(sender, instance, **kwargs):
+    """Génère les variantes redimensionnées d'une image nouvelle ou remplacée"""
+    schedule_variants(generate_image_variants, instance)
+
+
+PLACEMENT_FIELDS = {'restaurant', 'restaurant_id', 'category', 'category_id'}
+
+
+def moves_placement(update_fields):
+    """Un enregistrement limité à d'autres champs ne peut pas déplacer le plat"""
+    return update_fields is None or bool(PLACEMENT_FIELDS & set(update_fields))
+
+
+@receiver(pre_save, sender=MenuItem)
+def menu_item_remember_placement(sender, instance, update_fields=None, **kwargs):
+    """Mémorise restaurant et catégorie enregistrés pour détecter un changement"""
+    instance._previous_placement = None
+    if instance.pk and moves_placement(update_fields):
+        instance._previous_placement = MenuItem.objects.filter(
+            pk=instance.pk
+        ).values_list('restaurant_id', 'category_id').first()
+
+
+@receiver(post_save, sender=MenuItem)
+def menu_item_membership_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Met à jour les catégories proposées par le restaurant"""
+    if not moves_placement(update_fields):
+        return
+    previous = getattr(instance, '_previous_placement', None)
+    if previous is None:
+        refresh_category_memberships(instance.restaurant_id)
+    elif previous != (instance.restaurant_id, instance.category_id):
+        refresh_category_memberships(previous[0], instance.restaurant_id)
+
+
+@receiver(post_delete, sender=MenuItem)
+def menu_item_membership_deleted(sender, instance, **kwargs):
+    refresh_category_memberships(instance.restaurant_id)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance, **kwargs):
+    """Les catégories sont partagées : tous les menus sont invalidés"""
+    touch_categories()
+
+
+@receiver([post_save, post_delete], sender=RestaurantReview)
+def review_changed(sender, instance, **kwargs):
+    """Invalide les avis mis en cache du restaurant"""
+    touch_reviews(instance.restaurant_id)
+
+
+@receiver(pre_save, sender=RestaurantReview)
+def review_remember_previous(sender, instance, **kwargs):
+    """Mémorise la note enregistrée pour corriger les agrégats après modification"""
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = RestaurantReview.objects.filter(
+            pk=instance.pk
+        ).values_list('restaurant_id', 'rating').first()
+
+
+@receiver(post_save, sender=RestaurantReview)
+def review_saved(sender, instance, created, **kwargs):
+    """Met à jour la note moyenne et l'histogramme du restaurant"""
+    previous = getattr(instance, '_previous_rating', None)
+    if previous is None:
+        apply_rating_change(instance.restaurant_id, new_rating=instance.rating)
+    elif previous[0] != instance.restaurant_id:
+        apply_rating_change(previous[0], old_rating=previous[1])
+        apply_rating_change(instance.restaurant_id, new_rating=instance.rating)
+    else:
+        apply_rating_change(instance.restaurant_id, old_rating=previous[1], new_rating=instance.rating)
+
+
+@receiver(post_delete, sender=RestaurantReview)
+def review_deleted(sender, instance, **kwargs):
+    """Retire la note de l'avis supprimé des agrégats"""
+    apply_rating_change(instance.restaurant_id, old_rating=instance.rating)
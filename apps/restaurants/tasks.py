@@ -0,0 +1,28 @@
+from celery import shared_task
+from django.apps import apps
+from apps.core.images import refresh_variants
+from .imports import run_import_job
+from .models import MenuImportJob
+from .popularity import update_popularity_scores
+
+
+@shared_task
+def refresh_popularity_scores():
+    """Recalcule le score de popularité de tous les restaurants"""
+    return update_popularity_scores()
+
+
+@shared_task
+def import_menu_items(job_id):
+    """Import de plats en tâche de fond (progression lisible sur le job)"""
+    try:
+        job = MenuImportJob.objects.select_related('owner').get(pk=job_id)
+    except MenuImportJob.DoesNotExist:
+        return None
+    return run_import_job(job)
+
+
+@shared_task
+def generate_image_variants(model_label, pk, force=False):
+    """Génère les variantes (thumb, card, full) de l'image d'un restaurant, plat, catégorie ou promotion"""
+    return refresh_variants(apps.get_model(model_label), pk, force=force)
@@ -1,3 +1,1267 @@
-from django.test import TestCase
+import csv
+import json
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, OperationalError, connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from geopy.distance import geodesic
+from PIL import Image
+from rest_framework.test import APIClient
+from apps.core.streaming import SerializedStream, iter_json_array
+from apps.core.utils import calculate_distance, geohash_encode, haversine_distances, haversine_matrix
+from apps.commandes.models import Order
+from apps.marketing.models import RestaurantAdvertisement
+from apps.promotions.models import Promotion
+from . import home
+from .imports import MenuImporter, progress_key, run_import_job
+from .models import Restaurant, Category, MenuItem, MenuImportJob, RestaurantReview, OpeningInterval, RestaurantCategory
+from .dietary import parse_tags
+from .opening_hours import compile_intervals, filter_open
+from .popularity import compute_popularity_scores
+from .serializers import MenuItemSerializer
+from .tasks import generate_image_variants, import_menu_items, refresh_popularity_scores
 
-# Create your tests here.
+User = get_user_model()
+
+
+class DistanceUtilsTest(SimpleTestCase):
+    origin = (48.8566, 2.3522)
+    points = [(48.8532, 2.3692), (48.8049, 2.1204), (45.764, 4.8357)]
+
+    def test_batch_distances_match_geodesic(self):
+        latitudes, longitudes = zip(*self.points)
+        spherical = haversine_distances(*self.origin, latitudes, longitudes)
+        ellipsoidal = haversine_distances(*self.origin, latitudes, longitudes, ellipsoidal=True)
+        for point, sphere_km, lambert_km in zip(self.points, spherical, ellipsoidal):
+            reference = geodesic(self.origin, point).kilometers
+            self.assertLessEqual(abs(sphere_km - reference), reference * 0.0057)
+            self.assertLessEqual(abs(lambert_km - reference), 0.001)
+
+    def test_matrix_shape_and_diagonal(self):
+        latitudes, longitudes = zip(*self.points)
+        matrix = haversine_matrix(latitudes, longitudes, latitudes, longitudes)
+        self.assertEqual(matrix.shape, (3, 3))
+        self.assertEqual(matrix.diagonal().tolist(), [0.0, 0.0, 0.0])
+
+    def test_calculate_distance(self):
+        self.assertAlmostEqual(calculate_distance(*self.origin, *self.points[1]), 17.9635, places=3)
+        self.assertIsNone(calculate_distance('abc', 2.35, 48.8, 2.1))
+
+
+class ProximityFilterTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='ownerpass123',
+            user_type='restaurant'
+        )
+        self.center = self.create_restaurant('Centre', 48.8566, 2.3522)
+        self.nearby = self.create_restaurant('Bastille', 48.8532, 2.3692)
+        self.far = self.create_restaurant('Versailles', 48.8049, 2.1204)
+
+    def create_restaurant(self, name, latitude, longitude):
+        return Restaurant.objects.create(
+            owner=self.owner,
+            name=name,
+            address='1 Rue Test',
+            latitude=latitude,
+            longitude=longitude,
+            phone_number='+33123456789'
+        )
+
+    def test_geo_cell_is_kept_up_to_date(self):
+        self.assertEqual(self.center.geo_cell, geohash_encode(48.8566, 2.3522))
+        self.center.latitude = 45.764
+        self.center.longitude = 4.8357
+        self.center.save(update_fields=['latitude', 'longitude'])
+        self.center.refresh_from_db()
+        self.assertEqual(self.center.geo_cell, geohash_encode(45.764, 4.8357))
+
+    def test_nearby_restaurants_sorted_by_distance(self):
+        response = self.client.get('/api/v1/restaurants/', {'lat': 48.8566, 'lng': 2.3522, 'radius': 5})
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([r['name'] for r in results], ['Centre', 'Bastille'])
+        self.assertEqual(results[0]['distance_km'], 0.0)
+        self.assertAlmostEqual(results[1]['distance_km'], 1.3, delta=0.1)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_large_radius_includes_far_restaurants(self):
+        response = self.client.get('/api/v1/restaurants/', {'lat': 48.8566, 'lng': 2.3522, 'radius': 100})
+        self.assertEqual([r['name'] for r in response.data['results']], ['Centre', 'Bastille', 'Versailles'])
+
+    def test_explicit_ordering_overrides_distance(self):
+        response = self.client.get('/api/v1/restaurants/', {
+            'lat': 48.8566, 'lng': 2.3522, 'radius': 100, 'ordering': '-distance_km'
+        })
+        self.assertEqual(response.data['results'][0]['name'], 'Versailles')
+
+    def test_distance_ordering_ignored_without_position(self):
+        response = self.client.get('/api/v1/restaurants/', {'ordering': 'distance_km'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+
+    def test_invalid_coordinates(self):
+        response = self.client.get('/api/v1/restaurants/', {'lat': 'abc', 'lng': 2.3522})
+        self.assertEqual(response.status_code, 400)
+
+
+class MenuDocumentTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='ownerpass123',
+            user_type='restaurant'
+        )
+        self.restaurant = Restaurant.objects.create(
+            owner=self.owner,
+            name='Test Restaurant',
+            address='123 Test St',
+            latitude=48.8566,
+            longitude=2.3522,
+            phone_number='+33123456789'
+        )
+        self.desserts = Category.objects.create(name='Desserts', order=2)
+        self.plats = Category.objects.create(name='Plats', order=1)
+        self.hidden = Category.objects.create(name='Cachée', is_active=False)
+        for index in range(3):
+            MenuItem.objects.create(restaurant=self.restaurant, category=self.plats,
+                                    name=f'Plat {index}', price='12.00', order_count=index)
+        MenuItem.objects.create(restaurant=self.restaurant, category=self.desserts, name='Tarte', price='5.00')
+        MenuItem.objects.create(restaurant=self.restaurant, category=self.desserts, name='Indisponible',
+                                price='5.00', is_available=False)
+        MenuItem.objects.create(restaurant=self.restaurant, category=self.hidden, name='Secret', price='5.00')
+        self.url = f'/api/v1/restaurants/{self.restaurant.id}/menu/'
+
+    def test_menu_grouped_by_category(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([group['category']['name'] for group in response.data], ['Plats', 'Desserts'])
+        self.assertEqual([item['name'] for item in response.data[0]['items']], ['Plat 2', 'Plat 1', 'Plat 0'])
+        self.assertEqual([item['name'] for item in response.data[1]['items']], ['Tarte'])
+
+    def test_menu_built_with_constant_queries_then_cached(self):
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 2)
+
+    def test_menu_invalidated_on_changes(self):
+        self.client.get(self.url)
+        MenuItem.objects.create(restaurant=self.restaurant, category=self.desserts, name='Glace', price='4.00')
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data[1]['items']), 2)
+
+        self.desserts.name = 'Sucré'
+        self.desserts.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data[1]['category']['name'], 'Sucré')
+
+        self.restaurant.is_active = False
+        self.restaurant.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_unknown_restaurant(self):
+        self.assertEqual(self.client.get('/api/v1/restaurants/9999/menu/').status_code, 404)
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='ownerpass123',
+            user_type='restaurant'
+        )
+        self.restaurant = Restaurant.objects.create(
+            owner=self.owner,
+            name='Test Restaurant',
+            address='123 Test St',
+            latitude=48.8566,
+            longitude=2.3522,
+            phone_number='+33123456789'
+        )
+        self.category = Category.objects.create(name='Plats')
+        MenuItem.objects.create(restaurant=self.restaurant, category=self.category, name='Plat', price='10.00')
+
+    def assert_revalidates(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        return etag
+
+    def test_restaurant_endpoints_return_304(self):
+        for suffix in ['', 'menu/', 'reviews/']:
+            self.assert_revalidates(f'/api/v1/restaurants/{self.restaurant.id}/{suffix}')
+
+    def test_categories_return_304(self):
+        self.assert_revalidates('/api/v1/categories/')
+        self.assert_revalidates(f'/api/v1/categories/{self.category.id}/')
+
+    def test_etag_changes_when_catalog_changes(self):
+        url = f'/api/v1/restaurants/{self.restaurant.id}/menu/'
+        etag = self.assert_revalidates(url)
+        MenuItem.objects.create(restaurant=self.restaurant, category=self.category, name='Nouveau', price='8.00')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_review_changes_reviews_etag(self):
+        url = f'/api/v1/restaurants/{self.restaurant.id}/reviews/'
+        etag = self.assert_revalidates(url)
+        RestaurantReview.objects.create(restaurant=self.restaurant, customer=self.owner, rating=5)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class DynamicFieldsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='ownerpass123',
+            user_type='restaurant'
+        )
+        self.restaurant = Restaurant.objects.create(
+            owner=self.owner,
+            name='Test Restaurant',
+            address='123 Test St',
+            latitude=48.8566,
+            longitude=2.3522,
+            phone_number='+33123456789'
+        )
+        category = Category.objects.create(name='Plats')
+        for index in range(5):
+            MenuItem.objects.create(restaurant=self.restaurant, category=category,
+                                    name=f'Plat {index}', price='12.00')
+        self.url = f'/api/v1/restaurants/{self.restaurant.id}/'
+
+    def test_detail_without_menu_by_default(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertNotIn('menu_items', response.data)
+
+    def test_expand_menu_items_prefetched(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'expand': 'menu_items'})
+        self.assertEqual(len(response.data['menu_items']), 5)
+        self.assertEqual(response.data['menu_items'][0]['category_name'], 'Plats')
+
+    def test_sparse_fieldsets(self):
+        response = self.client.get(self.url, {'fields': 'id,name'})
+        self.assertEqual(set(response.data), {'id', 'name'})
+        response = self.client.get(self.url, {'fields': 'name,menu_items'})
+        self.assertEqual(set(response.data), {'name', 'menu_items'})
+        response = self.client.get('/api/v1/restaurants/', {'fields': 'id,distance_km'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'distance_km'})
+
+
+class RatingAggregatesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='ownerpass123',
+            user_type='restaurant'
+        )
+        self.restaurant = Restaurant.objects.create(
+            owner=self.owner,
+            name='Test Restaurant',
+            address='123 Test St',
+            latitude=48.8566,
+            longitude=2.3522,
+            phone_number='+33123456789'
+        )
+        self.customers = [
+            User.objects.create_user(username=f'client{index}', email=f'client{index}@example.com',
+                                     password='clientpass123')
+            for index in range(3)
+        ]
+
+    def review(self, customer, rating):
+        return RestaurantReview.objects.create(restaurant=self.restaurant, customer=customer, rating=rating)
+
+    def test_aggregates_follow_reviews(self):
+        first = self.review(self.customers[0], 5)
+        self.review(self.customers[1], 4)
+        second = self.review(self.customers[2], 3)
+        self.restaurant.refresh_from_db()
+        self.assertEqual((self.restaurant.total_reviews, self.restaurant.average_rating), (3, 4.0))
+
+        first.rating = 1
+        first.save()
+        second.delete()
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.total_reviews, 2)
+        self.assertEqual(self.restaurant.average_rating, 2.5)
+        self.assertEqual(
+            [getattr(self.restaurant, f'rating_{rating}_count') for rating in range(1, 6)], [1, 0, 0, 1, 0]
+        )
+
+        RestaurantReview.objects.all().delete()
+        self.restaurant.refresh_from_db()
+        self.assertEqual((self.restaurant.total_reviews, self.restaurant.average_rating), (0, 0.0))
+
+    def test_rating_breakdown_endpoint(self):
+        self.review(self.customers[0], 5)
+        self.review(self.customers[1], 5)
+        self.review(self.customers[2], 2)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/v1/restaurants/{self.restaurant.id}/rating-breakdown/')
+        self.assertEqual(response.data, {
+            'average_rating': 4.0,
+            'total_reviews': 3,
+            'distribution': {'5': 2, '4': 0, '3': 0, '2': 1, '1': 0},
+        })
+
+    def test_stale_saves_keep_aggregates(self):
+        stale = Restaurant.objects.get(pk=self.restaurant.pk)
+        self.review(self.customers[0], 5)
+        self.review(self.customers[1], 3)
+
+        stale.name = 'Nouveau nom'
+        stale.save()
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.patch(
+            f'/api/v1/restaurants/{self.restaurant.id}/',
+            {'description': 'Cuisine maison', 'total_reviews': 0, 'average_rating': 1.0},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.restaurant.refresh_from_db()
+        self.assertEqual((self.restaurant.name, self.restaurant.description), ('Nouveau nom', 'Cuisine maison'))
+        self.assertEqual((self.restaurant.total_reviews, self.restaurant.average_rating), (2, 4.0))
+        self.assertEqual((self.restaurant.rating_5_count, self.restaurant.rating_3_count), (1, 1))
+
+    def test_saving_a_deleted_restaurant_does_not_recreate_it(self):
+        # Instance chargée dont la ligne n'existe plus
+        stale = Restaurant.objects.get(pk=self.restaurant.pk)
+        stale.pk = self.restaurant.pk + 1000
+        stale.name = 'Fantôme'
+        with self.assertRaises(DatabaseError):
+            with transaction.atomic():
+                stale.save()
+        self.assertFalse(Restaurant.objects.filter(pk=stale.pk).exists())
+
+        stale.save(force_insert=True)
+        self.assertEqual(Restaurant.objects.get(pk=stale.pk).name, 'Fantôme')
+
+    def test_rebuild_command(self):
+        self.review(self.customers[0], 4)
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(total_reviews=10, average_rating=1.0, rating_4_count=0)
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        self.restaurant.refresh_from_db()
+        self.assertEqual((self.restaurant.total_reviews, self.restaurant.average_rating), (1, 4.0))
+        self.assertEqual(self.restaurant.rating_4_count, 1)
+
+
+class PopularityTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='ownerpass123',
+            user_type='restaurant'
+        )
+        self.customer = User.objects.create_user(
+            username='client', email='client@example.com', password='clientpass123'
+        )
+        self.veteran = self.create_restaurant('Ancien', 48.8566, 2.3522)
+        self.newcomer = self.create_restaurant('Nouveau', 48.8600, 2.3400)
+        self.lyon = self.create_restaurant('Lyonnais', 45.7640, 4.8357)
+        now = timezone.now()
+        self.create_orders(self.veteran, 3, now - timedelta(days=60))
+        self.create_orders(self.newcomer, 2, now - timedelta(days=1))
+        self.create_orders(self.lyon, 1, now)
+
+    def create_restaurant(self, name, latitude, longitude):
+        return Restaurant.objects.create(
+            owner=self.owner,
+            name=name,
+            address='123 Test St',
+            latitude=latitude,
+            longitude=longitude,
+            phone_number='+33123456789'
+        )
+
+    def create_orders(self, restaurant, count, created_at):
+        for _ in range(count):
+            order = Order.objects.create(
+                customer=self.customer, restaurant=restaurant, subtotal='10.00', total_amount='12.00',
+                payment_method='card', delivery_address={}, delivery_latitude=48.85, delivery_longitude=2.35
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+
+    def names(self, response):
+        return [restaurant['name'] for restaurant in response.data]
+
+    def test_recent_orders_outweigh_old_ones(self):
+        scores = compute_popularity_scores()
+        self.assertGreater(scores[self.newcomer.pk], scores[self.veteran.pk])
+        self.assertAlmostEqual(scores[self.veteran.pk], 3 * 0.5 ** (60 / 14), places=3)
+
+    def test_popular_is_cached_and_scoped(self):
+        refresh_popularity_scores()
+        response = self.client.get('/api/v1/restaurants/popular/')
+        self.assertEqual(self.names(response), ['Nouveau', 'Lyonnais', 'Ancien'])
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/restaurants/popular/', {'limit': 2})
+        self.assertEqual(self.names(response), ['Nouveau', 'Lyonnais'])
+
+        response = self.client.get('/api/v1/restaurants/popular/', {'lat': 48.8566, 'lng': 2.3522})
+        self.assertEqual(self.names(response), ['Nouveau', 'Ancien'])
+        self.assertEqual(self.client.get('/api/v1/restaurants/popular/', {'limit': 'x'}).status_code, 400)
+
+    def test_ratings_rank_until_scores_are_computed(self):
+        Restaurant.objects.filter(pk=self.lyon.pk).update(average_rating=4.5, total_reviews=2)
+        Restaurant.objects.filter(pk=self.veteran.pk).update(average_rating=4.5, total_reviews=8)
+        response = self.client.get('/api/v1/restaurants/popular/')
+        self.assertEqual(self.names(response), ['Ancien', 'Lyonnais', 'Nouveau'])
+
+        refresh_popularity_scores()
+        response = self.client.get('/api/v1/restaurants/popular/')
+        self.assertEqual(self.names(response), ['Nouveau', 'Lyonnais', 'Ancien'])
+
+    def test_refresh_invalidates_ranking(self):
+        refresh_popularity_scores()
+        self.client.get('/api/v1/restaurants/popular/')
+        self.create_orders(self.veteran, 5, timezone.now())
+        refresh_popularity_scores()
+        response = self.client.get('/api/v1/restaurants/popular/')
+        self.assertEqual(self.names(response)[0], 'Ancien')
+
+
+class ReviewsCursorPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='ownerpass123',
+            user_type='restaurant'
+        )
+        self.restaurant = Restaurant.objects.create(
+            owner=owner,
+            name='Test Restaurant',
+            address='123 Test St',
+            latitude=48.8566,
+            longitude=2.3522,
+            phone_number='+33123456789'
+        )
+        for index in range(25):
+            customer = User.objects.create_user(
+                username=f'client{index}', email=f'client{index}@example.com', password='clientpass123'
+            )
+            RestaurantReview.objects.create(restaurant=self.restaurant, customer=customer, rating=4)
+        # Horodatages identiques : l'id départage les avis
+        RestaurantReview.objects.filter(id__lte=RestaurantReview.objects.order_by('id')[9].id).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+        self.url = f'/api/v1/restaurants/{self.restaurant.id}/reviews/'
+
+    def test_walk_forward_and_back(self):
+        seen = []
+        url = self.url + '?page_size=10'
+        while url:
+            with self.assertNumQueries(2):  # restaurant + une page d'avis (aucun COUNT)
+                response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            seen.extend(review['id'] for review in response.data['results'])
+            last = response.data
+            url = response.data['next']
+        expected = list(
+            RestaurantReview.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+        response = self.client.get(last['previous'])
+        self.assertEqual([review['id'] for review in response.data['results']], expected[10:20])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'abc'}).status_code, 404)
+
+
+class OpeningHoursTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='ownerpass123',
+            user_type='restaurant'
+        )
+        week = {day: {'open': '11:00', 'close': '14:00'} for day in ['lundi', 'mardi', 'mercredi', 'jeudi']}
+        self.lunch = self.create_restaurant('Midi', week, 'Europe/Paris')
+        self.night = self.create_restaurant('Nuit', {
+            'saturday': {'open': '20:00', 'close': '02:00'},
+            'sunday': [{'open': '12:00', 'close': '14:00'}, {'open': '22:00', 'close': '03:00'}],
+            'monday': {'closed': True},
+        }, 'Europe/Paris')
+        self.new_york = self.create_restaurant('Brooklyn', {'monday': {'open': '09:00', 'close': '17:00'}},
+                                               'America/New_York')
+
+    def create_restaurant(self, name, opening_hours, tz_name):
+        return Restaurant.objects.create(
+            owner=self.owner,
+            name=name,
+            address='123 Test St',
+            latitude=48.8566,
+            longitude=2.3522,
+            phone_number='+33123456789',
+            opening_hours=opening_hours,
+            timezone=tz_name
+        )
+
+    def open_at(self, iso):
+        moment = datetime.fromisoformat(iso)
+        return set(filter_open(Restaurant.objects.all(), at=moment).values_list('name', flat=True))
+
+    def test_compile_overnight_and_week_wrap(self):
+        intervals = compile_intervals({
+            'saturday': {'open': '20:00', 'close': '02:00'},
+            'sunday': {'open': '22:00', 'close': '03:00'},
+            'monday': {'is_open': False},
+        })
+        saturday, sunday = 5 * 1440, 6 * 1440
+        self.assertEqual(intervals, [(0, 180), (saturday + 1200, sunday + 120), (sunday + 1320, 7 * 1440)])
+        with self.assertRaises(ValueError):
+            compile_intervals({'funday': {'open': '10:00', 'close': '12:00'}})
+
+    def test_open_at_local_time(self):
+        # Lundi 12:00 à Paris = 10:00 UTC ; 06:00 à New York
+        self.assertEqual(self.open_at('2026-10-19T10:00:00+00:00'), {'Midi'})
+        # Lundi 02:00 à Paris : la soirée de dimanche continue
+        self.assertEqual(self.open_at('2026-10-19T00:00:00+00:00'), {'Nuit'})
+        # Lundi 15:00 UTC : 17:00 à Paris, 11:00 à New York
+        self.assertEqual(self.open_at('2026-10-19T15:00:00+00:00'), {'Brooklyn'})
+        # Dimanche 01:00 à Paris (heure d'été) : fin de la soirée du samedi
+        self.assertEqual(self.open_at('2026-10-17T23:30:00+00:00'), {'Nuit'})
+
+    def test_intervals_follow_changes(self):
+        self.lunch.opening_hours = {}
+        self.lunch.save()
+        self.assertFalse(OpeningInterval.objects.filter(restaurant=self.lunch).exists())
+        self.night.name = 'Nuit blanche'
+        self.night.save(update_fields=['name'])
+        self.assertEqual(OpeningInterval.objects.filter(restaurant=self.night).count(), 4)
+
+    def test_update_rejects_invalid_schedule(self):
+        self.client.force_authenticate(user=self.owner)
+        url = f'/api/v1/restaurants/{self.lunch.id}/'
+        response = self.client.patch(url, {'opening_hours': {'funday': {'open': '10:00', 'close': '12:00'}}},
+                                     format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('opening_hours', response.data)
+        response = self.client.patch(url, {'timezone': 'Mars/Olympus'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('timezone', response.data)
+        self.lunch.refresh_from_db()
+        self.assertEqual(self.lunch.timezone, 'Europe/Paris')
+        self.assertEqual(OpeningInterval.objects.filter(restaurant=self.lunch).count(), 4)
+
+    def test_open_now_filter_combines_with_others(self):
+        open_ids = set(filter_open(Restaurant.objects.all()).values_list('pk', flat=True))
+        response = self.client.get('/api/v1/restaurants/', {
+            'open_now': 'true', 'min_rating': 0, 'lat': 48.8566, 'lng': 2.3522
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({restaurant['id'] for restaurant in response.data['results']}, open_ids)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MenuImportTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='ownerpass123',
+            user_type='restaurant'
+        )
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='otherpass123', user_type='restaurant'
+        )
+        self.restaurant = self.create_restaurant(self.owner, 'Mon Restaurant')
+        self.second = self.create_restaurant(self.owner, 'Mon Second')
+        self.foreign = self.create_restaurant(other, 'Concurrent')
+        self.category = Category.objects.create(name='Plats')
+        self.client.force_authenticate(self.owner)
+        self.url = '/api/v1/menu-items/import/'
+
+    def create_restaurant(self, owner, name):
+        return Restaurant.objects.create(
+            owner=owner,
+            name=name,
+            address='123 Test St',
+            latitude=48.8566,
+            longitude=2.3522,
+            phone_number='+33123456789'
+        )
+
+    def csv_file(self, rows, name='menu.csv'):
+        lines = ['restaurant_id,category_id,name,price,allergens']
+        lines += [','.join(str(value) for value in row) for row in rows]
+        return SimpleUploadedFile(name, '\n'.join(lines).encode(), content_type='text/csv')
+
+    def test_csv_import_with_constant_queries(self):
+        rows = [
+            (restaurant.pk, self.category.pk, f'Plat {index}', '9.50', '"[""gluten""]"')
+            for index in range(600) for restaurant in [self.restaurant if index % 2 else self.second]
+        ]
+        upload = self.csv_file(rows)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 600)
+        self.assertLess(len(queries), 40)
+        self.assertEqual(MenuItem.objects.filter(restaurant=self.restaurant).count(), 300)
+        self.assertEqual(MenuItem.objects.first().allergens, ['gluten'])
+
+    def test_strict_import_rolls_back(self):
+        upload = self.csv_file([
+            (self.restaurant.pk, '', 'Bon', '5.00', ''),
+            (self.foreign.pk, '', 'Pas à moi', '5.00', ''),
+            (self.restaurant.pk, '', 'Sans prix', 'abc', ''),
+        ])
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4])
+        self.assertIn('restaurant_id', response.data['errors'][0]['errors'])
+        self.assertFalse(MenuItem.objects.exists())
+
+    def test_partial_jsonl_import(self):
+        lines = [
+            json.dumps({'restaurant': self.restaurant.pk, 'name': 'Soupe', 'price': '4.00'}),
+            'pas du json',
+            json.dumps({'restaurant': self.restaurant.pk, 'category': 9999, 'name': 'Tarte', 'price': '4.00'}),
+        ]
+        upload = SimpleUploadedFile('menu.jsonl', '\n'.join(lines).encode())
+        response = self.client.post(self.url + '?partial=true', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['error_count']), (1, 2))
+        self.assertEqual(list(MenuItem.objects.values_list('name', flat=True)), ['Soupe'])
+
+    def test_async_import_job(self):
+        upload = self.csv_file([(self.restaurant.pk, self.category.pk, 'Plat', '9.50', '')])
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post(self.url + '?async=true', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(callbacks), 1)
+        job_id = response.data['job']['id']
+
+        import_menu_items(job_id)
+        response = self.client.get(f'{self.url}{job_id}/')
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(response.data['created_count'], 1)
+        self.client.force_authenticate(User.objects.get(username='other'))
+        self.assertEqual(self.client.get(f'{self.url}{job_id}/').status_code, 404)
+
+    def test_async_progress_is_visible_during_import(self):
+        upload = self.csv_file([(self.restaurant.pk, '', f'Plat {index}', '9.50', '') for index in range(5)])
+        job = MenuImportJob.objects.create(owner=self.owner, file=upload, file_format='csv')
+        seen = []
+        process_chunk = MenuImporter.process_chunk
+
+        def observe(importer, chunk):
+            process_chunk(importer, chunk)
+            seen.append(self.client.get(f'{self.url}{job.pk}/').data['processed_rows'])
+
+        with mock.patch.object(MenuImporter, 'process_chunk', autospec=True, side_effect=observe):
+            run_import_job(MenuImportJob.objects.get(pk=job.pk), chunk_size=2)
+
+        # Lu depuis le cache : la ligne du job n'est écrite qu'à la fin, hors transaction d'import
+        self.assertEqual(seen, [0, 2, 4])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows, job.created_count), ('done', 5, 5))
+        self.assertIsNone(cache.get(progress_key(job.pk)))
+
+    def test_async_job_fails_on_unexpected_error(self):
+        upload = self.csv_file([(self.restaurant.pk, '', f'Plat {index}', '9.50', '') for index in range(4)])
+        job = MenuImportJob.objects.create(owner=self.owner, file=upload, file_format='csv')
+        process_chunk = MenuImporter.process_chunk
+
+        def crash_on_second_chunk(importer, chunk):
+            if importer.processed:
+                raise OperationalError('disk I/O error')
+            process_chunk(importer, chunk)
+
+        with mock.patch.object(MenuImporter, 'process_chunk', autospec=True, side_effect=crash_on_second_chunk):
+            with self.assertRaises(OperationalError):
+                run_import_job(MenuImportJob.objects.get(pk=job.pk), chunk_size=2)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIsNotNone(job.finished_at)
+        self.assertIn('disk I/O error', job.errors[0]['errors']['file'][0])
+        self.assertIsNone(cache.get(progress_key(job.pk)))
+
+    def test_malformed_csv_is_rejected(self):
+        oversized = 'x' * (csv.field_size_limit() + 1)
+        upload = self.csv_file([
+            (self.restaurant.pk, '', 'Bon', '5.00', ''),
+            (self.restaurant.pk, '', oversized, '5.00', ''),
+        ])
+        response = self.client.post(self.url + '?partial=true', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('CSV invalide', response.data['message'])
+        self.assertFalse(MenuItem.objects.exists())
+
+    def test_rejects_unknown_format(self):
+        upload = SimpleUploadedFile('menu.xlsx', b'...')
+        self.assertEqual(self.client.post(self.url, {'file': upload}, format='multipart').status_code, 400)
+
+
+class MenuBulkUpdateTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='ownerpass123',
+            user_type='restaurant'
+        )
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='otherpass123', user_type='restaurant'
+        )
+        self.restaurant = Restaurant.objects.create(
+            owner=self.owner,
+            name='Mon Restaurant',
+            address='123 Test St',
+            latitude=48.8566,
+            longitude=2.3522,
+            phone_number='+33123456789'
+        )
+        self.foreign_item = MenuItem.objects.create(
+            restaurant=Restaurant.objects.create(
+                owner=other, name='Concurrent', address='1 rue', latitude=48.85, longitude=2.35,
+                phone_number='+33100000000'
+            ),
+            name='Pas à moi',
+            price='5.00'
+        )
+        category = Category.objects.create(name='Plats')
+        self.items = MenuItem.objects.bulk_create([
+            MenuItem(restaurant=self.restaurant, category=category, name=f'Plat {index}', price='10.00')
+            for index in range(1000)
+        ])
+        self.client.force_authenticate(self.owner)
+        self.url = '/api/v1/menu-items/bulk/'
+
+    def test_bulk_update_with_constant_queries(self):
+        changes = [
+            {'id': item.pk, 'price': '12.50', 'is_available': index % 2 == 0}
+            for index, item in enumerate(self.items)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, changes, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['updated'], 1000)
+        # Nombre de requêtes borné par le nombre de lots, pas par le nombre de plats
+        self.assertLess(len(queries), 40)
+        self.assertEqual(MenuItem.objects.filter(restaurant=self.restaurant, price='12.50').count(), 1000)
+        self.assertEqual(MenuItem.objects.filter(restaurant=self.restaurant, is_available=False).count(), 500)
+
+    def test_bulk_update_with_distinct_prices(self):
+        changes = [{'id': item.pk, 'price': f'{10 + index / 100:.2f}'} for index, item in enumerate(self.items)]
+        response = self.client.patch(self.url, changes, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        item = MenuItem.objects.get(pk=self.items[-1].pk)
+        self.assertEqual(str(item.price), '19.99')
+        self.assertGreater(item.updated_at, self.items[-1].updated_at)
+
+    def test_invalidates_menu_document(self):
+        menu_url = f'/api/v1/restaurants/{self.restaurant.pk}/menu/'
+        self.client.get(menu_url)
+        item = self.items[0]
+        response = self.client.patch(self.url, {'items': [{'id': item.pk, 'name': 'Nouveau nom'}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(self.client.get(menu_url), 'Nouveau nom')
+
+    def test_rejects_foreign_items_atomically(self):
+        changes = [{'id': self.items[0].pk, 'price': '1.00'}, {'id': self.foreign_item.pk, 'price': '1.00'}]
+        response = self.client.patch(self.url, changes, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['ids'], [self.foreign_item.pk])
+        self.assertFalse(MenuItem.objects.filter(price='1.00').exists())
+
+    def test_rejects_invalid_payloads(self):
+        item = self.items[0]
+        for changes in (
+            [],
+            [{'id': item.pk}],
+            [{'id': item.pk, 'price': 'abc'}],
+            [{'id': item.pk, 'price': '2.00'}, {'id': item.pk, 'price': '3.00'}],
+            [{'id': item.pk, 'category': 9999}],
+        ):
+            response = self.client.patch(self.url, changes, format='json')
+            self.assertEqual(response.status_code, 400, changes)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImageVariantsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='ownerpass123', user_type='restaurant'
+        )
+        self.restaurant = Restaurant.objects.create(
+            owner=owner,
+            name='Mon Restaurant',
+            address='123 Test St',
+            latitude=48.8566,
+            longitude=2.3522,
+            phone_number='+33123456789'
+        )
+
+    def photo(self, name='photo.jpg', size=(2000, 1000)):
+        # Photo « de téléphone » : orientation EXIF (rotation de 90°) et métadonnées
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Phone'
+        output = BytesIO()
+        Image.new('RGB', size, 'orange').save(output, 'JPEG', exif=exif)
+        return SimpleUploadedFile(name, output.getvalue(), content_type='image/jpeg')
+
+    def create_item(self):
+        with mock.patch.object(generate_image_variants, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                item = MenuItem.objects.create(
+                    restaurant=self.restaurant, name='Pizza', price='12.00', image=self.photo()
+                )
+        delay.assert_called_once_with('restaurants.MenuItem', item.pk)
+        return item
+
+    def test_generates_resized_variants_without_exif(self):
+        item = self.create_item()
+        with mock.patch.object(generate_image_variants, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertTrue(generate_image_variants('restaurants.MenuItem', item.pk))
+        # L'enregistrement des variantes ne replanifie pas de tâche
+        delay.assert_not_called()
+        item.refresh_from_db()
+
+        self.assertEqual(item.image_variants['source'], item.image.name)
+        self.assertEqual(set(item.image_variants), {'source', 'thumb', 'card', 'full'})
+        for variant, bound in (('thumb', 160), ('card', 480), ('full', 1280)):
+            for extension in ('webp', 'jpeg'):
+                with item.image.storage.open(item.image_variants[variant][extension]) as stored:
+                    with Image.open(stored) as image:
+                        # Orientation appliquée : le portrait est conservé
+                        self.assertEqual(image.size, (bound // 2, bound))
+                        self.assertFalse(image.getexif())
+        # Déjà à jour : rien à refaire
+        self.assertFalse(generate_image_variants('restaurants.MenuItem', item.pk))
+
+    def test_serializers_expose_srcset(self):
+        item = self.create_item()
+        self.assertEqual(MenuItemSerializer(item).data['image_srcset'], {})
+
+        generate_image_variants('restaurants.MenuItem', item.pk)
+        item.refresh_from_db()
+        srcset = MenuItemSerializer(item).data['image_srcset']
+        self.assertEqual(set(srcset), {'thumb', 'card'})
+        self.assertTrue(srcset['thumb']['webp'].startswith('/media/variants/menu_items/'))
+
+    def test_replaced_image_removes_stale_variants(self):
+        item = self.create_item()
+        generate_image_variants('restaurants.MenuItem', item.pk)
+        item.refresh_from_db()
+        storage = item.image.storage
+        old_thumb = item.image_variants['thumb']['jpeg']
+
+        with mock.patch.object(generate_image_variants, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                item.image = self.photo('autre.jpg')
+                item.save()
+        delay.assert_called_once_with('restaurants.MenuItem', item.pk)
+        generate_image_variants('restaurants.MenuItem', item.pk)
+        item.refresh_from_db()
+        self.assertFalse(storage.exists(old_thumb))
+        self.assertTrue(storage.exists(item.image_variants['thumb']['jpeg']))
+
+    def test_backfill_command(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.restaurant.image = self.photo('facade.jpg')
+            self.restaurant.save()
+        out = StringIO()
+        call_command('generate_image_variants', '--workers=1', stdout=out)
+        self.assertIn('1 images à traiter', out.getvalue())
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.image_variants['source'], self.restaurant.image.name)
+
+
+class DietaryFilterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='ownerpass123', user_type='restaurant'
+        )
+        self.restaurant = Restaurant.objects.create(
+            owner=owner,
+            name='Mon Restaurant',
+            address='123 Test St',
+            latitude=48.8566,
+            longitude=2.3522,
+            phone_number='+33123456789'
+        )
+        for name, allergens in (
+            ('Salade', []),
+            ('Pizza', ['Gluten', 'lait']),
+            ('Brownie', ['gluten', 'eggs', 'fruits à coque']),
+            ('Poulet', ['viande']),
+            ('Saumon', ['poisson']),
+            ('Omelette', ['oeufs', 'tag inconnu']),
+        ):
+            MenuItem.objects.create(restaurant=self.restaurant, name=name, price='10.00', allergens=allergens)
+        self.client = APIClient()
+
+    def names(self, query):
+        response = self.client.get(f'/api/v1/menu-items/?{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        return sorted(item['name'] for item in results)
+
+    def test_mask_is_derived_on_save(self):
+        pizza = MenuItem.objects.get(name='Pizza')
+        self.assertEqual(pizza.allergen_mask, parse_tags('gluten,milk'))
+        pizza.allergens = ['sesame']
+        pizza.save(update_fields=['allergens'])
+        pizza.refresh_from_db()
+        self.assertEqual(pizza.allergen_mask, parse_tags('sésame'))
+
+    def test_exclude_allergens(self):
+        self.assertEqual(self.names('exclude_allergens=gluten,nuts'), ['Omelette', 'Poulet', 'Salade', 'Saumon'])
+        self.assertEqual(self.names('exclude_allergens=lactose'), ['Brownie', 'Omelette', 'Poulet', 'Salade', 'Saumon'])
+
+    def test_diets_combine_into_one_predicate(self):
+        self.assertEqual(self.names('diet=vegetarian'), ['Brownie', 'Omelette', 'Pizza', 'Salade'])
+        self.assertEqual(self.names('vegetarian=true'), ['Brownie', 'Omelette', 'Pizza', 'Salade'])
+        self.assertEqual(self.names('diet=vegan'), ['Salade'])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.names('diet=vegetarian&exclude_allergens=gluten'), ['Omelette', 'Salade'])
+        where = queries.captured_queries[-1]['sql'].split('WHERE')[1]
+        self.assertEqual(where.count('allergen_mask'), 1)
+        self.assertNotIn('allergens', where)
+
+    def test_unknown_values_are_rejected(self):
+        self.assertEqual(self.client.get('/api/v1/menu-items/?exclude_allergens=kryptonite').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/menu-items/?diet=carnivore').status_code, 400)
+
+    def test_bulk_paths_compute_mask(self):
+        item = MenuItem.objects.get(name='Salade')
+        MenuItem.objects.filter(pk=item.pk).update(allergen_mask=0)
+        self.client.force_authenticate(self.restaurant.owner)
+        response = self.client.patch(
+            '/api/v1/menu-items/bulk/', [{'id': item.pk, 'allergens': ['moutarde']}], format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        item.refresh_from_db()
+        self.assertEqual(item.allergen_mask, parse_tags('mustard'))
+
+
+class CategoryMembershipTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='ownerpass123', user_type='restaurant'
+        )
+        self.first, self.second, self.third = [
+            Restaurant.objects.create(
+                owner=owner,
+                name=name,
+                address='123 Test St',
+                latitude=48.8566,
+                longitude=2.3522,
+                phone_number='+33123456789'
+            ) for name in ('Pizzeria', 'Trattoria', 'Sushi Bar')
+        ]
+        self.pizzas = Category.objects.create(name='Pizzas')
+        self.sushis = Category.objects.create(name='Sushis')
+        for index in range(3):
+            MenuItem.objects.create(restaurant=self.first, category=self.pizzas, name=f'Pizza {index}', price='10.00')
+        MenuItem.objects.create(restaurant=self.second, category=self.pizzas, name='Calzone', price='11.00')
+        self.maki = MenuItem.objects.create(restaurant=self.third, category=self.sushis, name='Maki', price='6.00')
+        self.client = APIClient()
+
+    def memberships(self):
+        return set(RestaurantCategory.objects.values_list('restaurant__name', 'category__name', 'item_count'))
+
+    def test_memberships_follow_menu_items(self):
+        self.assertEqual(self.memberships(), {
+            ('Pizzeria', 'Pizzas', 3), ('Trattoria', 'Pizzas', 1), ('Sushi Bar', 'Sushis', 1),
+        })
+        self.maki.category = self.pizzas
+        self.maki.save()
+        self.assertIn(('Sushi Bar', 'Pizzas', 1), self.memberships())
+        self.assertNotIn(('Sushi Bar', 'Sushis', 1), self.memberships())
+
+        MenuItem.objects.get(name='Calzone').delete()
+        self.assertNotIn(('Trattoria', 'Pizzas', 1), self.memberships())
+
+    def test_saves_that_cannot_move_an_item_skip_memberships(self):
+        self.maki.image_variants = {'thumb': 'menu_items/maki_thumb.jpg'}
+        with CaptureQueriesContext(connection) as queries:
+            self.maki.save(update_fields=['image_variants'])
+        sql = [query['sql'] for query in queries.captured_queries]
+        # Ni relecture de la position du plat, ni recalcul des catégories du restaurant
+        self.assertFalse([
+            query for query in sql if query.startswith('SELECT') and 'FROM "restaurants_menuitem"' in query
+        ])
+        self.assertFalse([query for query in sql if 'restaurants_restaurantcategory' in query])
+
+        self.maki.category = self.pizzas
+        self.maki.save(update_fields=['category'])
+        self.assertIn(('Sushi Bar', 'Pizzas', 1), self.memberships())
+
+    def test_category_filter_uses_membership_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/restaurants/?category=pizz')
+        names = sorted(restaurant['name'] for restaurant in response.data['results'])
+        self.assertEqual(names, ['Pizzeria', 'Trattoria'])
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('DISTINCT', sql)
+        self.assertNotIn('restaurants_menuitem', sql)
+
+        response = self.client.get(f'/api/v1/restaurants/?category={self.sushis.pk}')
+        self.assertEqual([restaurant['name'] for restaurant in response.data['results']], ['Sushi Bar'])
+
+    def test_category_restaurants_listing(self):
+        Restaurant.objects.filter(pk=self.second.pk).update(popularity_score=5)
+        response = self.client.get(f'/api/v1/categories/{self.pizzas.pk}/restaurants/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([restaurant['name'] for restaurant in response.data['results']], ['Trattoria', 'Pizzeria'])
+        self.assertEqual(self.client.get('/api/v1/categories/9999/restaurants/').status_code, 404)
+
+    def test_bulk_update_refreshes_memberships(self):
+        self.client.force_authenticate(self.first.owner)
+        items = MenuItem.objects.filter(restaurant=self.first)
+        response = self.client.patch(
+            '/api/v1/menu-items/bulk/', [{'id': item.pk, 'category': self.sushis.pk} for item in items], format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(('Pizzeria', 'Sushis', 3), self.memberships())
+        self.assertNotIn(('Pizzeria', 'Pizzas', 3), self.memberships())
+
+
+class OwnerCatalogStreamTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            username='chaine', email='chaine@example.com', password='ownerpass123', user_type='restaurant'
+        )
+        restaurants = [
+            Restaurant.objects.create(
+                owner=self.owner,
+                name=f'Succursale {index}',
+                address='123 Test St',
+                latitude=48.8566,
+                longitude=2.3522,
+                phone_number='+33123456789'
+            ) for index in range(3)
+        ]
+        category = Category.objects.create(name='Plats')
+        MenuItem.objects.bulk_create([
+            MenuItem(restaurant=restaurants[index % 3], category=category, name=f'Plat {index}', price='9.90')
+            for index in range(1200)
+        ])
+        self.client = APIClient()
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_user_menus_streams_items_with_counts(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.read(self.client.get(f'/api/v1/menu-items/user/{self.owner.pk}/menus/'))
+        self.assertEqual(data['restaurant_count'], 3)
+        self.assertEqual(data['total_items'], 1200)
+        self.assertEqual(len(data['menu_items']), 1200)
+        self.assertEqual(data['menu_items'][0]['category_name'], 'Plats')
+        self.assertEqual(data['menu_items'][0]['price'], '9.90')
+        # Utilisateur, nombre de restaurants et lecture par lots : aucun COUNT(*) des plats
+        self.assertLess(len(queries), 10)
+        self.assertFalse(any('COUNT' in query['sql'] and 'menuitem' in query['sql'] for query in queries))
+
+    def test_items_are_serialized_chunk_by_chunk(self):
+        stream = SerializedStream(MenuItem.objects.select_related('category'), MenuItemSerializer, chunk_size=100)
+        parts = []
+        for part in stream:
+            # Le compteur avance avec l'écriture : rien n'est lu à l'avance
+            self.assertEqual(stream.count, 100 * (len(parts) + 1))
+            parts.append(part)
+        self.assertEqual(len(parts), 12)
+        self.assertEqual(len(json.loads(b''.join(iter_json_array(parts)))), 1200)
+
+    def test_user_restaurants_stream(self):
+        Restaurant.objects.filter(owner=self.owner).update(image='restaurants/facade.jpg')
+        data = self.read(self.client.get(f'/api/v1/restaurants/user/{self.owner.pk}/restaurants/'))
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['restaurants'][0]['image'], 'http://testserver/media/restaurants/facade.jpg')
+        self.assertEqual(data['user']['username'], 'chaine')
+        self.assertEqual(sorted(restaurant['name'] for restaurant in data['restaurants']),
+                         ['Succursale 0', 'Succursale 1', 'Succursale 2'])
+
+    def test_owner_without_restaurants(self):
+        other = User.objects.create_user(username='vide', email='vide@example.com', password='videpass123')
+        data = self.read(self.client.get(f'/api/v1/menu-items/user/{other.pk}/menus/'))
+        self.assertEqual(data, {'owner': 'vide', 'restaurant_count': 0, 'menu_items': [], 'total_items': 0})
+        self.assertEqual(self.client.get('/api/v1/menu-items/user/9999/menus/').status_code, 404)
+
+
+class HomeFeedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            username='accueil', email='accueil@example.com', password='ownerpass123', user_type='restaurant'
+        )
+        self.near = self.create_restaurant('Proche', 48.8570, 2.3525, popularity_score=5)
+        self.far = self.create_restaurant('Versailles', 48.8049, 2.1204, popularity_score=9)
+        self.category = Category.objects.create(name='Pizzas')
+        now = timezone.now()
+        self.promotion = Promotion.objects.create(
+            restaurant=self.near, name='Happy hour', promotion_type='percentage', discount_value=10,
+            valid_from=now - timedelta(days=1), valid_until=now + timedelta(days=1)
+        )
+        self.ad = RestaurantAdvertisement.objects.create(
+            restaurant=self.near, ad_type='banner', title='Nouveau menu', budget=100,
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1), status='active',
+            target_cities=['Paris']
+        )
+        self.client = APIClient()
+        self.params = {'lat': 48.8566, 'lng': 2.3522, 'city': 'Paris'}
+
+    def create_restaurant(self, name, latitude, longitude, **extra):
+        return Restaurant.objects.create(
+            owner=self.owner, name=name, address='123 Test St', latitude=latitude, longitude=longitude,
+            phone_number='+33123456789', **extra
+        )
+
+    def timings(self, response):
+        return dict(
+            (entry.split(';')[0], entry.split('desc=')[1].strip('"') if 'desc=' in entry else None)
+            for entry in response['Server-Timing'].split(', ')
+        )
+
+    def test_sections_in_one_response(self):
+        response = self.client.get('/api/v1/home/', self.params)
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual([restaurant['name'] for restaurant in data['popular']], ['Versailles', 'Proche'])
+        self.assertEqual([restaurant['name'] for restaurant in data['nearby']], ['Proche'])
+        self.assertEqual([promotion['name'] for promotion in data['promotions']], ['Happy hour'])
+        self.assertEqual([ad['title'] for ad in data['ads']], ['Nouveau menu'])
+        self.assertNotIn('budget', data['ads'][0])
+        self.assertEqual([category['name'] for category in data['categories']], ['Pizzas'])
+        self.assertEqual(
+            self.timings(response),
+            {'cache': None, 'popular': 'miss', 'nearby': 'miss', 'promotions': 'miss', 'ads': 'miss',
+             'categories': 'miss'}
+        )
+
+    def test_cached_feed_skips_database(self):
+        first = self.client.get('/api/v1/home/', self.params).data
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/home/', self.params)
+        self.assertEqual(response.data, first)
+        self.assertEqual(set(self.timings(response).values()), {None, 'hit'})
+
+    def test_cached_urls_follow_each_request_host(self):
+        Restaurant.objects.filter(pk=self.near.pk).update(image='restaurants/proche.jpg')
+        first = self.client.get('/api/v1/home/', self.params, secure=True)
+        self.assertEqual(first.data['nearby'][0]['image'], 'https://testserver/media/restaurants/proche.jpg')
+
+        # Servie depuis le cache, l'URL suit le schéma et l'hôte de cette requête-ci
+        second = self.client.get('/api/v1/home/', self.params)
+        self.assertEqual(self.timings(second)['nearby'], 'hit')
+        self.assertEqual(second.data['nearby'][0]['image'], 'http://testserver/media/restaurants/proche.jpg')
+
+    def test_sections_are_invalidated_independently(self):
+        self.client.get('/api/v1/home/', self.params)
+        self.promotion.name = 'Happy hour prolongée'
+        self.promotion.save()
+        # Les compteurs d'une publicité ne touchent pas au fil
+        self.ad.impressions += 1
+        self.ad.save(update_fields=['impressions'])
+
+        response = self.client.get('/api/v1/home/', self.params)
+        timings = self.timings(response)
+        self.assertEqual(timings['promotions'], 'miss')
+        self.assertEqual(timings['ads'], 'hit')
+        self.assertEqual(timings['categories'], 'hit')
+        self.assertEqual(response.data['promotions'][0]['name'], 'Happy hour prolongée')
+
+    def test_without_position(self):
+        response = self.client.get('/api/v1/home/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['nearby'], [])
+        self.assertNotIn('nearby', self.timings(response))
+        self.assertEqual(len(response.data['popular']), 2)
+
+        other_city = self.client.get('/api/v1/home/', {'city': 'Lyon'})
+        self.assertEqual(other_city.data['ads'], [])
+        self.assertEqual(self.client.get('/api/v1/home/', {'lat': 'x', 'lng': 2}).status_code, 400)
+
+
+class HomeFeedThreadsTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user(
+            username='accueil', email='accueil@example.com', password='ownerpass123', user_type='restaurant'
+        )
+        Restaurant.objects.create(
+            owner=owner, name='Proche', address='123 Test St', latitude=48.8570, longitude=2.3525,
+            phone_number='+33123456789', popularity_score=1
+        )
+        Category.objects.create(name='Pizzas')
+
+    def test_missing_sections_are_built_in_worker_threads(self):
+        threads = set()
+
+        def record(section, params):
+            threads.add(threading.current_thread().name)
+            return [section.name]
+
+        with mock.patch.object(home.CategoriesSection, 'build', record), \
+                mock.patch.object(home.PopularSection, 'build', record):
+            feed, timings = home.home_feed(48.8566, 2.3522)
+
+        self.assertEqual(feed['categories'], ['categories'])
+        self.assertEqual(feed['popular'], ['popular'])
+        self.assertTrue(all(name.startswith('home-feed') for name in threads))
+        # Les sections réelles sont aussi lues depuis les threads du pool
+        self.assertEqual(len(feed['nearby']), 1)
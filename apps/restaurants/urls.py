@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RestaurantViewSet, MenuItemViewSet, CategoryViewSet
+from .views import RestaurantViewSet, MenuItemViewSet, CategoryViewSet, HomeFeedViewSet
 
 router = DefaultRouter()
 router.register(r'restaurants', RestaurantViewSet)
 router.register(r'menu-items', MenuItemViewSet, basename='menuitem')
 router.register(r'categories', CategoryViewSet)
+router.register(r'home', HomeFeedViewSet, basename='home')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,50 +1,88 @@
+import csv
+import json
+from itertools import groupby
+from operator import attrgetter
 from rest_framework import viewsets, filters, status, permissions
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
-from geopy.distance import geodesic
-from .models import Restaurant, MenuItem, Category, RestaurantReview
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError
+from .models import Restaurant, MenuItem, Category, RestaurantReview, MenuImportJob
+from .imports import MenuImporter, detect_format, iter_rows
+from .filters import MenuItemFilter, RestaurantFilter, filter_nearby
+from .popularity import POPULAR_MAX_LIMIT, popular_restaurants
+from .home import home_feed, server_timing
+from .ratings import rating_breakdown
+from .dietary import allergen_mask
+from .membership import refresh_category_memberships
+from .cache import (
+    get_menu_document, restaurant_versions, reviews_versions, categories_versions, touch_restaurants
+)
 from .serializers import (
     RestaurantListSerializer, RestaurantDetailSerializer,
     MenuItemSerializer, CategorySerializer, RestaurantReviewSerializer, RestaurantCreateSerializer,
-    MenuItemBulkCreateSerializer
+    MenuItemBulkCreateSerializer, MenuItemBulkUpdateSerializer, MenuImportJobSerializer, requested_expansions
 )
+from .tasks import import_menu_items
 from apps.authentication.models import User
+from apps.search.filters import FullTextSearchFilter
+from apps.search.indexing import index_menu_items
+from ..core.http import conditional_get
+from ..core.pagination import KeysetPagination
+from ..core.streaming import SerializedStream, StreamingJSONResponse
 from ..core.permissions import IsRestaurantOwner
 
 
 class ProximityFilterBackend(filters.BaseFilterBackend):
+    """Filtre les restaurants autour d'une position (?lat=&lng=&radius=)"""
+    default_radius_km = 10
+
     def filter_queryset(self, request, queryset, view):
         latitude = request.query_params.get('lat')
         longitude = request.query_params.get('lng')
-        radius = request.query_params.get('radius', 10)  # 10km par défaut
 
-        if latitude and longitude:
-            user_location = (float(latitude), float(longitude))
-            restaurants_with_distance = []
+        if not (latitude and longitude):
+            return queryset
 
-            for restaurant in queryset:
-                restaurant_location = (restaurant.latitude, restaurant.longitude)
-                distance = geodesic(user_location, restaurant_location).kilometers
-
-                if distance <= float(radius):
-                    restaurant.distance_km = round(distance, 2)
-                    restaurants_with_distance.append(restaurant)
+        try:
+            latitude = float(latitude)
+            longitude = float(longitude)
+            radius = float(request.query_params.get('radius', self.default_radius_km))
+        except (TypeError, ValueError):
+            raise ValidationError({"message": "Les paramètres lat, lng et radius doivent être numériques"})
 
-            # Tri par distance
-            restaurants_with_distance.sort(key=lambda x: x.distance_km)
-            return restaurants_with_distance
+        queryset = filter_nearby(queryset, latitude, longitude, radius)
 
+        # Tri par distance, sauf si le client demande un autre tri
+        if not request.query_params.get('ordering'):
+            queryset = queryset.order_by('distance_km')
         return queryset
 
 
+class RestaurantOrderingFilter(filters.OrderingFilter):
+    """Ignore le tri par distance quand aucune position n'est fournie"""
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        ordering = super().remove_invalid_fields(queryset, fields, view, request)
+        if 'distance_km' not in queryset.query.annotations:
+            ordering = [term for term in ordering if term.lstrip('-') != 'distance_km']
+        return ordering
+
+
+# Taille des lots lus et sérialisés pour les exports en flux
+STREAM_CHUNK_SIZE = 500
+
+
 class RestaurantViewSet(viewsets.ModelViewSet):
     queryset = Restaurant.objects.filter(is_active=True)
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter, ProximityFilterBackend]
-    filterset_fields = ['is_accepting_orders']
-    search_fields = ['name', 'description']
-    ordering_fields = ['average_rating', 'estimated_delivery_time', 'created_at']
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, ProximityFilterBackend, RestaurantOrderingFilter]
+    filterset_class = RestaurantFilter
+    ordering_fields = ['average_rating', 'estimated_delivery_time', 'created_at', 'distance_km']
     permission_classes = [permissions.AllowAny]
 
     def get_permissions(self):
@@ -66,6 +104,11 @@ class RestaurantViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = super().get_queryset()
 
+        # Le menu n'est chargé que s'il est demandé (?expand=menu_items), en une requête
+        if self.action == 'retrieve' and 'menu_items' in requested_expansions(self.request):
+            queryset = queryset.prefetch_related(
+                Prefetch('menu_items', queryset=MenuItem.objects.select_related('category'))
+            )
         return queryset
 
     def create(self, request, *args, **kwargs):
@@ -84,6 +127,10 @@ class RestaurantViewSet(viewsets.ModelViewSet):
             "data": detail_serializer.data,
         }, status=status.HTTP_201_CREATED)
 
+    @conditional_get(restaurant_versions)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
@@ -102,49 +149,73 @@ class RestaurantViewSet(viewsets.ModelViewSet):
         instance.save()
 
     @action(detail=True, methods=['get'])
+    @conditional_get(restaurant_versions)
     def menu(self, request, pk=None):
-        """Récupère le menu complet du restaurant"""
+        """Récupère le menu complet du restaurant (document mis en cache)"""
+        try:
+            restaurant_id = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound("Restaurant non trouvé")
+
+        document = get_menu_document(restaurant_id, self._build_menu)
+        return Response(document['data'])
+
+    def _build_menu(self):
+        """Construit le menu en une seule requête, groupé par catégorie"""
         restaurant = self.get_object()
-        categories = Category.objects.filter(is_active=True)
+        items = MenuItem.objects.filter(
+            restaurant=restaurant,
+            is_available=True,
+            category__is_active=True
+        ).select_related('category').order_by(
+            'category__order', 'category__name', 'category_id', '-order_count', 'name'
+        )
 
         menu_data = []
-        for category in categories:
-            items = MenuItem.objects.filter(
-                restaurant=restaurant,
-                category=category,
-                is_available=True
-            )
-            if items.exists():
-                menu_data.append({
-                    'category': CategorySerializer(category).data,
-                    'items': MenuItemSerializer(items, many=True).data
-                })
-
-        return Response(menu_data)
+        for category, category_items in groupby(items, key=attrgetter('category')):
+            menu_data.append({
+                'category': CategorySerializer(category).data,
+                'items': MenuItemSerializer(list(category_items), many=True).data
+            })
+        return menu_data
 
     @action(detail=True, methods=['get'])
+    @conditional_get(reviews_versions)
     def reviews(self, request, pk=None):
         """Récupère les avis du restaurant"""
         restaurant = self.get_object()
-        reviews = RestaurantReview.objects.filter(restaurant=restaurant)
+        reviews = RestaurantReview.objects.filter(restaurant=restaurant).select_related('customer')
 
-        # Pagination
-        page = self.paginate_queryset(reviews)
-        if page is not None:
-            serializer = RestaurantReviewSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+        # Pagination par curseur : pas de COUNT(*) ni d'OFFSET sur les gros volumes d'avis
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(reviews, request, view=self)
+        serializer = RestaurantReviewSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-        serializer = RestaurantReviewSerializer(reviews, many=True)
-        return Response(serializer.data)
+    @action(detail=True, methods=['get'], url_path='rating-breakdown')
+    @conditional_get(restaurant_versions)
+    def rating_breakdown(self, request, pk=None):
+        """Répartition des notes du restaurant (sans parcourir les avis)"""
+        return Response(rating_breakdown(self.get_object()))
 
     @action(detail=False, methods=['get'])
     def popular(self, request):
-        """Restaurants populaires"""
-        popular_restaurants = self.get_queryset().filter(
-            average_rating__gte=4.0
-        ).order_by('-total_reviews')[:10]
-
-        serializer = self.get_serializer(popular_restaurants, many=True)
+        """Restaurants populaires (score recalculé périodiquement, ?lat=&lng= pour la zone)"""
+        latitude = request.query_params.get('lat')
+        longitude = request.query_params.get('lng')
+        try:
+            limit = int(request.query_params.get('limit', 10))
+            if latitude and longitude:
+                latitude, longitude = float(latitude), float(longitude)
+            else:
+                latitude = longitude = None
+        except (TypeError, ValueError):
+            raise ValidationError({"message": "Les paramètres lat, lng et limit doivent être numériques"})
+        if not 1 <= limit <= POPULAR_MAX_LIMIT:
+            raise ValidationError({"message": f"limit doit être compris entre 1 et {POPULAR_MAX_LIMIT}"})
+
+        restaurants = popular_restaurants(self.get_queryset(), limit, latitude, longitude)
+        serializer = self.get_serializer(restaurants, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'], url_path='user/(?P<user_id>\d+)/restaurants')
@@ -160,31 +231,38 @@ class RestaurantViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Pour le propriétaire, on affiche TOUS ses restaurants (actifs et inactifs)
-        restaurants = Restaurant.objects.filter(owner=user)
-        serializer = RestaurantListSerializer(restaurants, many=True)
-
-        return Response({
-            "user": {
+        # Pour le propriétaire, on affiche TOUS ses restaurants (actifs et inactifs), envoyés par lots
+        restaurants = SerializedStream(
+            Restaurant.objects.filter(owner=user),
+            RestaurantListSerializer,
+            context=self.get_serializer_context(),
+            chunk_size=STREAM_CHUNK_SIZE
+        )
+        return StreamingJSONResponse([
+            ("user", {
                 "id": user.id,
                 "username": user.username,
                 "email": user.email
-            },
-            "restaurants": serializer.data,
-            "count": restaurants.count()
-        })
+            }),
+            ("restaurants", restaurants),
+            ("count", lambda: restaurants.count),
+        ])
+
+
+BULK_UPDATE_MAX_ITEMS = 5000
+# Au-delà, un bulk_update unique coûte moins qu'un UPDATE par jeu de modifications
+BULK_UPDATE_MAX_GROUPS = 20
 
 
 class MenuItemViewSet(viewsets.ModelViewSet):  # Changé en ModelViewSet
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ['restaurant', 'category', 'is_available']
-    search_fields = ['name', 'description']
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
+    filterset_class = MenuItemFilter
     permission_classes = [permissions.AllowAny]
 
     def get_permissions(self):
-        if self.action == 'create':
+        if self.action in ['create', 'bulk_update', 'import_items', 'import_status']:
             return [permissions.IsAuthenticated(), IsRestaurantOwner()]
         return super().get_permissions()
 
@@ -206,6 +284,131 @@ class MenuItemViewSet(viewsets.ModelViewSet):  # Changé en ModelViewSet
             "created_items": MenuItemSerializer(menu_items, many=True).data
         })
 
+    @action(detail=False, methods=['patch'], url_path='bulk')
+    def bulk_update(self, request):
+        """
+        Modifie plusieurs plats en une requête : [{"id": 1, "price": "9.50"}, {"id": 2, "is_available": false}].
+        Tout ou rien : un plat inconnu ou d'un autre restaurateur annule la mise à jour.
+        """
+        payload = request.data.get('items') if isinstance(request.data, dict) else request.data
+        if not isinstance(payload, list) or not payload:
+            return Response({"message": "Une liste de modifications est attendue"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(payload) > BULK_UPDATE_MAX_ITEMS:
+            return Response({"message": f"{BULK_UPDATE_MAX_ITEMS} plats au maximum par requête"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = MenuItemBulkUpdateSerializer(data=payload, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        changes = {data['id']: data for data in serializer.validated_data}
+        if len(changes) != len(payload):
+            return Response({"message": "Un même plat apparaît plusieurs fois"}, status=status.HTTP_400_BAD_REQUEST)
+
+        category_ids = {data['category'] for data in changes.values() if data.get('category')}
+        if category_ids:
+            unknown = category_ids - set(Category.objects.filter(pk__in=category_ids).values_list('pk', flat=True))
+            if unknown:
+                return Response({"message": "Catégories inconnues", "categories": sorted(unknown)},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        # Propriété vérifiée en une requête : seuls les plats du restaurateur sont chargés
+        items = list(MenuItem.objects.filter(pk__in=changes, restaurant__owner=request.user))
+        missing = set(changes) - {item.pk for item in items}
+        if missing:
+            return Response({"message": "Plats introuvables ou non autorisés", "ids": sorted(missing)},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            self._apply_bulk_changes(items, changes)
+            # Les écritures groupées ne déclenchent pas les signaux : invalider et réindexer une seule fois
+            restaurant_ids = {item.restaurant_id for item in items}
+            if any('category' in data for data in changes.values()):
+                refresh_category_memberships(*restaurant_ids)
+            touch_restaurants(*restaurant_ids)
+            index_menu_items(items)
+
+        return Response({"message": f"{len(items)} plats mis à jour", "updated": len(items)})
+
+    @staticmethod
+    def _apply_bulk_changes(items, changes):
+        """
+        Un UPDATE ... WHERE id IN (...) par jeu de modifications identique (cas
+        courant : même prix ou même disponibilité pour tout un lot), sinon
+        bulk_update (CASE WHEN par ligne, coûteux à compiler).
+        """
+        groups = {}
+        for item in items:
+            values = {
+                'category_id' if field == 'category' else field: value
+                for field, value in changes[item.pk].items() if field != 'id'
+            }
+            if 'allergens' in values:
+                values['allergen_mask'] = allergen_mask(values['allergens'])
+            for field, value in values.items():
+                setattr(item, field, value)
+            key = json.dumps(values, sort_keys=True, default=str)
+            groups.setdefault(key, (values, []))[1].append(item.pk)
+
+        if len(groups) <= BULK_UPDATE_MAX_GROUPS:
+            for values, pks in groups.values():
+                MenuItem.objects.filter(pk__in=pks).update(**values)
+        else:
+            fields = sorted({field for values, _ in groups.values() for field in values})
+            MenuItem.objects.bulk_update(items, fields, batch_size=500)
+
+        # bulk_update et update() n'appliquent pas auto_now
+        now = timezone.now()
+        MenuItem.objects.filter(pk__in=[item.pk for item in items]).update(updated_at=now)
+        for item in items:
+            item.updated_at = now
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_items(self, request):
+        """
+        Import en masse depuis un fichier CSV ou JSON lines (champ `file`).
+        ?partial=true conserve les lignes valides ; ?async=true lance l'import en tâche de fond.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"message": "Fichier manquant (champ 'file')"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            file_format = detect_format(upload.name, request.data.get('format'))
+        except ValueError as error:
+            return Response({"message": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        partial = request.query_params.get('partial') in ('1', 'true')
+        if request.query_params.get('async') in ('1', 'true'):
+            job = MenuImportJob.objects.create(
+                owner=request.user, file=upload, file_format=file_format, partial=partial
+            )
+            transaction.on_commit(lambda: import_menu_items.delay(str(job.pk)))
+            return Response({
+                "message": "Import lancé",
+                "job": MenuImportJobSerializer(job).data,
+            }, status=status.HTTP_202_ACCEPTED)
+
+        try:
+            report = MenuImporter(request.user, partial=partial).run(iter_rows(upload, file_format))
+        except UnicodeDecodeError:
+            return Response({"message": "Le fichier doit être encodé en UTF-8"}, status=status.HTTP_400_BAD_REQUEST)
+        except csv.Error as error:
+            # Fichier CSV mal formé (champ trop long, guillemets...) : rien n'est importé
+            return Response({"message": f"Fichier CSV invalide : {error}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if report['error_count'] and not partial:
+            return Response({"message": "Import annulé : des lignes sont invalides", **report},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({"message": f"{report['created']} plats importés", **report},
+                        status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path=r'import/(?P<job_id>[0-9a-f-]+)')
+    def import_status(self, request, job_id=None):
+        """Progression d'un import lancé avec ?async=true"""
+        try:
+            job = MenuImportJob.objects.get(pk=job_id, owner=request.user)
+        except (MenuImportJob.DoesNotExist, DjangoValidationError):
+            return Response({"message": "Import non trouvé"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(MenuImportJobSerializer(job).data)
+
     @action(detail=False, methods=['get'], url_path=r'user/(?P<user_id>\d+)/menus')
     def user_menus(self, request, user_id=None):
         """
@@ -219,30 +422,23 @@ class MenuItemViewSet(viewsets.ModelViewSet):  # Changé en ModelViewSet
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Récupérer tous les restaurants du propriétaire (actifs ou non)
-        restaurants = Restaurant.objects.filter(owner=user)
-        if not restaurants.exists():
-            # Retourner une liste vide au lieu d'une erreur
-            return Response({
-                "owner": user.get_full_name() or user.username,
-                "restaurant_count": 0,
-                "menu_items": [],
-                "total_items": 0
-            })
-
-        # Récupérer TOUS les menus des restaurants du propriétaire (disponibles ou non)
-        menu_items = MenuItem.objects.filter(
-            restaurant__in=restaurants
-        ).select_related('restaurant', 'category')
-
-        serializer = self.get_serializer(menu_items, many=True)
-
-        return Response({
-            "owner": user.get_full_name() or user.username,
-            "restaurant_count": restaurants.count(),
-            "menu_items": serializer.data,
-            "total_items": menu_items.count()
-        })
+        # Restaurants du propriétaire (actifs ou non) : COUNT indexé sur owner_id, à part car
+        # un restaurant sans plat n'apparaît pas dans le flux des plats
+        restaurant_count = Restaurant.objects.filter(owner=user).count()
+
+        # TOUS les plats (disponibles ou non), sérialisés et envoyés par lots
+        menu_items = SerializedStream(
+            MenuItem.objects.filter(restaurant__owner=user).select_related('category'),
+            self.get_serializer_class(),
+            context=self.get_serializer_context(),
+            chunk_size=STREAM_CHUNK_SIZE
+        )
+        return StreamingJSONResponse([
+            ("owner", user.get_full_name() or user.username),
+            ("restaurant_count", restaurant_count),
+            ("menu_items", menu_items),
+            ("total_items", lambda: menu_items.count),
+        ])
 
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
@@ -250,6 +446,14 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
 
+    @conditional_get(categories_versions)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get(categories_versions)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=False, methods=['get'], url_path='(?P<id>[^/.]+)/menus')
     def get_category_menus(self, request, id=None):
         try:
@@ -268,3 +472,39 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
             "data": serializer.data,
             "count": menus.count()
         })
+
+    @action(detail=True, methods=['get'])
+    def restaurants(self, request, pk=None):
+        """Restaurants qui proposent des plats de cette catégorie, les plus populaires d'abord"""
+        category = self.get_object()
+        # Une ligne d'appartenance par restaurant : la jointure ne duplique rien
+        queryset = Restaurant.objects.filter(
+            is_active=True, category_memberships__category=category
+        ).order_by('-popularity_score', '-id')
+
+        page = self.paginate_queryset(queryset)
+        serializer = RestaurantListSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+
+class HomeFeedViewSet(viewsets.ViewSet):
+    """Écran d'accueil en un appel : populaires, proches, promotions, publicités et catégories"""
+    permission_classes = [permissions.AllowAny]
+
+    def list(self, request):
+        latitude = request.query_params.get('lat')
+        longitude = request.query_params.get('lng')
+        try:
+            if latitude and longitude:
+                latitude, longitude = float(latitude), float(longitude)
+            else:
+                latitude = longitude = None
+        except (TypeError, ValueError):
+            raise ValidationError({"message": "Les paramètres lat et lng doivent être numériques"})
+        if latitude is not None and not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValidationError({"message": "Position invalide"})
+
+        feed, timings = home_feed(latitude, longitude, request.query_params.get('city') or None, request=request)
+        response = Response(feed)
+        response['Server-Timing'] = server_timing(timings)
+        return response
@@ -0,0 +1,4 @@
+from django.contrib import admin
+from .models import SearchEntry
+
+admin.site.register(SearchEntry)
@@ -0,0 +1,404 @@
+"""
+Autocomplétion en mémoire (un index par processus).
+
+Un trie des préfixes des noms (restaurants, plats, catégories) garde à chaque
+nœud les meilleures entrées par popularité : une requête coûte O(longueur du
+préfixe), sans accès à la base.
+
+Fraîcheur :
+- les signaux mettent à jour l'index du processus courant immédiatement ;
+- les autres processus récupèrent toutes les SYNC_INTERVAL secondes les lignes
+  modifiées depuis leur dernière synchronisation (updated_at) ;
+- les suppressions et les catégories, invisibles par updated_at, sont publiées
+  dans un journal numéroté du cache partagé, rejoué entrée par entrée par les
+  autres processus. Une reconstruction complète n'a lieu qu'au démarrage ou si
+  le journal a un trou (entrées expirées, cache vidé).
+
+Seule la construction initiale a lieu pendant une requête : les vérifications
+suivantes tournent dans un thread du processus, les requêtes étant servies par
+l'index courant en attendant.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from apps.core.utils import normalize_text
+
+TOP_K = 20
+MAX_PREFIX_LENGTH = 20
+SYNC_INTERVAL = 5  # secondes
+SYNC_OVERLAP = timedelta(seconds=2)
+GENERATION_KEY = 'search:autocomplete:generation'
+LOG_KEY = 'search:autocomplete:log'  # numéro de la dernière entrée ; entrées sous f'{LOG_KEY}:{numéro}'
+LOG_ENTRY_TIMEOUT = 60 * 60
+MAX_LOG_REPLAY = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class _Node:
+    __slots__ = ('children', 'top', 'ending', 'count', 'dirty')
+
+    def __init__(self):
+        self.children = {}
+        self.top = []  # [(score, key)] trié par score décroissant
+        self.ending = None  # clés dont une chaîne indexée se termine ici
+        self.count = 0  # nombre d'entrées passant par ce nœud
+        self.dirty = False
+
+
+class PrefixTrie:
+    """Trie des préfixes de mots avec top-K pré-calculé par nœud"""
+
+    def __init__(self, top_k=TOP_K, max_prefix_length=MAX_PREFIX_LENGTH):
+        self.top_k = top_k
+        self.max_prefix_length = max_prefix_length
+        self.root = _Node()
+        self.entries = {}  # key -> (score, label, data)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _prefixes(self, label):
+        """Chaînes indexées : le nom normalisé à partir de chaque début de mot"""
+        words = normalize_text(label).split()
+        return {' '.join(words[index:])[:self.max_prefix_length] for index in range(len(words))}
+
+    def _paths(self, label, create=False):
+        """Nœuds traversés (dédoublonnés) et nœuds terminaux des chaînes d'un nom"""
+        nodes = []
+        ends = []
+        for text in self._prefixes(label):
+            node = self.root
+            for char in text:
+                children = node.children
+                node = children.get(char)
+                if node is None:
+                    if not create:
+                        break
+                    node = children[char] = _Node()
+                nodes.append(node)
+            else:
+                ends.append(node)
+        return dict.fromkeys(nodes), ends
+
+    def add(self, key, label, score, data=None):
+        """Ajoute ou met à jour une entrée"""
+        previous = self.entries.get(key)
+        if previous is not None:
+            if previous[1] == label and previous[0] <= score:
+                self.entries[key] = (score, label, data)
+                nodes, _ = self._paths(label)
+                for node in nodes:
+                    self._promote(node, key, score, known=True)
+                return
+            self.remove(key)
+
+        self.entries[key] = (score, label, data)
+        nodes, ends = self._insert(key, label)
+        for node in nodes:
+            self._promote(node, key, score)
+
+    def build(self, entries):
+        """Chargement en masse : les tops sont calculés une seule fois, de bas en haut"""
+        for key, label, score, data in entries:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (score, label, data)
+            nodes, _ = self._insert(key, label)
+            for node in nodes:
+                node.dirty = True
+        if self.root.children:
+            self._refresh(self.root)
+
+    def _insert(self, key, label):
+        nodes, ends = self._paths(label, create=True)
+        for node in nodes:
+            node.count += 1
+        for node in ends:
+            if node.ending is None:
+                node.ending = set()
+            node.ending.add(key)
+        return nodes, ends
+
+    def _promote(self, node, key, score, known=False):
+        top = node.top
+        if not known and len(top) >= self.top_k and score <= top[-1][0]:
+            return
+        top = [item for item in top if item[1] != key]
+        if len(top) < self.top_k or score > top[-1][0]:
+            top.append((score, key))
+            top.sort(key=lambda item: -item[0])
+            del top[self.top_k:]
+        node.top = top
+
+    def remove(self, key):
+        """Retire une entrée"""
+        previous = self.entries.pop(key, None)
+        if previous is None:
+            return
+        nodes, ends = self._paths(previous[1])
+        for node in nodes:
+            node.count -= 1
+            size = len(node.top)
+            node.top = [item for item in node.top if item[1] != key]
+            if len(node.top) < size and node.count > len(node.top):
+                # Une entrée hors du top peut désormais y entrer
+                node.dirty = True
+        for node in ends:
+            if node.ending:
+                node.ending.discard(key)
+
+    def _refresh(self, node):
+        """Recalcule le top d'un nœud à partir de ses enfants"""
+        candidates = set(node.ending or ())
+        for child in node.children.values():
+            if child.dirty:
+                self._refresh(child)
+            candidates.update(key for _, key in child.top)
+        ranked = sorted(((self.entries[key][0], key) for key in candidates), key=lambda item: -item[0])
+        node.top = ranked[:self.top_k]
+        node.dirty = False
+
+    def complete(self, prefix, limit=10):
+        """Meilleures entrées dont un mot commence par `prefix`"""
+        text = normalize_text(prefix)
+        if not text:
+            return []
+
+        node = self.root
+        for char in text[:self.max_prefix_length]:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        if node.dirty:
+            self._refresh(node)
+
+        results = []
+        for score, key in node.top:
+            _, label, data = self.entries[key]
+            if len(text) > self.max_prefix_length and text not in normalize_text(label):
+                continue
+            results.append((key, label, score, data))
+            if len(results) >= limit:
+                break
+        return results
+
+
+class AutocompleteIndex:
+    """Index d'autocomplétion du processus, tenu à jour depuis la base"""
+
+    def __init__(self, background=True):
+        self.trie = None
+        self.generation = None
+        self.log_sequence = 0
+        self.synced_at = None
+        self.checked_at = 0.0
+        self.lock = threading.RLock()  # modifications du trie
+        self.refresh_lock = threading.Lock()  # une seule vérification à la fois
+        self.background = background
+        self.refresher = None
+
+    # Entrées
+    @staticmethod
+    def restaurant_entry(restaurant_id, name, total_reviews):
+        return ('restaurant', restaurant_id), name, total_reviews, {}
+
+    @staticmethod
+    def menu_item_entry(item_id, name, order_count, restaurant_id, restaurant_name):
+        return ('menu_item', item_id), name, order_count, {
+            'restaurant_id': restaurant_id,
+            'restaurant_name': restaurant_name,
+        }
+
+    @staticmethod
+    def category_entry(category_id, name, item_count):
+        return ('category', category_id), name, item_count, {}
+
+    def _rows(self, since=None, restaurant_id=None, items=True):
+        """Entrées (key, label, score, data, visible) des restaurants et plats modifiés depuis `since`"""
+        from apps.restaurants.models import Restaurant, MenuItem
+
+        restaurants = Restaurant.objects.all()
+        items = MenuItem.objects.all() if items else MenuItem.objects.none()
+        if since is not None:
+            restaurants = restaurants.filter(updated_at__gte=since)
+            items = items.filter(Q(updated_at__gte=since) | Q(restaurant__updated_at__gte=since))
+        if restaurant_id is not None:
+            restaurants = restaurants.filter(pk=restaurant_id)
+            items = items.filter(restaurant_id=restaurant_id)
+
+        for restaurant_id, name, total_reviews, is_active in restaurants.values_list(
+                'id', 'name', 'total_reviews', 'is_active').iterator(chunk_size=2000):
+            yield (*self.restaurant_entry(restaurant_id, name, total_reviews), is_active)
+
+        for item_id, name, order_count, restaurant_id, restaurant_name, is_available, restaurant_active in \
+                items.values_list('id', 'name', 'order_count', 'restaurant_id', 'restaurant__name',
+                                  'is_available', 'restaurant__is_active').iterator(chunk_size=2000):
+            yield (
+                *self.menu_item_entry(item_id, name, order_count, restaurant_id, restaurant_name),
+                is_available and restaurant_active
+            )
+
+    def _apply_rows(self, rows):
+        for key, label, score, data, visible in rows:
+            if visible:
+                self.trie.add(key, label, score, data)
+            else:
+                self.trie.remove(key)
+
+    def rebuild(self, generation):
+        """Reconstruction complète de l'index"""
+        from apps.restaurants.models import Category
+
+        synced_at = timezone.now() - SYNC_OVERLAP
+        # Les changements publiés pendant la construction seront rejoués ensuite
+        log_sequence = self.last_log_sequence()
+        trie = PrefixTrie()
+        trie.build(row[:4] for row in self._rows() if row[4])
+        categories = Category.objects.filter(is_active=True).annotate(
+            item_count=Count('menuitem', filter=Q(menuitem__is_available=True))
+        ).values_list('id', 'name', 'item_count')
+        trie.build(self.category_entry(*category) for category in categories)
+
+        # Les changements appliqués à l'ancien index pendant la construction sont repris
+        # par la synchronisation suivante (updated_at ou journal)
+        with self.lock:
+            self.trie = trie
+            self.generation = generation
+            self.synced_at = synced_at
+            self.log_sequence = log_sequence
+
+    def sync(self):
+        """Applique les lignes modifiées depuis la dernière synchronisation"""
+        synced_at = timezone.now() - SYNC_OVERLAP
+        rows = list(self._rows(since=self.synced_at))
+        with self.lock:
+            self._apply_rows(rows)
+            self.synced_at = synced_at
+
+    def refresh(self):
+        """Rejoue le journal et synchronise, ou reconstruit l'index si nécessaire"""
+        generation = cache.get(GENERATION_KEY)
+        if generation is None:
+            generation = time.time_ns()
+            cache.add(GENERATION_KEY, generation, None)
+            generation = cache.get(GENERATION_KEY, generation)
+        if self.trie is None or generation != self.generation or not self.replay_log():
+            self.rebuild(generation)
+        else:
+            self.sync()
+
+    def ensure_fresh(self):
+        """
+        Construit l'index au premier appel ; ensuite, au plus une fois par
+        SYNC_INTERVAL, lance refresh() sans faire attendre la requête.
+        """
+        if self.trie is not None and time.monotonic() - self.checked_at < SYNC_INTERVAL:
+            return
+        if self.trie is None:
+            with self.refresh_lock:
+                if self.trie is None:
+                    self.checked_at = time.monotonic()
+                    self.refresh()
+            return
+        if not self.refresh_lock.acquire(blocking=False):
+            return  # vérification déjà en cours
+        self.checked_at = time.monotonic()
+        if not self.background:
+            try:
+                self.refresh()
+            finally:
+                self.refresh_lock.release()
+            return
+        self.refresher = threading.Thread(
+            target=self._refresh_in_background, name='autocomplete-sync', daemon=True
+        )
+        self.refresher.start()
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("Synchronisation de l'index d'autocomplétion impossible")
+        finally:
+            # Connexion ouverte par ce thread : fermée pour ne pas la laisser fuir
+            connections.close_all()
+            self.refresh_lock.release()
+
+    def complete(self, prefix, limit=10, kinds=None):
+        self.ensure_fresh()
+        results = self.trie.complete(prefix, limit=TOP_K if kinds else limit)
+        if kinds:
+            results = [result for result in results if result[0][0] in kinds][:limit]
+        return results
+
+    # Mises à jour incrémentales du processus courant (appelées par les signaux)
+    def apply(self, key, label, score, data, visible):
+        with self.lock:
+            if self.trie is None:
+                return
+            if visible:
+                self.trie.add(key, label, score, data)
+            else:
+                self.trie.remove(key)
+
+    def reload_restaurant(self, restaurant_id, items=True):
+        """Recharge un restaurant et, si son nom ou son activité a changé, ses plats"""
+        with self.lock:
+            if self.trie is not None:
+                self._apply_rows(self._rows(restaurant_id=restaurant_id, items=items))
+
+    def publish(self, key, label=None, score=0, data=None, visible=False):
+        """
+        Applique un changement invisible par updated_at (suppression, catégorie)
+        dans ce processus, et le journalise pour les autres après le commit.
+        """
+        change = (key, label, score, data, visible)
+        self.apply(*change)
+        transaction.on_commit(lambda: self.log_change(change))
+
+    # Journal partagé des changements
+    @staticmethod
+    def last_log_sequence():
+        cache.add(LOG_KEY, 0, None)
+        return cache.get(LOG_KEY, 0)
+
+    @staticmethod
+    def log_change(change):
+        cache.add(LOG_KEY, 0, None)
+        sequence = cache.incr(LOG_KEY)
+        cache.set(f'{LOG_KEY}:{sequence}', change, LOG_ENTRY_TIMEOUT)
+
+    def replay_log(self):
+        """Rejoue les entrées du journal non encore vues ; False si une reconstruction est nécessaire"""
+        last = self.last_log_sequence()
+        if last < self.log_sequence or last - self.log_sequence > MAX_LOG_REPLAY:
+            return False
+        sequences = range(self.log_sequence + 1, last + 1)
+        changes = cache.get_many([f'{LOG_KEY}:{sequence}' for sequence in sequences])
+        with self.lock:
+            for sequence in sequences:
+                change = changes.get(f'{LOG_KEY}:{sequence}')
+                if change is None:
+                    # Entrée suivante déjà écrite : celle-ci a expiré ou est perdue
+                    if any(f'{LOG_KEY}:{later}' in changes for later in range(sequence + 1, last + 1)):
+                        return False
+                    break  # numéro réservé mais entrée pas encore écrite : reprise au prochain passage
+                self._apply_rows([change])
+                self.log_sequence = sequence
+        return True
+
+    @staticmethod
+    def invalidate():
+        """Force la reconstruction de l'index dans tous les processus"""
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+autocomplete_index = AutocompleteIndex()
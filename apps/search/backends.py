@@ -0,0 +1,238 @@
+"""
+Moteurs de l'index de recherche.
+
+- SQLite (dev/test) : table virtuelle FTS5 `search_fts`, synchronisée par triggers ;
+- PostgreSQL : index GIN sur un tsvector pondéré (titre A, description B) ;
+- autres bases : repli sur des `contains` sur le texte normalisé.
+
+Le texte est normalisé (sans accents) avant indexation et à la requête, donc
+« crêpe » et « crepe » se retrouvent. Les mots inconnus du vocabulaire sont
+élargis aux termes proches (distance d'édition) pour tolérer les fautes de frappe.
+"""
+import difflib
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, FloatField, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.expressions import RawSQL
+
+from apps.core.utils import normalize_text
+from .models import SearchEntry
+
+MAX_QUERY_TERMS = 8
+MIN_TYPO_LENGTH = 4
+MAX_CORRECTIONS = 3
+CORRECTION_CUTOFF = 0.75
+VOCABULARY_CACHE_TIMEOUT = 10 * 60  # 10 minutes
+
+
+class DatabaseSearchBackend:
+    """Moteur de repli, sans index plein texte"""
+
+    def search(self, query, kinds=None, limit=20, include_inactive=False):
+        """Retourne les entrées correspondant à `query`, les plus pertinentes d'abord"""
+        groups = self.term_groups(query)
+        if not groups:
+            return []
+        return list(self.execute(groups, kinds, limit, include_inactive))
+
+    def rank_queryset(self, queryset, kind, query):
+        """
+        Restreint `queryset` (restaurants ou plats) aux objets trouvés et l'annote
+        par pertinence (`search_rank`, puis `search_popularity`), en SQL : aucun
+        plafond sur le nombre de résultats, la pagination porte sur tous.
+        """
+        groups = self.term_groups(query)
+        if not groups:
+            return queryset.none()
+        entries = SearchEntry.objects.filter(kind=kind, object_id=OuterRef('pk'))
+        return queryset.filter(pk__in=self.matching_ids(groups, kind)).annotate(
+            search_rank=self.rank_expression(groups, kind, queryset.model),
+            search_popularity=Subquery(entries.values('popularity')[:1]),
+        )
+
+    def term_groups(self, query):
+        """Termes de la requête, chacun élargi aux mots proches"""
+        terms = normalize_text(query).split()[:MAX_QUERY_TERMS]
+        return [self.expand_term(term) for term in terms]
+
+    def expand_term(self, term):
+        """Ajoute au terme les mots proches du vocabulaire s'il n'y figure pas"""
+        if len(term) < MIN_TYPO_LENGTH:
+            return [term]
+        vocabulary = self.vocabulary(term[0])
+        if any(word.startswith(term) for word in vocabulary):
+            return [term]
+        candidates = [word for word in vocabulary if abs(len(word) - len(term)) <= 2]
+        return [term] + difflib.get_close_matches(term, candidates, n=MAX_CORRECTIONS, cutoff=CORRECTION_CUTOFF)
+
+    def vocabulary(self, initial):
+        """Mots indexés commençant par `initial` (vocabulaire mis en cache)"""
+        vocabulary = cache.get('search:vocabulary')
+        if vocabulary is None:
+            words = set()
+            texts = SearchEntry.objects.values_list('title_search', 'body_search')
+            for title, body in texts.iterator(chunk_size=2000):
+                words.update(title.split())
+                words.update(body.split())
+            vocabulary = {}
+            for word in words:
+                vocabulary.setdefault(word[0], []).append(word)
+            cache.set('search:vocabulary', vocabulary, VOCABULARY_CACHE_TIMEOUT)
+        return vocabulary.get(initial, [])
+
+    def matching(self, queryset, groups):
+        for group in groups:
+            condition = Q()
+            for term in group:
+                condition |= Q(title_search__contains=term) | Q(body_search__contains=term)
+            queryset = queryset.filter(condition)
+        return queryset
+
+    def score(self, groups):
+        first_term = groups[0][0]
+        return Case(
+            When(title_search__startswith=first_term, then=Value(2)),
+            When(title_search__contains=first_term, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    def execute(self, groups, kinds, limit, include_inactive):
+        queryset = SearchEntry.objects.all()
+        if not include_inactive:
+            queryset = queryset.filter(is_active=True, restaurant_active=True)
+        if kinds:
+            queryset = queryset.filter(kind__in=kinds)
+        queryset = self.matching(queryset, groups)
+        return queryset.annotate(score=self.score(groups)).order_by('-score', '-popularity')[:limit]
+
+    def matching_ids(self, groups, kind):
+        """Sous-requête des identifiants d'objets `kind` trouvés"""
+        return self.matching(SearchEntry.objects.filter(kind=kind), groups).values('object_id')
+
+    def rank_expression(self, groups, kind, model):
+        """Score de pertinence de chaque ligne de `model` (plus grand = plus pertinent)"""
+        entries = SearchEntry.objects.filter(kind=kind, object_id=OuterRef('pk'))
+        return Subquery(entries.annotate(score=self.score(groups)).values('score')[:1])
+
+    @staticmethod
+    def outer_pk(model):
+        """Clé primaire de la requête englobante, pour les sous-requêtes corrélées en SQL brut"""
+        quote = connection.ops.quote_name
+        return f'{quote(model._meta.db_table)}.{quote(model._meta.pk.column)}'
+
+    def visibility_sql(self, kinds, include_inactive):
+        """Conditions SQL communes aux moteurs plein texte"""
+        clauses, params = [], []
+        if not include_inactive:
+            clauses.append('e.is_active AND e.restaurant_active')
+        if kinds:
+            clauses.append(f"e.kind IN ({', '.join(['%s'] * len(kinds))})")
+            params.extend(kinds)
+        return ''.join(f' AND {clause}' for clause in clauses), params
+
+
+class SQLiteSearchBackend(DatabaseSearchBackend):
+    """FTS5 avec classement BM25 (le titre pèse 10 fois plus que la description)"""
+
+    def vocabulary(self, initial):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT term FROM search_fts_vocab WHERE term >= %s AND term < %s',
+                [initial, chr(ord(initial) + 1)]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def match_expression(groups):
+        return ' '.join(
+            '(' + ' OR '.join([f'"{group[0]}"*'] + [f'"{term}"' for term in group[1:]]) + ')'
+            for group in groups
+        )
+
+    def execute(self, groups, kinds, limit, include_inactive):
+        match = self.match_expression(groups)
+        visibility, params = self.visibility_sql(kinds, include_inactive)
+        sql = (
+            f'SELECT e.*, -bm25(search_fts, 10.0, 1.0) AS score '
+            f'FROM search_fts JOIN {SearchEntry._meta.db_table} e ON e.id = search_fts.rowid '
+            f'WHERE search_fts MATCH %s{visibility} '
+            f'ORDER BY score DESC, e.popularity DESC LIMIT %s'
+        )
+        return SearchEntry.objects.raw(sql, [match, *params, limit])
+
+    def matching_ids(self, groups, kind):
+        return RawSQL(
+            f'SELECT e.object_id FROM search_fts JOIN {SearchEntry._meta.db_table} e ON e.id = search_fts.rowid '
+            f'WHERE search_fts MATCH %s AND e.kind = %s',
+            [self.match_expression(groups), kind]
+        )
+
+    def rank_expression(self, groups, kind, model):
+        # Entrée trouvée par (kind, object_id), puis accès FTS par rowid : pas de parcours par ligne
+        return RawSQL(
+            f'SELECT -bm25(search_fts, 10.0, 1.0) FROM {SearchEntry._meta.db_table} e '
+            f'JOIN search_fts ON search_fts.rowid = e.id '
+            f'WHERE e.kind = %s AND e.object_id = {self.outer_pk(model)} AND search_fts MATCH %s',
+            [kind, self.match_expression(groups)],
+            output_field=FloatField()
+        )
+
+
+class PostgresSearchBackend(DatabaseSearchBackend):
+    """tsvector pondéré couvert par l'index GIN `search_entry_vector_idx`"""
+
+    VECTOR_SQL = (
+        "setweight(to_tsvector('simple', e.title_search), 'A') || "
+        "setweight(to_tsvector('simple', e.body_search), 'B')"
+    )
+
+    @staticmethod
+    def tsquery(groups):
+        return ' & '.join(
+            '(' + ' | '.join([f'{group[0]}:*'] + group[1:]) + ')'
+            for group in groups
+        )
+
+    def execute(self, groups, kinds, limit, include_inactive):
+        tsquery = self.tsquery(groups)
+        visibility, params = self.visibility_sql(kinds, include_inactive)
+        sql = (
+            f'SELECT e.*, ts_rank({self.VECTOR_SQL}, query) AS score '
+            f"FROM {SearchEntry._meta.db_table} e, to_tsquery('simple', %s) query "
+            f'WHERE ({self.VECTOR_SQL}) @@ query{visibility} '
+            f'ORDER BY score DESC, e.popularity DESC LIMIT %s'
+        )
+        return SearchEntry.objects.raw(sql, [tsquery, *params, limit])
+
+    def matching_ids(self, groups, kind):
+        return RawSQL(
+            f'SELECT e.object_id FROM {SearchEntry._meta.db_table} e '
+            f"WHERE e.kind = %s AND ({self.VECTOR_SQL}) @@ to_tsquery('simple', %s)",
+            [kind, self.tsquery(groups)]
+        )
+
+    def rank_expression(self, groups, kind, model):
+        return RawSQL(
+            f"SELECT ts_rank({self.VECTOR_SQL}, to_tsquery('simple', %s)) FROM {SearchEntry._meta.db_table} e "
+            f'WHERE e.kind = %s AND e.object_id = {self.outer_pk(model)}',
+            [self.tsquery(groups), kind],
+            output_field=FloatField()
+        )
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    """Moteur adapté à la base de données courante"""
+    return BACKENDS.get(connection.vendor, DatabaseSearchBackend)()
+
+
+def search(query, kinds=None, limit=20, include_inactive=False):
+    """Recherche plein texte dans les restaurants et les plats"""
+    return get_backend().search(query, kinds=kinds, limit=limit, include_inactive=include_inactive)
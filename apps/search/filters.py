@@ -0,0 +1,27 @@
+from rest_framework import filters
+from apps.restaurants.models import Restaurant, MenuItem
+from .backends import get_backend
+
+
+class FullTextSearchFilter(filters.BaseFilterBackend):
+    """
+    Remplace SearchFilter : `?search=` restreint le queryset aux objets trouvés
+    dans l'index plein texte et les classe par pertinence. Correspondance et
+    classement sont des sous-requêtes : tous les résultats sont paginés.
+    """
+    search_param = 'search'
+    kinds = {
+        Restaurant: 'restaurant',
+        MenuItem: 'menu_item',
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+
+        # La visibilité reste gérée par le queryset de la vue
+        queryset = get_backend().rank_queryset(queryset, self.kinds[queryset.model], query)
+        if not request.query_params.get('ordering'):
+            queryset = queryset.order_by('-search_rank', '-search_popularity', 'pk')
+        return queryset
@@ -0,0 +1,115 @@
+"""Construction et maintenance des entrées de l'index de recherche"""
+from django.apps import apps as global_apps
+
+from apps.core.utils import normalize_text
+from .models import SearchEntry
+
+
+def _restaurant_fields(restaurant):
+    return {
+        'restaurant_id': restaurant.pk,
+        'name': restaurant.name,
+        'description': restaurant.description,
+        'restaurant_name': restaurant.name,
+        'price': None,
+        'title_search': normalize_text(restaurant.name),
+        'body_search': normalize_text(f"{restaurant.description} {restaurant.address}"),
+        'is_active': restaurant.is_active,
+        'restaurant_active': restaurant.is_active,
+        'popularity': restaurant.total_reviews,
+    }
+
+
+def _menu_item_fields(item, restaurant, category_name):
+    return {
+        'restaurant_id': restaurant.pk,
+        'name': item.name,
+        'description': item.description,
+        'restaurant_name': restaurant.name,
+        'price': item.price,
+        'title_search': normalize_text(item.name),
+        'body_search': normalize_text(f"{item.description} {category_name}"),
+        'is_active': item.is_available,
+        'restaurant_active': restaurant.is_active,
+        'popularity': item.order_count,
+    }
+
+
+def index_restaurant(restaurant):
+    """Indexe un restaurant et répercute son nom et son statut sur ses plats"""
+    SearchEntry.objects.update_or_create(
+        kind='restaurant',
+        object_id=restaurant.pk,
+        defaults=_restaurant_fields(restaurant)
+    )
+    SearchEntry.objects.filter(restaurant_id=restaurant.pk, kind='menu_item').update(
+        restaurant_name=restaurant.name,
+        restaurant_active=restaurant.is_active
+    )
+
+
+def index_menu_items(items, batch_size=500, apps=global_apps):
+    """
+    Indexe (ou réindexe) un lot de plats avec un nombre constant de requêtes.
+    `apps` : registre des modèles (celui d'une migration pour le remplissage initial).
+    """
+    items = list(items)
+    if not items:
+        return
+
+    entry_model = apps.get_model('search', 'SearchEntry')
+    restaurants = apps.get_model('restaurants', 'Restaurant').objects.in_bulk(
+        {item.restaurant_id for item in items}
+    )
+    category_names = dict(
+        apps.get_model('restaurants', 'Category').objects
+        .filter(id__in={item.category_id for item in items if item.category_id})
+        .values_list('id', 'name')
+    )
+
+    entries = [
+        entry_model(
+            kind='menu_item',
+            object_id=item.pk,
+            **_menu_item_fields(item, restaurants[item.restaurant_id], category_names.get(item.category_id, ''))
+        )
+        for item in items
+        if item.restaurant_id in restaurants
+    ]
+    entry_model.objects.filter(kind='menu_item', object_id__in=[item.pk for item in items]).delete()
+    entry_model.objects.bulk_create(entries, batch_size=batch_size)
+
+
+def remove_entries(kind, object_ids):
+    """Retire des documents de l'index"""
+    SearchEntry.objects.filter(kind=kind, object_id__in=list(object_ids)).delete()
+
+
+def rebuild_index(batch_size=500, stdout=None, apps=global_apps):
+    """Reconstruit entièrement l'index, par lots"""
+    entry_model = apps.get_model('search', 'SearchEntry')
+    entry_model.objects.all().delete()
+
+    restaurants = apps.get_model('restaurants', 'Restaurant').objects.order_by('pk')
+    batch = []
+    for restaurant in restaurants.iterator(chunk_size=batch_size):
+        batch.append(entry_model(kind='restaurant', object_id=restaurant.pk, **_restaurant_fields(restaurant)))
+        if len(batch) >= batch_size:
+            entry_model.objects.bulk_create(batch)
+            batch = []
+    entry_model.objects.bulk_create(batch)
+
+    items = apps.get_model('restaurants', 'MenuItem').objects.order_by('pk')
+    batch = []
+    indexed = 0
+    for item in items.iterator(chunk_size=batch_size):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            index_menu_items(batch, batch_size, apps=apps)
+            indexed += len(batch)
+            batch = []
+            if stdout:
+                stdout.write(f"{indexed} plats indexés...")
+    index_menu_items(batch, batch_size, apps=apps)
+
+    return restaurants.count(), indexed + len(batch)
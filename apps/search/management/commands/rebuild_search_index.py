@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from apps.search.indexing import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche des restaurants et des plats"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        restaurants, items = rebuild_index(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"{restaurants} restaurants et {items} plats indexés"))
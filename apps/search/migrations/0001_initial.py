@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('restaurants', '0003_restaurant_geo_cell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('restaurant', 'Restaurant'), ('menu_item', 'Plat')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('name', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('restaurant_name', models.CharField(max_length=200)),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('title_search', models.TextField()),
+                ('body_search', models.TextField(blank=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('restaurant_active', models.BooleanField(default=True)),
+                ('popularity', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='restaurants.restaurant')),
+            ],
+            options={
+                'verbose_name': 'Entrée de recherche',
+                'verbose_name_plural': 'Entrées de recherche',
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE search_fts USING fts5(
+        title_search, body_search,
+        content='search_searchentry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    "CREATE VIRTUAL TABLE search_fts_vocab USING fts5vocab(search_fts, 'row')",
+    """
+    CREATE TRIGGER search_fts_insert AFTER INSERT ON search_searchentry BEGIN
+        INSERT INTO search_fts(rowid, title_search, body_search)
+        VALUES (new.id, new.title_search, new.body_search);
+    END
+    """,
+    """
+    CREATE TRIGGER search_fts_delete AFTER DELETE ON search_searchentry BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title_search, body_search)
+        VALUES ('delete', old.id, old.title_search, old.body_search);
+    END
+    """,
+    """
+    CREATE TRIGGER search_fts_update AFTER UPDATE OF title_search, body_search ON search_searchentry BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title_search, body_search)
+        VALUES ('delete', old.id, old.title_search, old.body_search);
+        INSERT INTO search_fts(rowid, title_search, body_search)
+        VALUES (new.id, new.title_search, new.body_search);
+    END
+    """,
+    "INSERT INTO search_fts(search_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS search_fts_update',
+    'DROP TRIGGER IF EXISTS search_fts_delete',
+    'DROP TRIGGER IF EXISTS search_fts_insert',
+    'DROP TABLE IF EXISTS search_fts_vocab',
+    'DROP TABLE IF EXISTS search_fts',
+]
+
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX search_entry_vector_idx ON search_searchentry USING GIN ((
+        setweight(to_tsvector('simple', title_search), 'A') ||
+        setweight(to_tsvector('simple', body_search), 'B')
+    ))
+    """,
+]
+
+POSTGRES_REVERSE = ['DROP INDEX IF EXISTS search_entry_vector_idx']
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+from apps.search.indexing import rebuild_index
+
+
+def backfill_search_index(apps, schema_editor):
+    # ?search= des restaurants et des plats passe par l'index : il doit couvrir le catalogue existant
+    rebuild_index(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_fulltext_index'),
+        ('restaurants', '0012_restaurant_category_membership'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+from django.db import models
+from apps.restaurants.models import Restaurant
+
+
+class SearchEntry(models.Model):
+    """Document de l'index de recherche (restaurant ou plat)"""
+
+    KINDS = (
+        ('restaurant', 'Restaurant'),
+        ('menu_item', 'Plat'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.BigIntegerField()
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='search_entries')
+
+    # Données affichées dans les résultats
+    name = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    restaurant_name = models.CharField(max_length=200)
+    price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+
+    # Texte normalisé (minuscules, sans accents) indexé en plein texte
+    title_search = models.TextField()
+    body_search = models.TextField(blank=True)
+
+    # Visibilité : le document lui-même et son restaurant
+    is_active = models.BooleanField(default=True)
+    restaurant_active = models.BooleanField(default=True)
+    popularity = models.FloatField(default=0.0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['kind', 'object_id']
+        verbose_name = "Entrée de recherche"
+        verbose_name_plural = "Entrées de recherche"
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.name}"
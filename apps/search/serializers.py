@@ -0,0 +1,32 @@
+from rest_framework import serializers
+from .models import SearchEntry
+
+
+class SearchResultSerializer(serializers.ModelSerializer):
+    """Résultat de recherche unifié (restaurant ou plat)"""
+    type = serializers.CharField(source='kind', read_only=True)
+    id = serializers.IntegerField(source='object_id', read_only=True)
+    score = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = SearchEntry
+        fields = [
+            'type', 'id', 'name', 'description', 'restaurant_id',
+            'restaurant_name', 'price', 'score'
+        ]
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    """Paramètres de la recherche"""
+    q = serializers.CharField(max_length=200)
+    type = serializers.ChoiceField(choices=SearchEntry.KINDS, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+    """Paramètres de l'autocomplétion"""
+    KINDS = [('restaurant', 'Restaurant'), ('menu_item', 'Plat'), ('category', 'Catégorie')]
+
+    q = serializers.CharField(max_length=100)
+    type = serializers.ChoiceField(choices=KINDS, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=10, default=8)
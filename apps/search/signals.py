@@ -0,0 +1,77 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from apps.restaurants.models import Restaurant, MenuItem, Category
+from .autocomplete import AutocompleteIndex, autocomplete_index
+from .indexing import index_restaurant, index_menu_items, remove_entries
+
+
+LISTING_FIELDS = {'name', 'is_active'}
+
+
+@receiver(pre_save, sender=Restaurant)
+def restaurant_remember_listing(sender, instance, update_fields=None, **kwargs):
+    """Mémorise nom et activité enregistrés : les plats n'en dépendent que s'ils changent"""
+    instance._previous_listing = None
+    if instance.pk and (update_fields is None or LISTING_FIELDS & set(update_fields)):
+        instance._previous_listing = Restaurant.objects.filter(
+            pk=instance.pk
+        ).values_list('name', 'is_active').first()
+
+
+@receiver(post_save, sender=Restaurant)
+def restaurant_saved(sender, instance, **kwargs):
+    """Met à jour l'index de recherche du restaurant"""
+    index_restaurant(instance)
+    previous = getattr(instance, '_previous_listing', None)
+    items = previous is not None and previous != (instance.name, instance.is_active)
+    autocomplete_index.reload_restaurant(instance.pk, items=items)
+
+
+@receiver(post_delete, sender=Restaurant)
+def restaurant_deleted(sender, instance, **kwargs):
+    """Les suppressions ne sont pas visibles par updated_at : publiées dans le journal de l'autocomplétion"""
+    autocomplete_index.publish(('restaurant', instance.pk))
+
+
+@receiver(post_save, sender=MenuItem)
+def menu_item_saved(sender, instance, **kwargs):
+    """Met à jour l'index de recherche du plat"""
+    index_menu_items([instance])
+    restaurant = instance.restaurant
+    autocomplete_index.apply(
+        *AutocompleteIndex.menu_item_entry(
+            instance.pk, instance.name, instance.order_count, restaurant.pk, restaurant.name
+        ),
+        visible=instance.is_available and restaurant.is_active
+    )
+
+
+@receiver(post_delete, sender=MenuItem)
+def menu_item_deleted(sender, instance, **kwargs):
+    """Retire le plat de l'index (les restaurants sont supprimés en cascade)"""
+    remove_entries('menu_item', [instance.pk])
+    autocomplete_index.publish(('menu_item', instance.pk))
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    """Le nom de la catégorie est indexé avec les plats : les réindexer"""
+    item_count = 0 if created else instance.menuitem_set.filter(is_available=True).count()
+    autocomplete_index.publish(
+        *AutocompleteIndex.category_entry(instance.pk, instance.name, item_count), visible=instance.is_active
+    )
+    if not created:
+        items = MenuItem.objects.filter(category=instance).order_by('pk')
+        batch = []
+        for item in items.iterator(chunk_size=500):
+            batch.append(item)
+            if len(batch) >= 500:
+                index_menu_items(batch)
+                batch = []
+        index_menu_items(batch)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    """Retire la catégorie de l'autocomplétion"""
+    autocomplete_index.publish(('category', instance.pk))
@@ -0,0 +1,298 @@
+from importlib import import_module
+from unittest import mock
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.restaurants.models import Restaurant, Category, MenuItem
+from .autocomplete import LOG_KEY, AutocompleteIndex, PrefixTrie, autocomplete_index
+from .backends import DatabaseSearchBackend, search
+from .indexing import index_menu_items
+from .models import SearchEntry
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='ownerpass123',
+            user_type='restaurant'
+        )
+        self.creperie = self.create_restaurant('Crêperie Bretonne', 'Galettes et crêpes de Bretagne')
+        self.pizzeria = self.create_restaurant('Pizza Roma', 'Pizzeria italienne')
+        self.desserts = Category.objects.create(name='Desserts')
+        self.crepe = MenuItem.objects.create(
+            restaurant=self.creperie, category=self.desserts, name='Crêpe Suzette', price='7.50', order_count=10
+        )
+        self.tiramisu = MenuItem.objects.create(
+            restaurant=self.pizzeria, category=self.desserts, name='Tiramisu', price='6.00'
+        )
+        self.margherita = MenuItem.objects.create(
+            restaurant=self.pizzeria, name='Pizza Margherita', description='Tomate, mozzarella', price='12.00'
+        )
+
+    def create_restaurant(self, name, description):
+        return Restaurant.objects.create(
+            owner=self.owner,
+            name=name,
+            description=description,
+            address='1 Rue Test',
+            latitude=48.8566,
+            longitude=2.3522,
+            phone_number='+33123456789'
+        )
+
+    def names(self, results):
+        return [entry.name for entry in results]
+
+    def test_index_maintained_by_signals(self):
+        self.assertEqual(SearchEntry.objects.filter(kind='restaurant').count(), 2)
+        self.assertEqual(SearchEntry.objects.filter(kind='menu_item').count(), 3)
+        self.tiramisu.delete()
+        self.assertEqual(self.names(search('tiramisu')), [])
+
+    def test_accent_insensitive(self):
+        self.assertEqual(self.names(search('crepe', kinds=['menu_item'])), ['Crêpe Suzette'])
+        self.assertEqual(self.names(search('CRÊPES', kinds=['restaurant'])), ['Crêperie Bretonne'])
+
+    def test_title_ranked_before_description(self):
+        self.creperie.description = 'Pas de pizza ici'
+        self.creperie.save()
+        results = self.names(search('pizza'))
+        self.assertEqual(set(results[:2]), {'Pizza Roma', 'Pizza Margherita'})
+        self.assertEqual(results[2], 'Crêperie Bretonne')
+
+    def test_typo_tolerance(self):
+        self.assertEqual(self.names(search('tiramisou')), ['Tiramisu'])
+        self.assertEqual(self.names(search('margarita')), ['Pizza Margherita'])
+
+    def test_fallback_backend(self):
+        backend = DatabaseSearchBackend()
+        self.assertEqual(self.names(backend.search('crepe', kinds=['menu_item'])), ['Crêpe Suzette'])
+        self.assertEqual(self.names(backend.search('tiramisou')), ['Tiramisu'])
+
+    def test_inactive_documents_hidden(self):
+        self.pizzeria.is_active = False
+        self.pizzeria.save()
+        self.assertEqual(self.names(search('pizza')), [])
+        self.crepe.is_available = False
+        self.crepe.save()
+        self.assertEqual(self.names(search('suzette')), [])
+
+    def test_category_rename_reindexes_items(self):
+        self.desserts.name = 'Douceurs'
+        self.desserts.save()
+        self.assertEqual(set(self.names(search('douceurs'))), {'Crêpe Suzette', 'Tiramisu'})
+
+    def test_unified_endpoint(self):
+        response = self.client.get('/api/v1/search/', {'q': 'crêpe'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(result['type'], result['name']) for result in response.data['results']],
+            [('menu_item', 'Crêpe Suzette'), ('restaurant', 'Crêperie Bretonne')]
+        )
+        response = self.client.get('/api/v1/search/', {'q': 'crepe', 'type': 'menu_item'})
+        self.assertEqual(response.data['results'][0]['restaurant_name'], 'Crêperie Bretonne')
+        self.assertEqual(self.client.get('/api/v1/search/').status_code, 400)
+
+    def test_viewset_search_filter(self):
+        response = self.client.get('/api/v1/menu-items/', {'search': 'crepe'})
+        self.assertEqual([item['name'] for item in response.data['results']], ['Crêpe Suzette'])
+        response = self.client.get('/api/v1/restaurants/', {'search': 'italienne'})
+        self.assertEqual([r['name'] for r in response.data['results']], ['Pizza Roma'])
+
+    def test_viewset_search_ranks_all_matches(self):
+        self.creperie.description = 'Pas de pizza ici'
+        self.creperie.save()
+        response = self.client.get('/api/v1/restaurants/', {'search': 'pizza'})
+        self.assertEqual([r['name'] for r in response.data['results']], ['Pizza Roma', 'Crêperie Bretonne'])
+
+        items = MenuItem.objects.bulk_create([
+            MenuItem(restaurant=self.pizzeria, name=f'Gratin {index}', price='8.00', order_count=index)
+            for index in range(520)
+        ])
+        index_menu_items(items)
+        response = self.client.get('/api/v1/menu-items/', {'search': 'gratin', 'page': 26})
+        self.assertEqual(response.data['count'], 520)
+        self.assertEqual(
+            [item['name'] for item in response.data['results']], [f'Gratin {index}' for index in range(19, -1, -1)]
+        )
+
+    def test_fallback_backend_ranks_queryset(self):
+        self.creperie.description = 'Pas de pizza ici'
+        self.creperie.save()
+        ranked = DatabaseSearchBackend().rank_queryset(Restaurant.objects.all(), 'restaurant', 'pizza')
+        self.assertEqual(
+            [r.name for r in ranked.order_by('-search_rank', '-search_popularity', 'pk')],
+            ['Pizza Roma', 'Crêperie Bretonne']
+        )
+
+    def test_migration_backfills_existing_catalog(self):
+        SearchEntry.objects.all().delete()
+        self.assertEqual(self.client.get('/api/v1/menu-items/', {'search': 'crepe'}).data['results'], [])
+
+        # Modèles historiques de la migration, comme lors d'un déploiement
+        state = MigrationExecutor(connection).loader.project_state(('search', '0003_backfill_search_index'))
+        backfill = import_module('apps.search.migrations.0003_backfill_search_index')
+        backfill.backfill_search_index(state.apps, None)
+
+        self.assertEqual(SearchEntry.objects.count(), 5)
+        response = self.client.get('/api/v1/menu-items/', {'search': 'crepe'})
+        self.assertEqual([item['name'] for item in response.data['results']], ['Crêpe Suzette'])
+        response = self.client.get('/api/v1/restaurants/', {'search': 'italienne'})
+        self.assertEqual([r['name'] for r in response.data['results']], ['Pizza Roma'])
+
+
+class AutocompleteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        autocomplete_index.trie = None
+        # Vérifications dans le thread de la requête : les autres connexions ne voient pas la transaction du test
+        autocomplete_index.background = False
+        self.addCleanup(setattr, autocomplete_index, 'background', True)
+        self.client = APIClient()
+        owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='ownerpass123',
+            user_type='restaurant'
+        )
+        self.restaurant = Restaurant.objects.create(
+            owner=owner,
+            name='Pizza Roma',
+            address='1 Rue Test',
+            latitude=48.8566,
+            longitude=2.3522,
+            phone_number='+33123456789'
+        )
+        self.pizzas = Category.objects.create(name='Pizzas')
+        self.margherita = MenuItem.objects.create(
+            restaurant=self.restaurant, category=self.pizzas, name='Pizza Margherita', price='12.00', order_count=50
+        )
+        self.regina = MenuItem.objects.create(
+            restaurant=self.restaurant, category=self.pizzas, name='Pizza Regina', price='13.00', order_count=5
+        )
+
+    def labels(self, prefix, **kwargs):
+        return [label for _, label, _, _ in autocomplete_index.complete(prefix, **kwargs)]
+
+    def test_trie_keeps_best_entries(self):
+        trie = PrefixTrie(top_k=2)
+        for index, name in enumerate(['Pain', 'Pâtes', 'Paella', 'Poulet']):
+            trie.add(('menu_item', index), name, index)
+        self.assertEqual([label for _, label, _, _ in trie.complete('pa')], ['Paella', 'Pâtes'])
+        trie.remove(('menu_item', 2))
+        self.assertEqual([label for _, label, _, _ in trie.complete('pa')], ['Pâtes', 'Pain'])
+        self.assertEqual(trie.complete('xyz'), [])
+
+    def test_ranked_by_popularity_on_any_word(self):
+        self.assertEqual(self.labels('piz', kinds=['menu_item']), ['Pizza Margherita', 'Pizza Regina'])
+        self.assertEqual(self.labels('reg'), ['Pizza Regina'])
+        self.assertEqual(self.labels('PIZZAS', kinds=['category']), ['Pizzas'])
+
+    def test_signals_update_index(self):
+        self.labels('piz')
+        self.regina.order_count = 100
+        self.regina.save()
+        self.assertEqual(self.labels('piz', kinds=['menu_item']), ['Pizza Regina', 'Pizza Margherita'])
+        self.margherita.is_available = False
+        self.margherita.save()
+        self.assertEqual(self.labels('marg'), [])
+        self.restaurant.is_active = False
+        self.restaurant.save()
+        self.assertEqual(self.labels('piz', kinds=['menu_item', 'restaurant']), [])
+
+    def test_restaurant_items_reloaded_only_on_listing_change(self):
+        self.labels('piz')
+        with mock.patch.object(autocomplete_index, '_rows', wraps=autocomplete_index._rows) as rows:
+            self.restaurant.delivery_fee = 3
+            self.restaurant.save()
+            self.assertEqual(rows.call_args.kwargs['items'], False)
+
+            self.restaurant.name = 'Pizza Napoli'
+            self.restaurant.save()
+            self.assertEqual(rows.call_args.kwargs['items'], True)
+        results = autocomplete_index.complete('margherita')
+        self.assertEqual(results[0][3]['restaurant_name'], 'Pizza Napoli')
+        self.assertEqual(self.labels('napoli', kinds=['restaurant']), ['Pizza Napoli'])
+
+    def test_deletion_updates_index_without_rebuild(self):
+        self.labels('piz')
+        with mock.patch.object(autocomplete_index, 'rebuild') as rebuild:
+            self.regina.delete()
+            Category.objects.create(name='Pizzettas')
+            autocomplete_index.checked_at = 0
+            self.assertEqual(self.labels('regina'), [])
+            self.assertEqual(self.labels('pizzet'), ['Pizzettas'])
+        rebuild.assert_not_called()
+
+    def test_other_processes_replay_the_change_log(self):
+        other = AutocompleteIndex(background=False)  # index d'un autre worker
+        other.complete('piz')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.regina.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pizzas.name = 'Pizzas napolitaines'
+            self.pizzas.save()
+
+        other.checked_at = 0
+        with mock.patch.object(other, 'rebuild') as rebuild:
+            labels = [label for _, label, _, _ in other.complete('piz')]
+        rebuild.assert_not_called()
+        self.assertEqual(labels, ['Pizza Margherita', 'Pizzas napolitaines', 'Pizza Roma'])
+
+    def test_gap_in_change_log_triggers_rebuild(self):
+        other = AutocompleteIndex(background=False)
+        other.complete('piz')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.regina.delete()
+            self.margherita.delete()
+        cache.delete(f'{LOG_KEY}:{other.log_sequence + 1}')  # entrée expirée
+
+        other.checked_at = 0
+        with mock.patch.object(other, 'rebuild', wraps=other.rebuild) as rebuild:
+            labels = sorted(label for _, label, _, _ in other.complete('pizza'))
+        rebuild.assert_called_once()
+        self.assertEqual(labels, ['Pizza Roma', 'Pizzas'])
+        self.assertEqual(other.log_sequence, AutocompleteIndex.last_log_sequence())
+
+    def test_endpoint(self):
+        response = self.client.get('/api/v1/autocomplete/', {'q': 'pizza m', 'limit': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [{
+            'type': 'menu_item', 'id': self.margherita.pk, 'label': 'Pizza Margherita', 'score': 50,
+            'restaurant_id': self.restaurant.pk, 'restaurant_name': 'Pizza Roma',
+        }])
+        self.assertEqual(self.client.get('/api/v1/autocomplete/', {'q': 'p', 'limit': 50}).status_code, 400)
+
+
+class AutocompleteBackgroundSyncTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='ownerpass123', user_type='restaurant'
+        )
+        self.restaurant = Restaurant.objects.create(
+            owner=owner, name='Pizza Roma', address='1 Rue Test', latitude=48.8566, longitude=2.3522,
+            phone_number='+33123456789'
+        )
+
+    def test_periodic_check_runs_off_the_request(self):
+        index = AutocompleteIndex()  # index d'un autre worker
+        self.assertEqual([label for _, label, _, _ in index.complete('piz')], ['Pizza Roma'])
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(name='Pizza Napoli', updated_at=timezone.now())
+
+        index.checked_at = 0
+        with self.assertNumQueries(0):
+            # La requête est servie par l'index courant, la vérification tourne dans un thread
+            index.complete('piz')
+        index.refresher.join()
+        self.assertEqual([label for _, label, _, _ in index.complete('napoli')], ['Pizza Napoli'])
@@ -0,0 +1,11 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import SearchViewSet, AutocompleteViewSet
+
+router = DefaultRouter()
+router.register(r'search', SearchViewSet, basename='search')
+router.register(r'autocomplete', AutocompleteViewSet, basename='autocomplete')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
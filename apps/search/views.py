@@ -0,0 +1,49 @@
+from rest_framework import viewsets, permissions
+from rest_framework.response import Response
+from .autocomplete import autocomplete_index
+from .backends import search
+from .serializers import SearchResultSerializer, SearchQuerySerializer, AutocompleteQuerySerializer
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """Recherche unifiée dans les restaurants et les plats"""
+    permission_classes = [permissions.AllowAny]
+
+    def list(self, request):
+        params = SearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        kind = params.validated_data.get('type')
+        results = search(
+            params.validated_data['q'],
+            kinds=[kind] if kind else None,
+            limit=params.validated_data['limit']
+        )
+        return Response({
+            "query": params.validated_data['q'],
+            "count": len(results),
+            "results": SearchResultSerializer(results, many=True).data
+        })
+
+
+class AutocompleteViewSet(viewsets.ViewSet):
+    """Suggestions pendant la frappe (index en mémoire, sans requête SQL)"""
+    permission_classes = [permissions.AllowAny]
+
+    def list(self, request):
+        params = AutocompleteQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        kind = params.validated_data.get('type')
+        suggestions = autocomplete_index.complete(
+            params.validated_data['q'],
+            limit=params.validated_data['limit'],
+            kinds=[kind] if kind else None
+        )
+        return Response({
+            "query": params.validated_data['q'],
+            "results": [
+                {"type": key[0], "id": key[1], "label": label, "score": score, **data}
+                for key, label, score, data in suggestions
+            ]
+        })
@@ -10,7 +10,7 @@ backlog = 2048
 workers = multiprocessing.cpu_count() * 2 + 1
 worker_class = 'sync'
 worker_connections = 1000
-timeout = 120
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))  # voir IDEMPOTENCY_LOCK_TIMEOUT
 keepalive = 5
 
 # Restart workers after this many requests to prevent memory leaks
@@ -24,6 +24,18 @@ app.conf.beat_schedule = {
         'task': 'apps.commandes.tasks.send_daily_stats_email',
         'schedule': crontab(hour=8, minute=0),  # Every day at 8 AM
     },
+    'refresh-popularity-scores': {
+        'task': 'apps.restaurants.tasks.refresh_popularity_scores',
+        'schedule': crontab(minute='*/30'),  # Every 30 minutes
+    },
+    'flush-menu-item-counters': {
+        'task': 'apps.commandes.tasks.flush_menu_item_counters',
+        'schedule': crontab(minute='*'),  # Every minute
+    },
+    'reconcile-menu-item-counters': {
+        'task': 'apps.commandes.tasks.reconcile_menu_item_counters',
+        'schedule': crontab(hour=3, minute=30),  # Every day at 3:30 AM
+    },
 }
 
 
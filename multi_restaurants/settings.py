@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'apps.commandes',
     'apps.promotions',
     'apps.marketing',
+    'apps.search',
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',
@@ -206,6 +207,40 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Cache Configuration
+# Les tampons de version (menus, restaurants, popularité) sont incrémentés par les
+# signaux et les tâches Celery : le cache doit être partagé par tous les workers
+# gunicorn et Celery. Redis dès que REDIS_HOST est défini (docker-compose, .env) ;
+# le cache mémoire, propre à chaque processus, reste réservé au développement et aux tests.
+REDIS_HOST = config('REDIS_HOST', default='')
+REDIS_PORT = config('REDIS_PORT', default=6379, cast=int)
+if REDIS_HOST:
+    DEFAULT_CACHE_BACKEND = 'django.core.cache.backends.redis.RedisCache'
+    DEFAULT_CACHE_LOCATION = f'redis://{REDIS_HOST}:{REDIS_PORT}/1'
+else:
+    DEFAULT_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+    DEFAULT_CACHE_LOCATION = 'multi-restaurants'
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default=DEFAULT_CACHE_BACKEND),
+        'LOCATION': config('CACHE_LOCATION', default=DEFAULT_CACHE_LOCATION),
+    },
+    # Réponses et verrous Idempotency-Key (apps/core/idempotency.py) : une requête
+    # renvoyée peut arriver sur un autre worker, le stockage doit être partagé.
+    # Base Redis séparée : un clear() du cache applicatif ne les efface pas.
+    'idempotency': {
+        'BACKEND': DEFAULT_CACHE_BACKEND,
+        'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/2' if REDIS_HOST else 'idempotency',
+    },
+}
+
+# Timeout des workers Gunicorn (gunicorn_config.py, --timeout de docker-compose.yml)
+GUNICORN_TIMEOUT = config('GUNICORN_TIMEOUT', default=120, cast=int)
+# Verrou d'une requête Idempotency-Key en cours : il doit survivre à la requête la plus
+# lente, sinon un renvoi relancerait l'action pendant qu'elle s'exécute encore
+IDEMPOTENCY_LOCK_TIMEOUT = config('IDEMPOTENCY_LOCK_TIMEOUT', default=GUNICORN_TIMEOUT + 30, cast=int)
+
 # Celery Configuration
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='db+sqlite:///results.sqlite')
@@ -232,6 +267,12 @@ STRIPE_PUBLIC_KEY = config('STRIPE_PUBLIC_KEY', default='')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
 STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
 
+# Numéros de commande : la clé de la permutation est conservée en base (OrderNumberCounter).
+# ORDER_NUMBER_KEY (à défaut SECRET_KEY) n'est lu qu'une fois, par la migration
+# commandes 0005, pour figer la clé des numéros déjà émis ; une rotation ultérieure
+# de l'un ou de l'autre ne change plus les numéros.
+ORDER_NUMBER_KEY = config('ORDER_NUMBER_KEY', default='')
+
 # AWS S3 Configuration
 USE_S3 = config('USE_S3', default=False, cast=bool)
 if USE_S3:
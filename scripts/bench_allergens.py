@@ -0,0 +1,97 @@
+"""
+Micro-benchmark des filtres d'allergènes.
+
+Compare le filtrage sur le champ JSON `allergens` (une condition par tag) avec
+le prédicat entier `allergen_mask & masque = 0` pour la requête
+« sans gluten ni fruits à coque, végétarien ». Utilise une base de test
+jetable (SQLite en mémoire avec la configuration de développement).
+
+Usage : python scripts/bench_allergens.py [--entries 100000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'multi_restaurants.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import Q  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from apps.restaurants.dietary import DIETS, allergen_mask, exclude_mask, parse_diets, parse_tags  # noqa: E402
+from apps.restaurants.models import MenuItem, Restaurant  # noqa: E402
+
+ALLERGENS = ['gluten', 'milk', 'eggs', 'nuts', 'soy', 'sesame', 'fish', 'meat', 'pork', 'mustard']
+EXCLUDED = ['gluten', 'nuts', *DIETS['vegetarian']]
+
+
+def timed(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def json_filter(queryset):
+    """Approche précédente : une condition JSON par tag exclu"""
+    condition = Q()
+    for tag in EXCLUDED:
+        if connection.features.supports_json_field_contains:
+            condition |= Q(allergens__contains=[tag])
+        else:
+            # SQLite : pas d'opérateur de contenance JSON, recherche dans le texte sérialisé
+            condition |= Q(allergens__icontains=f'"{tag}"')
+    return queryset.exclude(condition)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+    try:
+        owner = get_user_model().objects.create_user(username='bench', password='bench', user_type='restaurant')
+        restaurant = Restaurant.objects.create(
+            owner=owner, name='Bench', address='-', latitude=48.85, longitude=2.35, phone_number='0'
+        )
+        items = []
+        for index in range(args.entries):
+            allergens = rng.sample(ALLERGENS, rng.randint(0, 4))
+            items.append(MenuItem(
+                restaurant=restaurant, name=f'Plat {index}', price='10.00',
+                allergens=allergens, allergen_mask=allergen_mask(allergens)
+            ))
+        MenuItem.objects.bulk_create(items, batch_size=5000)
+
+        base = MenuItem.objects.filter(restaurant=restaurant).order_by()
+        mask = parse_tags('gluten,nuts') | parse_diets('vegetarian')
+        json_time, json_count = timed(lambda: json_filter(base).count(), args.repeat)
+        mask_time, mask_count = timed(lambda: exclude_mask(base, mask).count(), args.repeat)
+        assert json_count == mask_count, (json_count, mask_count)
+
+        print(f"{'plats':>8} {'JSON (ms)':>10} {'masque (ms)':>12} {'gain':>6} {'résultats':>10}")
+        print(
+            f"{args.entries:>8} {json_time * 1000:>10.1f} {mask_time * 1000:>12.1f} "
+            f"{json_time / mask_time:>5.1f}x {mask_count:>10}"
+        )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
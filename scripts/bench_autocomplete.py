@@ -0,0 +1,73 @@
+"""
+Micro-benchmark de l'autocomplétion en mémoire.
+
+Construit un trie de N noms synthétiques puis mesure la latence p50/p99 de
+préfixes tapés caractère par caractère.
+
+Usage : python scripts/bench_autocomplete.py [--entries 100000] [--queries 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apps.search.autocomplete import PrefixTrie  # noqa: E402
+
+WORDS = [
+    'pizza', 'pâtes', 'poulet', 'crêpe', 'burger', 'salade', 'sushi', 'tacos', 'kebab',
+    'curry', 'riz', 'poisson', 'bœuf', 'fromage', 'tomate', 'chocolat', 'café', 'thé',
+    'maison', 'royal', 'épicé', 'végétarien', 'grillé', 'frites', 'sauce', 'garni',
+]
+# Noms propres pour diversifier le vocabulaire (~5000 mots distincts)
+SUFFIXES = [f'{consonant}{vowel}{end}{number}' for consonant in 'bcdfglmnprstv' for vowel in 'aeiou'
+            for end in ('lo', 'ra', 'ti', 'no', 'sa') for number in range(16)]
+
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=20000)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    names = [
+        ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))) + ' ' + rng.choice(SUFFIXES)
+        for _ in range(args.entries)
+    ]
+    start = time.perf_counter()
+    trie = PrefixTrie()
+    trie.build((('menu_item', index), name, rng.randint(0, 10000), None) for index, name in enumerate(names))
+    build_time = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(args.queries):
+        word = rng.choice(WORDS)
+        prefix = word[:rng.randint(1, len(word))]
+        start = time.perf_counter()
+        trie.complete(prefix, limit=8)
+        latencies.append((time.perf_counter() - start) * 1e6)
+
+    # Mises à jour : baisse de score et suppression (recalcul paresseux des nœuds)
+    start = time.perf_counter()
+    for index in rng.sample(range(args.entries), 1000):
+        trie.remove(('menu_item', index))
+    update_time = (time.perf_counter() - start) / 1000 * 1e6
+    start = time.perf_counter()
+    trie.complete('p', limit=8)
+    refresh_time = (time.perf_counter() - start) * 1e3
+
+    print(f"entrées : {len(trie)}  construction : {build_time:.2f} s")
+    print(f"requêtes : p50 {percentile(latencies, 0.5):.1f} µs  p99 {percentile(latencies, 0.99):.1f} µs")
+    print(f"suppression : {update_time:.1f} µs/entrée  premier complete() après suppressions : {refresh_time:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
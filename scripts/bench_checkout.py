@@ -0,0 +1,123 @@
+"""
+Micro-benchmark de la création de commande.
+
+Compare l'ancienne création ligne par ligne (un SELECT par plat à la
+validation, un INSERT par ligne, deux sauvegardes de la commande) avec
+OrderCreateSerializer (plats lus en une requête, lignes en bulk_create) pour
+un panier de N lignes : nombre de requêtes et latence. Utilise une base de
+test jetable (SQLite en mémoire avec la configuration de développement).
+
+Usage : python scripts/bench_checkout.py [--lines 15] [--repeat 50]
+"""
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'multi_restaurants.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa: E402
+from rest_framework import serializers  # noqa: E402
+
+from apps.commandes.models import Order, OrderItem  # noqa: E402
+from apps.commandes.serializers import OrderCreateSerializer  # noqa: E402
+from apps.restaurants.models import MenuItem, Restaurant  # noqa: E402
+
+
+class LegacyOrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderItem
+        fields = ['menu_item', 'quantity', 'selected_options', 'special_instructions']
+
+
+class LegacyOrderCreateSerializer(serializers.ModelSerializer):
+    """Approche précédente (client et taxe en Decimal corrigés pour pouvoir s'exécuter)"""
+    items = LegacyOrderItemSerializer(many=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            'restaurant', 'delivery_address', 'delivery_latitude',
+            'delivery_longitude', 'payment_method', 'customer_notes', 'items'
+        ]
+
+    def create(self, validated_data):
+        items_data = validated_data.pop('items')
+        order = Order.objects.create(subtotal=0, total_amount=0, **validated_data)
+        subtotal = 0
+        for item_data in items_data:
+            unit_price = item_data['menu_item'].price
+            OrderItem.objects.create(order=order, unit_price=unit_price, **item_data)
+            subtotal += unit_price * item_data['quantity']
+        order.subtotal = subtotal
+        order.delivery_fee = order.restaurant.delivery_fee
+        order.tax = subtotal * Decimal('0.1')
+        order.total_amount = subtotal + order.delivery_fee + order.tax
+        order.save()
+        return order
+
+
+def measure(serializer_class, payload, customer, repeat):
+    best = float('inf')
+    queries = 0
+    for _ in range(repeat):
+        # Chaque essai est annulé : la base reste identique d'un essai à l'autre
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                serializer = serializer_class(data=payload)
+                serializer.is_valid(raise_exception=True)
+                serializer.save(customer=customer)
+                best = min(best, time.perf_counter() - start)
+            queries = len([query for query in captured if 'SAVEPOINT' not in query['sql']])
+            transaction.set_rollback(True)
+    return best, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lines', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+    try:
+        User = get_user_model()
+        owner = User.objects.create_user(username='bench', password='bench', user_type='restaurant')
+        customer = User.objects.create_user(username='client', password='client')
+        restaurant = Restaurant.objects.create(
+            owner=owner, name='Bench', address='-', latitude=48.85, longitude=2.35, phone_number='0'
+        )
+        items = MenuItem.objects.bulk_create([
+            MenuItem(restaurant=restaurant, name=f'Plat {index}', price='9.90') for index in range(args.lines)
+        ])
+        payload = {
+            'restaurant': restaurant.pk,
+            'items': [{'menu_item': item.pk, 'quantity': 2} for item in items],
+            'delivery_address': {'street': '1 rue'},
+            'delivery_latitude': 48.85,
+            'delivery_longitude': 2.35,
+            'payment_method': 'card',
+        }
+
+        legacy_time, legacy_queries = measure(LegacyOrderCreateSerializer, payload, customer, args.repeat)
+        new_time, new_queries = measure(OrderCreateSerializer, payload, customer, args.repeat)
+
+        print(f"{'lignes':>7} {'approche':>10} {'requêtes':>9} {'latence (ms)':>13}")
+        print(f"{args.lines:>7} {'avant':>10} {legacy_queries:>9} {legacy_time * 1000:>13.2f}")
+        print(f"{args.lines:>7} {'après':>10} {new_queries:>9} {new_time * 1000:>13.2f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
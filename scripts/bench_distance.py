@@ -0,0 +1,72 @@
+"""
+Micro-benchmark des calculs de distance.
+
+Compare la boucle geopy (géodésique de Karney, une paire à la fois) avec l'API
+vectorisée de apps.core.utils pour 1k, 10k et 100k points.
+
+Usage : python scripts/bench_distance.py [--sizes 1000 10000 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from geopy.distance import geodesic
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apps.core.utils import haversine_distances, haversine_matrix  # noqa: E402
+
+ORIGIN = (48.8566, 2.3522)  # Paris
+
+
+def timed(func, repeat=3):
+    """Retourne le meilleur temps (secondes) et le résultat de `func`"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def random_points(size, rng):
+    latitudes = ORIGIN[0] + rng.uniform(-0.3, 0.3, size)
+    longitudes = ORIGIN[1] + rng.uniform(-0.45, 0.45, size)
+    return latitudes, longitudes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+    rng = np.random.default_rng(42)
+
+    print(f"{'points':>8} {'geopy (s)':>10} {'sphère (s)':>11} {'lambert (s)':>12} {'gain':>8} {'err. max (m)':>13}")
+    for size in args.sizes:
+        latitudes, longitudes = random_points(size, rng)
+
+        geopy_time, reference = timed(
+            lambda: [geodesic(ORIGIN, point).kilometers for point in zip(latitudes, longitudes)],
+            repeat=1,
+        )
+        sphere_time, _ = timed(lambda: haversine_distances(*ORIGIN, latitudes, longitudes))
+        lambert_time, lambert = timed(lambda: haversine_distances(*ORIGIN, latitudes, longitudes, ellipsoidal=True))
+        max_error_m = np.max(np.abs(lambert - np.array(reference))) * 1000
+
+        print(
+            f"{size:>8} {geopy_time:>10.4f} {sphere_time:>11.5f} {lambert_time:>12.5f} "
+            f"{geopy_time / lambert_time:>7.0f}x {max_error_m:>13.3f}"
+        )
+
+    # Matrice M x N (ex: 200 livreurs x 1000 restaurants)
+    driver_lats, driver_lngs = random_points(200, rng)
+    restaurant_lats, restaurant_lngs = random_points(1000, rng)
+    matrix_time, matrix = timed(lambda: haversine_matrix(driver_lats, driver_lngs, restaurant_lats, restaurant_lngs))
+    print(f"matrice {matrix.shape[0]}x{matrix.shape[1]} : {matrix_time:.4f} s")
+
+
+if __name__ == '__main__':
+    main()